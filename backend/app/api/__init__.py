@@ -1,3 +1,3 @@
-from . import accounts, scrapes, export, health
+from . import accounts, scrapes, export, health, analytics, avatars
 
-__all__ = ["accounts", "scrapes", "export", "health"]
\ No newline at end of file
+__all__ = ["accounts", "scrapes", "export", "health", "analytics", "avatars"]
\ No newline at end of file
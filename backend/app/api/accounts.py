@@ -1,11 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select
-from typing import List, Optional
+from sqlalchemy import delete
+from typing import List, Literal, Optional
 from datetime import datetime
 
-from ..database import get_session
-from ..models import Account
+from ..database import get_session, get_read_session
+from ..models import (
+    Account, Scrape, ScrapeStatus, FollowerEvent, FollowerEventType, FollowerInterval, InstagramUser,
+    ScrapeIdSet, ScrapeSketch
+)
 from ..schemas.account import AccountCreate, AccountUpdate, AccountResponse, CredentialUpdate
+from ..schemas.follower import FollowerEventResponse
 from ..services.credential_service import CredentialService
 
 router = APIRouter()
@@ -17,7 +22,7 @@ async def list_accounts(
     limit: int = Query(100, ge=1, le=1000),
     search: Optional[str] = None,
     bookmarked_only: bool = False,
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     """List all accounts with optional filtering"""
     query = select(Account)
@@ -37,7 +42,7 @@ async def list_accounts(
 @router.get("/{account_id}", response_model=AccountResponse)
 async def get_account(
     account_id: int,
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     """Get a specific account by ID"""
     account = session.get(Account, account_id)
@@ -47,6 +52,155 @@ async def get_account(
     return account
 
 
+def _event_response(event: FollowerEvent, username: str) -> FollowerEventResponse:
+    return FollowerEventResponse(
+        follower_id=event.follower_id,
+        username=username,
+        relation_type=event.relation_type,
+        event_type=event.event_type,
+        scrape_id=event.scrape_id,
+        occurred_at=event.occurred_at
+    )
+
+
+@router.get("/{account_id}/followers/{follower_id}/timeline", response_model=List[FollowerEventResponse])
+async def get_follower_timeline(
+    account_id: int,
+    follower_id: int,
+    relation_type: Optional[Literal["follower", "following"]] = None,
+    session: Session = Depends(get_read_session)
+):
+    """Follow/unfollow history of one user for an account, oldest first"""
+    account = session.get(Account, account_id)
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    
+    query = (
+        select(FollowerEvent, InstagramUser.username)
+        .join(InstagramUser, InstagramUser.id == FollowerEvent.follower_id)
+        .where(FollowerEvent.target_id == account_id, FollowerEvent.follower_id == follower_id)
+    )
+    if relation_type:
+        query = query.where(FollowerEvent.relation_type == relation_type)
+    
+    rows = session.exec(query.order_by(FollowerEvent.occurred_at)).all()
+    return [_event_response(event, username) for event, username in rows]
+
+
+@router.get("/{account_id}/lost-followers", response_model=List[FollowerEventResponse])
+async def list_lost_followers(
+    account_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    relation_type: Literal["follower", "following"] = "follower",
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    session: Session = Depends(get_read_session)
+):
+    """Unfollow events of an account between two dates, newest first"""
+    account = session.get(Account, account_id)
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    
+    query = (
+        select(FollowerEvent, InstagramUser.username)
+        .join(InstagramUser, InstagramUser.id == FollowerEvent.follower_id)
+        .where(
+            FollowerEvent.target_id == account_id,
+            FollowerEvent.relation_type == relation_type,
+            FollowerEvent.event_type == FollowerEventType.UNFOLLOW
+        )
+    )
+    if start:
+        query = query.where(FollowerEvent.occurred_at >= start)
+    if end:
+        query = query.where(FollowerEvent.occurred_at < end)
+    
+    rows = session.exec(
+        query.order_by(FollowerEvent.occurred_at.desc()).offset(skip).limit(limit)
+    ).all()
+    return [_event_response(event, username) for event, username in rows]
+
+
+def load_diff_scrapes(session: Session, account_id: int, scrape_a: int, scrape_b: int):
+    """The two completed scrapes of an account to diff"""
+    scrapes = []
+    for scrape_id in (scrape_a, scrape_b):
+        scrape = session.get(Scrape, scrape_id)
+        if not scrape or scrape.account_id != account_id:
+            raise HTTPException(status_code=404, detail=f"Scrape {scrape_id} not found for this account")
+        if scrape.status != ScrapeStatus.COMPLETED:
+            raise HTTPException(status_code=400, detail=f"Scrape {scrape_id} is not completed")
+        scrapes.append(scrape)
+    return scrapes
+
+
+def user_profiles(session: Session, user_ids: List[int]) -> dict:
+    """Current profiles of a page of users, keyed by id"""
+    users = session.exec(select(InstagramUser).where(InstagramUser.id.in_(user_ids))).all()
+    return {user.id: user for user in users}
+
+
+@router.get("/{account_id}/diff")
+async def get_scrape_diff(
+    account_id: int,
+    scrape_a: int,
+    scrape_b: int,
+    change: Literal["added", "removed", "profile"] = "added",
+    relation_type: Literal["follower", "following"] = "follower",
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    session: Session = Depends(get_read_session)
+):
+    """
+    Diff two completed scrapes of an account: users added to or removed from a
+    relation, or profile changes in between. Results are cached per scrape pair.
+    """
+    from ..workers.snapshot_diff import get_snapshot_diff
+    
+    first, second = load_diff_scrapes(session, account_id, scrape_a, scrape_b)
+    diff = get_snapshot_diff(session, first, second)
+    
+    summary = {
+        relation: {kind: len(ids) for kind, ids in changes.items()}
+        for relation, changes in diff["relations"].items()
+    }
+    summary["profile_changes"] = len(diff["profile_changes"])
+    
+    if change == "profile":
+        entries = diff["profile_changes"]
+        page = entries[skip:skip + limit]
+        profiles = user_profiles(session, [entry["user_id"] for entry in page])
+        items = [
+            {**entry, "username": profiles[entry["user_id"]].username if entry["user_id"] in profiles else None}
+            for entry in page
+        ]
+    else:
+        entries = diff["relations"].get(relation_type, {}).get(change, [])
+        page = entries[skip:skip + limit]
+        profiles = user_profiles(session, page)
+        items = [
+            {
+                "user_id": user_id,
+                "username": profiles[user_id].username,
+                "full_name": profiles[user_id].full_name,
+                "is_verified": profiles[user_id].is_verified,
+                "is_private": profiles[user_id].is_private,
+            }
+            for user_id in page if user_id in profiles
+        ]
+    
+    return {
+        "scrape_a": scrape_a,
+        "scrape_b": scrape_b,
+        "relation_type": relation_type,
+        "change": change,
+        "summary": summary,
+        "total": len(entries),
+        "items": items
+    }
+
+
 @router.post("/", response_model=AccountResponse)
 async def create_account(
     account: AccountCreate,
@@ -153,13 +307,16 @@ async def delete_account(
         # First, delete all followers for all scrapes of this account
         scrapes = session.exec(select(Scrape).where(Scrape.account_id == account_id)).all()
         for scrape in scrapes:
-            # Delete followers for this scrape
-            followers = session.exec(select(Follower).where(Follower.scrape_id == scrape.id)).all()
-            for follower in followers:
-                session.delete(follower)
+            # Delete followers, id sets and sketches for this scrape, one statement each
+            for model in (Follower, ScrapeIdSet, ScrapeSketch):
+                session.execute(delete(model).where(model.scrape_id == scrape.id))
             # Delete the scrape itself
             session.delete(scrape)
         
+        session.execute(delete(FollowerEvent).where(FollowerEvent.target_id == account_id))
+        # Row ids are reused, so a later account must not inherit these intervals
+        session.execute(delete(FollowerInterval).where(FollowerInterval.target_id == account_id))
+        
         # Remove credentials if they exist
         try:
             if account.username:
@@ -175,6 +332,15 @@ async def delete_account(
         session.delete(account)
         session.commit()
         
+        # Archived scrapes, cached diffs and checkpoint ids live outside the DB
+        from ..workers.archiver import delete_account_archive
+        from ..workers.snapshot_diff import invalidate_snapshot_diffs
+        from ..workers.checkpoints import clear_checkpoints
+        delete_account_archive(account_id)
+        invalidate_snapshot_diffs([scrape.id for scrape in scrapes])
+        for scrape in scrapes:
+            clear_checkpoints(scrape.id)
+        
         # Return 204 No Content
         return None
     except Exception as e:
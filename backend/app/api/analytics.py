@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session, select
+from typing import List, Literal
+
+from ..database import get_read_session
+from ..models import Account
+from ..workers.overlap import sketch_overlap, exact_overlap
+
+router = APIRouter()
+
+
+@router.get("/overlap")
+async def get_audience_overlap(
+    account_ids: List[int] = Query(...),
+    relation_type: Literal["follower", "following"] = "follower",
+    mode: Literal["sketch", "exact"] = "sketch",
+    session: Session = Depends(get_read_session)
+):
+    """
+    Pairwise audience overlap of accounts, from their latest scrapes.
+    "sketch" estimates from MinHash/HyperLogLog sketches, "exact" intersects the id sets.
+    """
+    account_ids = sorted(set(account_ids))
+    if len(account_ids) < 2:
+        raise HTTPException(status_code=400, detail="At least two accounts are required")
+    
+    accounts = session.exec(select(Account).where(Account.id.in_(account_ids))).all()
+    usernames = {account.id: account.username for account in accounts}
+    missing = [account_id for account_id in account_ids if account_id not in usernames]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Accounts not found: {missing}")
+    
+    compute = exact_overlap if mode == "exact" else sketch_overlap
+    result = compute(session, account_ids, relation_type)
+    
+    return {
+        "relation_type": relation_type,
+        "mode": mode,
+        "accounts": [
+            {"account_id": account_id, "username": usernames[account_id], **scrape}
+            for account_id, scrape in result["scrapes"].items()
+        ],
+        # Accounts without a completed scrape of this relation
+        "not_scraped": [account_id for account_id in account_ids if account_id not in result["scrapes"]],
+        "pairs": result["pairs"],
+        "union": result["union"]
+    }
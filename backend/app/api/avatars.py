@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from sqlmodel import Session, select
+
+from ..database import get_read_session
+from ..models import Account, Avatar, InstagramUser
+from ..workers.avatars import avatar_key, thumbnail_path
+
+router = APIRouter()
+
+# A username can switch pictures, so browsers revalidate daily; the ETag makes that a 304
+CACHE_CONTROL = "public, max-age=86400"
+
+
+def profile_pic_url(session: Session, username: str):
+    """Latest known picture URL of a scraped user or tracked account"""
+    url = session.exec(
+        select(InstagramUser.profile_pic_url)
+        .where(InstagramUser.username == username)
+        .order_by(InstagramUser.updated_at.desc())
+        .limit(1)
+    ).first()
+    if url:
+        return url
+    return session.exec(select(Account.profile_pic_url).where(Account.username == username)).first()
+
+
+@router.get("/{username}")
+async def get_avatar(
+    username: str,
+    request: Request,
+    session: Session = Depends(get_read_session)
+):
+    """
+    Cached thumbnail of a user's profile picture, with its content hash as ETag.
+    Pictures that are not cached yet redirect to the Instagram URL.
+    """
+    url = profile_pic_url(session, username)
+    if not url:
+        raise HTTPException(status_code=404, detail="No profile picture known for this user")
+    
+    avatar = session.get(Avatar, avatar_key(url))
+    path = thumbnail_path(avatar.content_hash) if avatar else None
+    if path is None or not path.exists():
+        return RedirectResponse(url, status_code=307)
+    
+    etag = f'"{avatar.content_hash}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
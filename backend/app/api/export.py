@@ -1,19 +1,195 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse, FileResponse
-from sqlmodel import Session, select
+from sqlmodel import Session, select, func
+from sqlalchemy import true
 import pandas as pd
+import numpy as np
+import pyarrow.compute as pc
 import io
+import csv
 import json
-from typing import List, Literal
+from typing import Dict, Iterator, List, Literal, Optional
 from datetime import datetime
 
-from ..database import get_session
-from ..models import Account, Scrape, Follower
+from ..database import get_read_session, read_engine
+from ..models import Account, Scrape, ScrapeType, Follower, InstagramUser, FollowerInterval
+from ..workers.intervals import as_of_conditions, followers_as_of
+from ..workers.archiver import read_archived_scrape, scan_account_archive
+from ..workers.delta_calculator import RELATION_SCRAPE_TYPES, get_previous_scrape_id, load_relation_ids
+from ..utils.id_sets import EMPTY
 from ..config import get_settings
 
 router = APIRouter()
 settings = get_settings()
 
+# Columns returned by the followers export, in order
+EXPORT_COLUMNS = [
+    "username", "full_name", "is_verified", "is_private",
+    "relation_type", "is_mutual", "first_seen", "last_seen"
+]
+
+
+def _snapshot_rows(
+    session: Session,
+    account_id: int,
+    scrape_id: Optional[int],
+    filter_type: str
+) -> List[Dict]:
+    """Export rows from per-scrape membership rows joined with their profiles"""
+    query = (
+        select(Follower, InstagramUser)
+        .join(InstagramUser, InstagramUser.id == Follower.follower_id)
+        .where(Follower.target_id == account_id)
+    )
+    
+    if scrape_id:
+        query = query.where(Follower.scrape_id == scrape_id)
+    
+    # Apply filter
+    if filter_type == "followers":
+        query = query.where(Follower.relation_type == "follower")
+    elif filter_type == "following":
+        query = query.where(Follower.relation_type == "following")
+    elif filter_type == "mutuals":
+        query = query.where(Follower.is_mutual == True)
+    
+    data = []
+    for f, user in session.exec(query).all():
+        data.append({
+            "username": user.username,
+            "full_name": user.full_name,
+            "is_verified": user.is_verified,
+            "is_private": user.is_private,
+            "relation_type": f.relation_type,
+            "is_mutual": f.is_mutual,
+            "first_seen": f.first_seen.isoformat(),
+            "last_seen": f.last_seen.isoformat()
+        })
+    
+    return data
+
+
+def _interval_rows(
+    session: Session,
+    account_id: int,
+    scrape_id: Optional[int],
+    filter_type: str
+) -> List[Dict]:
+    """Export rows rebuilt from the interval store as of a scrape"""
+    relation_type = {"followers": "follower", "mutuals": "follower", "following": "following"}.get(filter_type)
+    
+    rows = session.exec(
+        select(FollowerInterval, InstagramUser)
+        .join(InstagramUser, InstagramUser.id == FollowerInterval.follower_id)
+        .where(*as_of_conditions(account_id, scrape_id=scrape_id, relation_type=relation_type))
+    ).all()
+    
+    following_ids = followers_as_of(session, account_id, scrape_id=scrape_id, relation_type="following")
+    
+    data = []
+    for interval, user in rows:
+        is_mutual = interval.relation_type == "follower" and interval.follower_id in following_ids
+        if filter_type == "mutuals" and not is_mutual:
+            continue
+        data.append({
+            "username": user.username,
+            "full_name": user.full_name,
+            "is_verified": user.is_verified,
+            "is_private": user.is_private,
+            "relation_type": interval.relation_type,
+            "is_mutual": is_mutual,
+            "first_seen": interval.first_seen.isoformat(),
+            "last_seen": interval.last_seen.isoformat()
+        })
+    
+    return data
+
+
+def _id_set_rows(
+    session: Session,
+    scrape: Scrape,
+    filter_type: str
+) -> List[Dict]:
+    """
+    Export rows rebuilt from the stored id sets of a scrape, for snapshot storage
+    scrapes whose membership rows are gone (compacted) or hold only the new head
+    (incremental). Seen times are known only for ids that still have a row.
+    """
+    if filter_type in ("followers", "mutuals"):
+        relation_types = ["follower"]
+    elif filter_type == "following":
+        relation_types = ["following"]
+    else:
+        relation_types = [r for r, types in RELATION_SCRAPE_TYPES.items() if scrape.scrape_type in types]
+    
+    # Mutuals against the following list known at the time of the scrape
+    following_scrape_id = (
+        scrape.id if scrape.scrape_type in RELATION_SCRAPE_TYPES["following"]
+        else get_previous_scrape_id(session, scrape.account_id, scrape.id, "following")
+    )
+    following_ids = load_relation_ids(session, following_scrape_id, "following") if following_scrape_id else EMPTY
+    
+    data = []
+    for relation_type in relation_types:
+        ids = load_relation_ids(session, scrape.id, relation_type)
+        mutual = np.isin(ids, following_ids) if relation_type == "follower" else np.zeros(len(ids), dtype=bool)
+        if filter_type == "mutuals":
+            ids = ids[mutual]
+            mutual = mutual[mutual]
+        is_mutual = dict(zip(ids.tolist(), mutual.tolist()))
+        
+        seen = {
+            follower_id: (first_seen, last_seen)
+            for follower_id, first_seen, last_seen in session.exec(
+                select(Follower.follower_id, Follower.first_seen, Follower.last_seen)
+                .where(Follower.scrape_id == scrape.id, Follower.relation_type == relation_type)
+            )
+        }
+        
+        id_list = ids.tolist()
+        for start in range(0, len(id_list), settings.batch_size):
+            users = session.exec(
+                select(InstagramUser).where(InstagramUser.id.in_(id_list[start:start + settings.batch_size]))
+            ).all()
+            for user in users:
+                first_seen, last_seen = seen.get(user.id, (None, None))
+                data.append({
+                    "username": user.username,
+                    "full_name": user.full_name,
+                    "is_verified": user.is_verified,
+                    "is_private": user.is_private,
+                    "relation_type": relation_type,
+                    "is_mutual": is_mutual[user.id],
+                    "first_seen": first_seen.isoformat() if first_seen else None,
+                    "last_seen": last_seen.isoformat() if last_seen else None
+                })
+    
+    return data
+
+
+def _archive_rows(
+    account_id: int,
+    scrape_id: int,
+    filter_type: str
+) -> List[Dict]:
+    """Export rows from an archived scrape, reading only the exported columns"""
+    filters = None
+    if filter_type == "followers":
+        filters = [("relation_type", "=", "follower")]
+    elif filter_type == "following":
+        filters = [("relation_type", "=", "following")]
+    elif filter_type == "mutuals":
+        filters = [("is_mutual", "=", True)]
+    
+    table = read_archived_scrape(account_id, scrape_id, columns=EXPORT_COLUMNS, filters=filters)
+    
+    data = table.to_pylist()
+    for row in data:
+        row["first_seen"] = row["first_seen"].isoformat()
+        row["last_seen"] = row["last_seen"].isoformat()
+    
+    return data
+
 
 @router.get("/{account_id}/followers")
 async def export_followers(
@@ -21,7 +197,7 @@ async def export_followers(
     format: Literal["csv", "xlsx", "json"] = "csv",
     scrape_id: int = None,
     filter_type: Literal["all", "followers", "following", "mutuals"] = "all",
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     """Export followers/following data"""
     # Verify account exists
@@ -29,12 +205,7 @@ async def export_followers(
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     
-    # Build query
-    query = select(Follower).where(Follower.target_id == account_id)
-    
-    if scrape_id:
-        query = query.where(Follower.scrape_id == scrape_id)
-    else:
+    if not scrape_id:
         # Get latest scrape
         latest_scrape = session.exec(
             select(Scrape)
@@ -44,32 +215,20 @@ async def export_followers(
         ).first()
         
         if latest_scrape:
-            query = query.where(Follower.scrape_id == latest_scrape.id)
-    
-    # Apply filter
-    if filter_type == "followers":
-        query = query.where(Follower.relation_type == "follower")
-    elif filter_type == "following":
-        query = query.where(Follower.relation_type == "following")
-    elif filter_type == "mutuals":
-        query = query.where(Follower.is_mutual == True)
+            scrape_id = latest_scrape.id
     
-    # Get data
-    followers = session.exec(query).all()
+    scrape = session.get(Scrape, scrape_id) if scrape_id else None
     
-    # Convert to DataFrame
-    data = []
-    for f in followers:
-        data.append({
-            "username": f.username,
-            "full_name": f.full_name,
-            "is_verified": f.is_verified,
-            "is_private": f.is_private,
-            "relation_type": f.relation_type,
-            "is_mutual": f.is_mutual,
-            "first_seen": f.first_seen.isoformat(),
-            "last_seen": f.last_seen.isoformat()
-        })
+    if settings.follower_storage == "interval":
+        data = _interval_rows(session, account_id, scrape_id, filter_type)
+    elif scrape and (scrape.compacted_at or scrape.scrape_type == ScrapeType.INCREMENTAL):
+        # Compacted scrapes have no membership rows left and incremental ones only
+        # the new head (in the hot DB or the archive); rebuild them from their id sets
+        data = _id_set_rows(session, scrape, filter_type)
+    elif scrape and scrape.archived_at:
+        data = _archive_rows(account_id, scrape_id, filter_type)
+    else:
+        data = _snapshot_rows(session, account_id, scrape_id, filter_type)
     
     df = pd.DataFrame(data)
     
@@ -124,10 +283,76 @@ async def export_followers(
         }
 
 
+DIFF_COLUMNS = ["change", "relation_type", "user_id", "username", "field", "old_value", "new_value", "changed_at"]
+
+
+def _diff_csv_lines(diff: Dict) -> Iterator[str]:
+    """CSV lines of a snapshot diff, resolving usernames one batch at a time"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=DIFF_COLUMNS, extrasaction="ignore")
+    
+    def flush() -> str:
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+    
+    writer.writeheader()
+    yield flush()
+    
+    entries = [
+        {"change": change, "relation_type": relation_type, "user_id": user_id}
+        for relation_type, changes in diff["relations"].items()
+        for change, ids in changes.items()
+        for user_id in ids
+    ]
+    entries += [{"change": "profile", **entry} for entry in diff["profile_changes"]]
+    
+    # The request session is closed once streaming starts; read with our own
+    with Session(read_engine) as session:
+        for start in range(0, len(entries), settings.export_batch_size):
+            batch = entries[start:start + settings.export_batch_size]
+            usernames = dict(session.exec(
+                select(InstagramUser.id, InstagramUser.username)
+                .where(InstagramUser.id.in_({entry["user_id"] for entry in batch}))
+            ).all())
+            for entry in batch:
+                writer.writerow({**entry, "username": usernames.get(entry["user_id"])})
+            yield flush()
+
+
+@router.get("/{account_id}/diff")
+async def export_scrape_diff(
+    account_id: int,
+    scrape_a: int,
+    scrape_b: int,
+    session: Session = Depends(get_read_session)
+):
+    """Stream the full diff of two completed scrapes as CSV"""
+    from .accounts import load_diff_scrapes
+    from ..workers.snapshot_diff import get_snapshot_diff
+    
+    account = session.get(Account, account_id)
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    
+    first, second = load_diff_scrapes(session, account_id, scrape_a, scrape_b)
+    diff = get_snapshot_diff(session, first, second)
+    
+    filename = f"{account.username}_diff_{scrape_a}_{scrape_b}"
+    return StreamingResponse(
+        _diff_csv_lines(diff),
+        media_type="text/csv",
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}.csv"
+        }
+    )
+
+
 @router.get("/{account_id}/analytics")
 async def export_analytics(
     account_id: int,
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     """Export analytics data for an account"""
     # Verify account exists
@@ -153,17 +378,35 @@ async def export_analytics(
         "scrape_history": [],
         "growth_metrics": {
             "follower_growth": [],
-            "following_growth": []
+            "following_growth": [],
+            "mutual_growth": []
         }
     }
     
+    # Mutual counts per scrape: grouped in SQL for hot scrapes, from a
+    # column-projected scan of the Parquet archive for archived ones
+    mutual_counts = dict(session.exec(
+        select(Follower.scrape_id, func.count())
+        .where(Follower.target_id == account_id, Follower.is_mutual == true())
+        .group_by(Follower.scrape_id)
+    ).all())
+    archived = scan_account_archive(
+        account_id,
+        columns=["scrape_id"],
+        filter=pc.field("is_mutual")
+    )
+    for row in archived.group_by("scrape_id").aggregate([("scrape_id", "count")]).to_pylist():
+        mutual_counts[row["scrape_id"]] = row["scrape_id_count"]
+    
     for scrape in scrapes:
         analytics["scrape_history"].append({
             "date": scrape.completed_at.isoformat() if scrape.completed_at else None,
             "followers_count": scrape.followers_count,
             "following_count": scrape.following_count,
             "new_followers": scrape.new_followers,
-            "lost_followers": scrape.lost_followers
+            "lost_followers": scrape.lost_followers,
+            "new_following": scrape.new_following,
+            "lost_following": scrape.lost_following
         })
         
         if scrape.completed_at:
@@ -175,5 +418,10 @@ async def export_analytics(
                 "date": scrape.completed_at.isoformat(),
                 "count": scrape.following_count
             })
+            if scrape.id in mutual_counts:
+                analytics["growth_metrics"]["mutual_growth"].append({
+                    "date": scrape.completed_at.isoformat(),
+                    "count": mutual_counts[scrape.id]
+                })
     
     return analytics
\ No newline at end of file
@@ -6,14 +6,34 @@ from sse_starlette.sse import EventSourceResponse
 import asyncio
 import json
 
-from ..database import get_session
+from ..database import get_session, get_read_session
 from ..models import Scrape, Account, ScrapeStatus, ScrapeType
 from ..schemas.scrape import ScrapeCreate, ScrapeResponse
 from ..workers import queue, scrape_instagram_account
 from ..workers.queue import redis_conn
+from ..workers.tasks import request_cancel, cancel_key
+from ..config import get_settings
+from rq import Retry
 from rq.job import Job
 
 router = APIRouter()
+settings = get_settings()
+
+
+def enqueue_scrape(scrape: Scrape, username: str, use_private: bool):
+    """
+    Queue the worker job of a scrape. Failed attempts are retried by RQ and
+    resume from the scrape's pagination checkpoint.
+    """
+    from ..worker_wrapper import scrape_instagram_account as sync_scrape
+    return queue.enqueue(
+        sync_scrape,
+        scrape_id=scrape.id,
+        username=username,
+        scrape_type=scrape.scrape_type.value,
+        use_private=use_private,
+        retry=Retry(max=settings.max_retries) if settings.max_retries else None
+    )
 
 
 @router.post("/", response_model=ScrapeResponse)
@@ -38,14 +58,7 @@ async def create_scrape(
     session.refresh(db_scrape)
     
     # Queue the job (use sync wrapper)
-    from ..worker_wrapper import scrape_instagram_account as sync_scrape
-    job = queue.enqueue(
-        sync_scrape,
-        scrape_id=db_scrape.id,
-        username=account.username,
-        scrape_type=scrape.scrape_type.value,
-        use_private=scrape.use_private_creds
-    )
+    job = enqueue_scrape(db_scrape, account.username, scrape.use_private_creds)
     
     # Update scrape with job ID
     db_scrape.job_id = job.id
@@ -58,7 +71,7 @@ async def create_scrape(
 @router.get("/{scrape_id}", response_model=ScrapeResponse)
 async def get_scrape(
     scrape_id: int,
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     """Get a specific scrape by ID"""
     scrape = session.get(Scrape, scrape_id)
@@ -84,7 +97,7 @@ async def scrape_progress(job_id: str):
                     "data": json.dumps(progress)
                 }
                 
-                if progress.get("status") in ["completed", "failed"]:
+                if progress.get("status") in ["completed", "failed", "cancelled"]:
                     break
             
             await asyncio.sleep(1)
@@ -97,7 +110,7 @@ async def get_account_scrapes(
     account_id: int,
     skip: int = 0,
     limit: int = 100,
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     """Get all scrapes for an account"""
     query = select(Scrape).where(Scrape.account_id == account_id)
@@ -125,9 +138,10 @@ async def cancel_scrape(
             detail=f"Cannot cancel scrape with status: {scrape.status}"
         )
     
-    # Cancel the job if it exists
+    # Cancel the job if it exists; a running job stops before its next page
     if scrape.job_id:
         try:
+            request_cancel(scrape.id)
             job = Job.fetch(scrape.job_id, connection=redis_conn)
             job.cancel()
         except Exception as e:
@@ -153,6 +167,48 @@ async def cancel_scrape(
     return scrape
 
 
+@router.post("/{scrape_id}/resume", response_model=ScrapeResponse)
+async def resume_scrape(
+    scrape_id: int,
+    use_private_creds: bool = False,
+    session: Session = Depends(get_session)
+):
+    """Re-enqueue an interrupted scrape; it continues after its last saved page"""
+    scrape = session.get(Scrape, scrape_id)
+    if not scrape:
+        raise HTTPException(status_code=404, detail="Scrape not found")
+    
+    if scrape.status not in [ScrapeStatus.PARTIAL, ScrapeStatus.FAILED, ScrapeStatus.IN_PROGRESS]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot resume scrape with status: {scrape.status}"
+        )
+    
+    if scrape.status == ScrapeStatus.IN_PROGRESS and scrape.job_id:
+        # Only jobs whose worker died (timeout, restart) can be picked up again
+        try:
+            running = Job.fetch(scrape.job_id, connection=redis_conn).get_status() in ("queued", "started")
+        except Exception:
+            running = False
+        if running:
+            raise HTTPException(status_code=400, detail="Scrape is still running")
+    
+    redis_conn.delete(cancel_key(scrape.id))
+    scrape.status = ScrapeStatus.PENDING
+    scrape.retry_count += 1
+    scrape.completed_at = None
+    session.add(scrape)
+    session.commit()
+    
+    job = enqueue_scrape(scrape, scrape.account.username, use_private_creds)
+    scrape.job_id = job.id
+    session.add(scrape)
+    session.commit()
+    session.refresh(scrape)
+    
+    return scrape
+
+
 @router.delete("/{scrape_id}")
 async def delete_scrape(
     scrape_id: int,
@@ -170,7 +226,8 @@ async def delete_scrape(
             detail="Cannot delete an ongoing scrape. Cancel it first."
         )
     
-    session.delete(scrape)
-    session.commit()
+    # Derived rows, intervals, neighbouring deltas and cached diffs go with it
+    from ..workers.compactor import delete_scrape as delete_scrape_data
+    delete_scrape_data(session, scrape)
     
     return {"message": "Scrape deleted successfully"}
\ No newline at end of file
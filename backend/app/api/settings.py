@@ -32,6 +32,8 @@ async def get_settings(session: Session = Depends(get_session)):
         "jitterSecondsMax": getattr(settings, 'jitter_seconds_max', 15),
         "enableDailyScrapes": getattr(settings, 'enable_daily_scrapes', True),
         "backupRetentionDays": getattr(settings, 'backup_retention_days', 30),
+        "retentionDailyDays": settings.retention_daily_days,
+        "retentionWeeklyDays": settings.retention_weekly_days,
     }
 
 
@@ -24,15 +24,44 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = "sqlite:///./instagram_intel.db"
+    # "snapshot" stores membership rows per scrape, "interval" keeps only
+    # follower_intervals (one row per edge, written on churn); both keep id sets
+    follower_storage: str = "snapshot"
+    
+    # SQLite engine profile
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"  # Safe with WAL, far fewer fsyncs than FULL
+    sqlite_busy_timeout_ms: int = 30000
+    sqlite_mmap_size: int = 268435456  # 256 MB
+    sqlite_read_pool_size: int = 5
+    sqlite_writer_max_overflow: int = 2  # Extra writer connections for API handlers
+    
+    # Archive (completed scrapes older than this move to Parquet files)
+    archive_after_days: int = 90
+    archive_dir: str = "data/archive"
+    
+    # Retention (older scrapes are thinned to one per day, week, then month and relation)
+    retention_all_days: int = 7
+    retention_daily_days: int = 30
+    retention_weekly_days: int = 180
+    compaction_vacuum_pages: int = 0  # Pages freed per run, 0 = all
     
     # Redis
     redis_url: str = "redis://localhost:6379/0"
+    diff_cache_ttl: int = 604800  # Completed scrapes never change; 7 days
+    checkpoint_ttl: int = 604800  # Ids fetched by an interrupted scrape (interval storage)
     
     # Instagram Configuration
     instagram_username: Optional[str] = None
     instagram_password: Optional[str] = None
     use_instagram_cache: bool = True
     instagram_cache_ttl: int = 3600  # 1 hour
+    instagram_base_url: str = "https://www.instagram.com"  # Point at a stand-in server for benchmarks
+    instagram_session_dir: str = "data/sessions"  # Encrypted instagrapi login sessions
+    avatar_dir: str = "data/avatars"  # Content-addressed profile picture thumbnails
+    avatar_size: int = 150  # Thumbnail edge in pixels
+    avatar_fetch_concurrency: int = 8
+    cache_avatars: bool = True  # Queue avatar downloads after each completed scrape
     
     # Rate Limiting (based on Instagram's actual limits)
     rate_limit_per_minute: int = 2  # Safe: 120 req/h (well under 200/h cap)
@@ -45,6 +74,15 @@ class Settings(BaseSettings):
     timeout_seconds: int = 30
     max_followers_per_scrape: int = 10000
     batch_size: int = 100
+    private_page_size: int = 100  # Users per instagrapi chunk request
+    incremental_stop_after: int = 100  # Consecutive known followers that end an incremental scrape
+    full_scrape_interval_days: int = 7  # Scheduled scrapes are incremental in between full ones
+    
+    # HTTP client (shared AsyncClient of the GraphQL scraper)
+    http2: bool = False  # Needs the h2 package
+    http_max_connections: int = 10
+    http_max_keepalive_connections: int = 5
+    http_keepalive_expiry: float = 30.0
     
     # Proxy Configuration
     use_proxy: bool = False
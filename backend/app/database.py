@@ -1,17 +1,84 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
 from contextlib import contextmanager
 from typing import Generator
 from .config import settings
 
-# Create engine
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False},  # Required for SQLite
-    echo=False,
-)
+
+def _is_file_sqlite(url: str) -> bool:
+    """True for SQLite URLs backed by a file (in-memory DBs can't share connections)"""
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+def _apply_sqlite_pragmas(engine: Engine, read_only: bool = False):
+    """Configure every new SQLite connection of an engine"""
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not read_only:
+            # Only takes effect on new DBs, and only before the journal mode
+            # creates the file; compaction converts existing ones
+            cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            # WAL lets readers keep going while a writer holds the lock
+            cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+            cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        else:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+        cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size}")
+        cursor.close()
+
+
+def create_writer_engine(url: str) -> Engine:
+    """
+    Engine for writes. A single pooled connection is kept and reused, so a
+    worker process always writes through one connection; API write handlers
+    get a small overflow so they never wait on each other inside the event loop.
+    """
+    if not _is_file_sqlite(url):
+        return create_engine(url, connect_args={"check_same_thread": False}, echo=False)
+
+    writer = create_engine(
+        url,
+        connect_args={
+            "check_same_thread": False,  # Required for SQLite
+            "timeout": settings.sqlite_busy_timeout_ms / 1000,
+        },
+        pool_size=1,
+        max_overflow=settings.sqlite_writer_max_overflow,
+        echo=False,
+    )
+    _apply_sqlite_pragmas(writer)
+    return writer
+
+
+def create_reader_engine(url: str, writer: Engine) -> Engine:
+    """Pooled, query-only engine for API read handlers"""
+    if not _is_file_sqlite(url):
+        return writer
+
+    reader = create_engine(
+        url,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": settings.sqlite_busy_timeout_ms / 1000,
+        },
+        pool_size=settings.sqlite_read_pool_size,
+        max_overflow=settings.sqlite_read_pool_size,
+        echo=False,
+    )
+    _apply_sqlite_pragmas(reader, read_only=True)
+    return reader
+
+
+# Create engines
+engine = create_writer_engine(settings.database_url)
+read_engine = create_reader_engine(settings.database_url, engine)
 
 # Import all models to register them with SQLModel
-from .models import Account, Scrape, Follower  # noqa
+from .models import Account, Scrape, Follower, InstagramUser, FollowerInterval, ScrapeIdSet, ScrapeSketch, FollowerEvent, ProfileChange, Avatar  # noqa
 
 
 def init_db():
@@ -25,6 +92,12 @@ def get_session() -> Generator[Session, None, None]:
         yield session
 
 
+def get_read_session() -> Generator[Session, None, None]:
+    """Get a read-only database session for handlers that never write"""
+    with Session(read_engine) as session:
+        yield session
+
+
 @contextmanager
 def get_db_session():
     """Context manager for database sessions"""
@@ -40,4 +113,4 @@ def get_db_session():
 
 
 # Alias for backward compatibility
-session_scope = get_db_session
\ No newline at end of file
+session_scope = get_db_session
@@ -4,7 +4,7 @@ from contextlib import asynccontextmanager
 
 from .config import get_settings
 from .database import init_db
-from .api import accounts, scrapes, export, health, settings as settings_api
+from .api import accounts, scrapes, export, health, analytics, avatars, settings as settings_api
 from .workers.scheduler import start_scheduler
 from .utils.rate_limiter import SlidingWindowRateLimiter, RateLimitMiddleware
 from .utils.dirs import ensure_directories
@@ -48,6 +48,8 @@ app.include_router(health.router, tags=["health"])
 app.include_router(accounts.router, prefix=f"{settings.api_v1_prefix}/accounts", tags=["accounts"])
 app.include_router(scrapes.router, prefix=f"{settings.api_v1_prefix}/scrapes", tags=["scrapes"])
 app.include_router(export.router, prefix=f"{settings.api_v1_prefix}/export", tags=["export"])
+app.include_router(analytics.router, prefix=f"{settings.api_v1_prefix}/analytics", tags=["analytics"])
+app.include_router(avatars.router, prefix=f"{settings.api_v1_prefix}/avatars", tags=["avatars"])
 app.include_router(settings_api.router, prefix=f"{settings.api_v1_prefix}/settings", tags=["settings"])
 
 
@@ -1,5 +1,12 @@
 from .account import Account
 from .scrape import Scrape, ScrapeStatus, ScrapeType
 from .follower import Follower, FollowerRelationType
+from .instagram_user import InstagramUser
+from .follower_interval import FollowerInterval
+from .scrape_id_set import ScrapeIdSet
+from .scrape_sketch import ScrapeSketch
+from .follower_event import FollowerEvent, FollowerEventType
+from .profile_change import ProfileChange
+from .avatar import Avatar
 
-__all__ = ["Account", "Scrape", "Follower", "ScrapeStatus", "ScrapeType", "FollowerRelationType"]
\ No newline at end of file
+__all__ = ["Account", "Scrape", "Follower", "InstagramUser", "FollowerInterval", "ScrapeIdSet", "ScrapeSketch", "FollowerEvent", "ProfileChange", "Avatar", "ScrapeStatus", "ScrapeType", "FollowerRelationType", "FollowerEventType"]
\ No newline at end of file
@@ -0,0 +1,14 @@
+from sqlmodel import Field, SQLModel
+from datetime import datetime
+
+
+class Avatar(SQLModel, table=True):
+    """A downloaded profile picture and the content-addressed thumbnail it became"""
+    __tablename__ = "avatars"
+
+    # Path of the CDN URL; the host and the expiring signature in the query vary
+    source_key: str = Field(primary_key=True)
+
+    # sha256 of the downloaded bytes; names the thumbnail file and is its ETag
+    content_hash: str = Field(index=True)
+    fetched_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,5 +1,6 @@
 from sqlmodel import Field, SQLModel, Relationship
-from typing import Optional, TYPE_CHECKING
+from sqlalchemy import Index, text
+from typing import TYPE_CHECKING
 from datetime import datetime
 
 if TYPE_CHECKING:
@@ -12,39 +13,43 @@ class FollowerRelationType(str):
 
 
 class Follower(SQLModel, table=True):
-    """Follower/Following relationship data"""
+    """Per-scrape follower/following membership (profile data lives in instagram_users)"""
     __tablename__ = "followers"
-    
-    # Composite primary key
+    __table_args__ = (
+        # Rows of one scrape by relation: delta sets, exports, mutual marking and
+        # archive/delete batches (covers the follower_id lookups without the table)
+        Index("ix_followers_scrape_relation", "scrape_id", "relation_type", "follower_id"),
+        # Mutuals only - a small fraction of the rows (account-wide lookups use the PK prefix)
+        Index(
+            "ix_followers_mutual",
+            "target_id", "scrape_id", "follower_id",
+            sqlite_where=text("is_mutual = 1")
+        ),
+    )
+
+    # Composite primary key - relation_type is part of it so a mutual
+    # account can be stored as both a follower and a following row
     target_id: int = Field(primary_key=True)
-    follower_id: int = Field(primary_key=True)
+    follower_id: int = Field(foreign_key="instagram_users.id", primary_key=True)
     scrape_id: int = Field(foreign_key="scrapes.id", primary_key=True)
-    
-    # Instagram user data
-    username: str = Field(index=True)
-    full_name: Optional[str] = None
-    profile_pic_url: Optional[str] = None
-    is_verified: bool = Field(default=False)
-    is_private: bool = Field(default=False)
-    
+    relation_type: str = Field(primary_key=True)  # 'follower' or 'following'
+
     # Relationship metadata
-    relation_type: str  # 'follower' or 'following'
     first_seen: datetime = Field(default_factory=datetime.utcnow)
     last_seen: datetime = Field(default_factory=datetime.utcnow)
     is_mutual: bool = Field(default=False)
-    
+    is_new: bool = Field(default=False)  # Not in the previous scrape of the same relation
+
     # Relationship tracking
     scrape: "Scrape" = Relationship(back_populates="followers")
-    
+
     class Config:
         json_schema_extra = {
             "example": {
                 "target_id": 1,
                 "follower_id": 12345,
                 "scrape_id": 1,
-                "username": "user123",
-                "full_name": "John Doe",
-                "is_verified": False,
-                "relation_type": "follower"
+                "relation_type": "follower",
+                "is_mutual": False
             }
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,30 @@
+from sqlmodel import Field, SQLModel
+from sqlalchemy import Index
+from typing import Optional
+from datetime import datetime
+
+
+class FollowerEventType(str):
+    FOLLOW = "follow"
+    UNFOLLOW = "unfollow"
+
+
+class FollowerEvent(SQLModel, table=True):
+    """Follow/unfollow observed between two consecutive scrapes of an account"""
+    __tablename__ = "follower_events"
+    __table_args__ = (
+        # History of one user for an account
+        Index("ix_follower_events_target_follower", "target_id", "follower_id", "occurred_at"),
+        # Events of an account by kind within a date range
+        Index("ix_follower_events_target_kind", "target_id", "relation_type", "event_type", "occurred_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    target_id: int = Field(foreign_key="accounts.id")
+    follower_id: int = Field(foreign_key="instagram_users.id")
+    relation_type: str  # 'follower' or 'following'
+    event_type: str  # 'follow' or 'unfollow'
+
+    # Scrape that first observed the change
+    scrape_id: int = Field(foreign_key="scrapes.id", index=True)
+    occurred_at: datetime
@@ -0,0 +1,41 @@
+from sqlmodel import Field, SQLModel
+from sqlalchemy import Index
+from typing import Optional
+from datetime import datetime
+
+
+class FollowerInterval(SQLModel, table=True):
+    """Validity interval of one follower/following edge across scrapes"""
+    __tablename__ = "follower_intervals"
+    __table_args__ = (
+        # Open edges of an account, used by every scrape and "as of" lookup
+        Index("ix_follower_intervals_target_relation", "target_id", "relation_type", "end_scrape_id"),
+        Index("ix_follower_intervals_target_follower", "target_id", "follower_id", "relation_type"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    target_id: int = Field(foreign_key="accounts.id")
+    follower_id: int = Field(foreign_key="instagram_users.id")
+    relation_type: str  # 'follower' or 'following'
+
+    # First and most recent scrape that observed the edge
+    first_seen: datetime
+    last_seen: datetime
+    first_scrape_id: int = Field(foreign_key="scrapes.id")
+    last_scrape_id: int = Field(foreign_key="scrapes.id")
+
+    # Set once a later scrape no longer sees the edge
+    ended_at: Optional[datetime] = None
+    end_scrape_id: Optional[int] = Field(default=None, foreign_key="scrapes.id")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "target_id": 1,
+                "follower_id": 12345,
+                "relation_type": "follower",
+                "first_scrape_id": 3,
+                "last_scrape_id": 9,
+                "end_scrape_id": None
+            }
+        }
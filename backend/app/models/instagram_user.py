@@ -0,0 +1,33 @@
+from sqlmodel import Field, SQLModel
+from typing import Optional
+from datetime import datetime
+
+
+class InstagramUser(SQLModel, table=True):
+    """Deduplicated Instagram profile shared by every scrape that saw it"""
+    __tablename__ = "instagram_users"
+
+    # Instagram's own user id (the follower_id used in the followers table)
+    id: int = Field(primary_key=True)
+
+    # Profile attributes, only rewritten when one of them changes
+    username: str = Field(index=True)
+    full_name: Optional[str] = None
+    profile_pic_url: Optional[str] = None
+    is_verified: bool = Field(default=False)
+    is_private: bool = Field(default=False)
+
+    # Metadata
+    first_seen: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "id": 12345,
+                "username": "user123",
+                "full_name": "John Doe",
+                "is_verified": False,
+                "is_private": False
+            }
+        }
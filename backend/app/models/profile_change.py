@@ -0,0 +1,15 @@
+from sqlmodel import Field, SQLModel
+from typing import Optional
+from datetime import datetime
+
+
+class ProfileChange(SQLModel, table=True):
+    """One profile attribute of an Instagram user that changed between two scrapes"""
+    __tablename__ = "profile_changes"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="instagram_users.id", index=True)
+    field: str  # One of ingest.PROFILE_FIELDS
+    old_value: Optional[str] = None
+    new_value: Optional[str] = None
+    changed_at: datetime = Field(default_factory=datetime.utcnow, index=True)
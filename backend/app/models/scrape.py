@@ -21,6 +21,9 @@ class ScrapeType(str, Enum):
     FOLLOWERS = "followers"
     FOLLOWING = "following"
     BOTH = "both"
+    # Followers only, newest first, until a run of already-known followers;
+    # unfollows are left to the next full scrape
+    INCREMENTAL = "incremental"
 
 
 class Scrape(SQLModel, table=True):
@@ -41,12 +44,26 @@ class Scrape(SQLModel, table=True):
     following_count: Optional[int] = None
     new_followers: Optional[int] = None
     lost_followers: Optional[int] = None
+    new_following: Optional[int] = None
+    lost_following: Optional[int] = None
     
     # Progress tracking for partial saves
     followers_scraped: Optional[int] = None
     following_scraped: Optional[int] = None
     is_partial: bool = Field(default=False)
     
+    # Pagination checkpoint per relation, written with each persisted page;
+    # a retried job resumes after the cursor and skips completed relations
+    followers_cursor: Optional[str] = None
+    following_cursor: Optional[str] = None
+    followers_complete: bool = Field(default=False)
+    following_complete: bool = Field(default=False)
+    
+    # Set once membership rows have moved to the Parquet archive
+    archived_at: Optional[datetime] = None
+    # Set once retention dropped the stored membership (counts are kept)
+    compacted_at: Optional[datetime] = None
+    
     # Error handling
     error_message: Optional[str] = None
     retry_count: int = Field(default=0)
@@ -0,0 +1,14 @@
+from sqlmodel import Field, SQLModel
+from sqlalchemy import Column, LargeBinary
+
+
+class ScrapeIdSet(SQLModel, table=True):
+    """Compressed follower or following id set of one completed scrape"""
+    __tablename__ = "scrape_id_sets"
+
+    scrape_id: int = Field(foreign_key="scrapes.id", primary_key=True)
+    relation_type: str = Field(primary_key=True)  # 'follower' or 'following'
+
+    # Number of ids and their delta-encoded, zlib-compressed int64 form (see utils/id_sets.py)
+    count: int = Field(default=0)
+    data: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
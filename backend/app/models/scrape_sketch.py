@@ -0,0 +1,15 @@
+from sqlmodel import Field, SQLModel
+from sqlalchemy import Column, LargeBinary
+
+
+class ScrapeSketch(SQLModel, table=True):
+    """MinHash and HyperLogLog sketches of one relation of a completed scrape"""
+    __tablename__ = "scrape_sketches"
+
+    scrape_id: int = Field(foreign_key="scrapes.id", primary_key=True)
+    relation_type: str = Field(primary_key=True)  # 'follower' or 'following'
+
+    # Exact set size plus both sketches (see utils/sketches.py)
+    count: int = Field(default=0)
+    minhash: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    hll: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
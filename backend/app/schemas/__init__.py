@@ -1,9 +1,9 @@
 from .account import AccountCreate, AccountUpdate, AccountResponse
 from .scrape import ScrapeCreate, ScrapeResponse
-from .follower import FollowerResponse
+from .follower import FollowerResponse, FollowerEventResponse
 
 __all__ = [
     "AccountCreate", "AccountUpdate", "AccountResponse",
     "ScrapeCreate", "ScrapeResponse",
-    "FollowerResponse"
+    "FollowerResponse", "FollowerEventResponse"
 ]
\ No newline at end of file
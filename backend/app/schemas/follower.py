@@ -17,4 +17,13 @@ class FollowerResponse(BaseModel):
     is_mutual: bool
     
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class FollowerEventResponse(BaseModel):
+    follower_id: int
+    username: str
+    relation_type: str
+    event_type: str
+    scrape_id: int
+    occurred_at: datetime
@@ -21,6 +21,8 @@ class ScrapeResponse(BaseModel):
     following_count: Optional[int]
     new_followers: Optional[int]
     lost_followers: Optional[int]
+    new_following: Optional[int] = None
+    lost_following: Optional[int] = None
     error_message: Optional[str]
     job_id: Optional[str]
     
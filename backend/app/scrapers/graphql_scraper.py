@@ -1,61 +1,145 @@
 import httpx
-from typing import Dict, List, Optional
+import asyncio
+import weakref
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
 import json
-import re
 import os
 from ..utils.crypto import decrypt_credential
 from ..config import get_settings
-from ..utils.proxy_config import get_proxy_config
+from ..utils.proxy_config import get_proxy_config, connection_stats
+from .profile_cache import profile_cache, parse_profile_page
+from .records import ScrapedPage, ScrapedUser, loads
+
+settings = get_settings()
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Accept": "*/*",
+    "Accept-Language": "en-US,en;q=0.5",
+    "X-Requested-With": "XMLHttpRequest"
+}
+
+# One pooled client per event loop (each RQ job runs its own loop)
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def _http2_enabled() -> bool:
+    """HTTP/2 needs the optional h2 package"""
+    if not settings.http2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        print("HTTP/2 requested but h2 is not installed - using HTTP/1.1")
+        return False
+    return True
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Shared keep-alive AsyncClient of the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        proxy_config = get_proxy_config()
+        if proxy_config:
+            print(f"GraphQL using proxy configuration: {proxy_config.get('proxies', {})}")
+            if not proxy_config.get('verify'):
+                print("SSL verification disabled for proxy (no certificate found)")
+        
+        client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            timeout=httpx.Timeout(settings.timeout_seconds),
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+                keepalive_expiry=settings.http_keepalive_expiry
+            ),
+            http2=_http2_enabled(),
+            **proxy_config
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_async_client():
+    """Close the shared client of the running event loop"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+        print(f"HTTP connection reuse: {connection_stats.summary()}")
 
 
 class GraphQLScraper:
     """Instagram GraphQL scraper for public accounts"""
     
-    BASE_URL = "https://www.instagram.com/graphql/query/"
+    BASE_URL = f"{settings.instagram_base_url}/graphql/query/"
     FOLLOWERS_HASH = "5aefa9893005572d237da5068082d8d5"  # Instagram's query hash for followers
     FOLLOWING_HASH = "6df9f20c4ad9b22fb7b35b816f0c426e"  # Instagram's query hash for following
     
-    def __init__(self):
-        # Prepare httpx client arguments
-        client_args = {
-            "headers": {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                "Accept": "*/*",
-                "Accept-Language": "en-US,en;q=0.5",
-                "X-Requested-With": "XMLHttpRequest"
-            }
-        }
-        
-        # Add proxy configuration
-        proxy_config = get_proxy_config()
-        client_args.update(proxy_config)
-        
-        if proxy_config:
-            print(f"GraphQL using proxy configuration: {proxy_config.get('proxies', {})}")
-            if proxy_config.get('verify'):
-                print(f"Using SSL certificate: {proxy_config.get('verify')}")
-        
-        self.session = httpx.Client(**client_args)
+    def __init__(self, throttle: Optional[Callable[[], Awaitable[None]]] = None):
+        # Awaited before every request, e.g. to draw from a shared rate limit budget
+        self.throttle = throttle
+        # Profiles resolved by this scraper; concurrent lookups share one fetch
+        self._profiles: Dict[str, "asyncio.Future[Optional[Dict]]"] = {}
     
-    async def get_user_id(self, username: str) -> Optional[str]:
-        """Get user ID from username"""
+    async def _get(self, url: str, **kwargs) -> httpx.Response:
+        """GET through the throttle; 429 and 5xx responses are retried with backoff"""
+        for attempt in range(settings.max_retries + 1):
+            if self.throttle:
+                await self.throttle()
+            response = await self.client.get(url, extensions=connection_stats.record_request(), **kwargs)
+            if response.status_code != 429 and response.status_code < 500:
+                break
+            if attempt == settings.max_retries:
+                break
+            retry_after = response.headers.get("retry-after", "")
+            delay = float(retry_after) if retry_after.isdigit() else 2 ** attempt
+            print(f"Got {response.status_code} from {url}, retrying in {delay}s")
+            await asyncio.sleep(delay)
+        return response
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled client; requests never block the event loop"""
+        return get_async_client()
+    
+    def cached_profile(self, username: str) -> Optional[Dict]:
+        """Profile resolved earlier by this scraper or cached in Redis, without a request"""
+        pending = self._profiles.get(username)
+        if pending is not None and pending.done() and not pending.exception():
+            return pending.result()
+        return profile_cache.get(username)
+    
+    async def get_profile(self, username: str) -> Optional[Dict]:
+        """Profile (id and basic fields) of a username, fetching its page at most once"""
+        pending = self._profiles.get(username)
+        if pending is None:
+            pending = asyncio.ensure_future(self._fetch_profile(username))
+            self._profiles[username] = pending
+        return await asyncio.shield(pending)
+    
+    async def _fetch_profile(self, username: str) -> Optional[Dict]:
+        profile = profile_cache.get(username)
+        if profile:
+            return profile
+        
         try:
-            url = f"https://www.instagram.com/{username}/"
+            url = f"{settings.instagram_base_url}/{username}/"
             print(f"Fetching Instagram page for user: {url}")
-            response = self.session.get(url)
+            response = await self._get(url)
             print(f"Response status code: {response.status_code}")
             if response.status_code != 200:
                 print(f"Non-200 status code: {response.status_code}")
                 return None
             
-            # Extract user ID from page content
+            # Extract user ID and profile fields from page content
             content = response.text
             print(f"Response content length: {len(content)}")
-            user_id_match = re.search(r'"profilePage_([0-9]+)"', content)
-            if user_id_match:
-                user_id = user_id_match.group(1)
-                print(f"Found user ID: {user_id}")
-                return user_id
+            profile = parse_profile_page(content)
+            if profile:
+                print(f"Found user ID: {profile['id']}")
+                profile_cache.set(username, profile)
+                return profile
             else:
                 print("Could not find user ID in page content")
             
@@ -64,6 +148,11 @@ class GraphQLScraper:
             print(f"Error getting user ID: {e}")
             return None
     
+    async def get_user_id(self, username: str) -> Optional[str]:
+        """Get user ID from username"""
+        profile = await self.get_profile(username)
+        return profile["id"] if profile else None
+    
     async def fetch_followers(self, user_id: str, limit: int = 100, after: Optional[str] = None) -> Dict:
         """Fetch followers for a user"""
         variables = {
@@ -78,8 +167,8 @@ class GraphQLScraper:
         }
         
         try:
-            response = self.session.get(self.BASE_URL, params=params)
-            return response.json()
+            response = await self._get(self.BASE_URL, params=params)
+            return loads(response.content)
         except Exception as e:
             print(f"Error fetching followers: {e}")
             return {}
@@ -98,76 +187,81 @@ class GraphQLScraper:
         }
         
         try:
-            response = self.session.get(self.BASE_URL, params=params)
-            return response.json()
+            response = await self._get(self.BASE_URL, params=params)
+            return loads(response.content)
         except Exception as e:
             print(f"Error fetching following: {e}")
             return {}
     
-    def parse_user_data(self, node: Dict) -> Dict:
+    def parse_user_data(self, node: Dict) -> ScrapedUser:
         """Parse user data from GraphQL response"""
-        return {
-            "id": node.get("id"),
-            "username": node.get("username"),
-            "full_name": node.get("full_name"),
-            "profile_pic_url": node.get("profile_pic_url"),
-            "is_verified": node.get("is_verified", False),
-            "is_private": node.get("is_private", False)
-        }
+        return ScrapedUser.from_node(node)
     
-    async def get_all_followers(self, username: str) -> List[Dict]:
-        """Get all followers for a username"""
-        print(f"Getting user ID for {username} in GraphQL")
-        user_id = await self.get_user_id(username)
-        print(f"User ID from GraphQL: {user_id}")
-        if not user_id:
-            print(f"Failed to get user ID for {username}")
-            return []
-        
-        followers = []
-        after = None
+    async def iter_pages(
+        self,
+        user_id: str,
+        relation_type: str,
+        after: Optional[str] = None
+    ) -> AsyncIterator[ScrapedPage]:
+        """
+        Yield the followers or following of a user one GraphQL page at a time,
+        starting after the given cursor
+        """
+        if relation_type == "follower":
+            fetch, edge_key = self.fetch_followers, "edge_followed_by"
+        else:
+            fetch, edge_key = self.fetch_following, "edge_follow"
         
+        pages = 0
         while True:
-            data = await self.fetch_followers(user_id, after=after)
+            data = await fetch(user_id, after=after)
             
             if not data or "data" not in data:
+                if pages:
+                    # Ending here would record a truncated list as complete
+                    raise RuntimeError(f"GraphQL pagination failed after {pages} pages (cursor {after})")
                 break
+            pages += 1
             
-            edges = data["data"]["user"]["edge_followed_by"]["edges"]
-            for edge in edges:
-                followers.append(self.parse_user_data(edge["node"]))
+            edge = data["data"]["user"][edge_key]
+            page_info = edge["page_info"]
+            after = page_info["end_cursor"] if page_info["has_next_page"] else None
+            yield ScrapedPage([ScrapedUser.from_node(e["node"]) for e in edge["edges"]], after)
             
-            page_info = data["data"]["user"]["edge_followed_by"]["page_info"]
-            if not page_info["has_next_page"]:
+            if after is None:
                 break
-            
-            after = page_info["end_cursor"]
+    
+    async def iter_follower_pages(self, username: str, after: Optional[str] = None) -> AsyncIterator[ScrapedPage]:
+        """Yield followers of a username page by page"""
+        print(f"Getting user ID for {username} in GraphQL")
+        user_id = await self.get_user_id(username)
+        print(f"User ID from GraphQL: {user_id}")
+        if not user_id:
+            print(f"Failed to get user ID for {username}")
+            return
         
-        return followers
+        async for page in self.iter_pages(user_id, "follower", after):
+            yield page
     
-    async def get_all_following(self, username: str) -> List[Dict]:
-        """Get all following for a username"""
+    async def iter_following_pages(self, username: str, after: Optional[str] = None) -> AsyncIterator[ScrapedPage]:
+        """Yield following of a username page by page"""
         user_id = await self.get_user_id(username)
         if not user_id:
-            return []
+            return
         
+        async for page in self.iter_pages(user_id, "following", after):
+            yield page
+    
+    async def get_all_followers(self, username: str) -> List[ScrapedUser]:
+        """Get all followers for a username"""
+        followers = []
+        async for page in self.iter_follower_pages(username):
+            followers.extend(page.users)
+        return followers
+    
+    async def get_all_following(self, username: str) -> List[ScrapedUser]:
+        """Get all following for a username"""
         following = []
-        after = None
-        
-        while True:
-            data = await self.fetch_following(user_id, after=after)
-            
-            if not data or "data" not in data:
-                break
-            
-            edges = data["data"]["user"]["edge_follow"]["edges"]
-            for edge in edges:
-                following.append(self.parse_user_data(edge["node"]))
-            
-            page_info = data["data"]["user"]["edge_follow"]["page_info"]
-            if not page_info["has_next_page"]:
-                break
-            
-            after = page_info["end_cursor"]
-        
-        return following
\ No newline at end of file
+        async for page in self.iter_following_pages(username):
+            following.extend(page.users)
+        return following
@@ -1,4 +1,4 @@
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
 from instagrapi import Client
 from instagrapi.exceptions import LoginRequired, PleaseWaitFewMinutes
 import time
@@ -7,7 +7,9 @@ import os
 import urllib3
 from ..config import get_settings
 from ..services.credential_service import CredentialService
+from ..services.session_store import session_store
 from .graphql_scraper import GraphQLScraper
+from .records import ScrapedPage, ScrapedUser
 from ..utils.proxy_config import configure_instagrapi_proxy
 from sqlmodel import Session
 
@@ -16,14 +18,25 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 settings = get_settings()
 
+# Checkpoint cursors of the instagrapi fallback carry this prefix (GraphQL cursors don't)
+PRIVATE_CURSOR_PREFIX = "v1:"
+
 
 class InstagramScraper:
     """Main Instagram scraper with GraphQL + instagrapi fallback"""
     
-    def __init__(self, session: Optional[Session] = None):
-        self.graphql_scraper = GraphQLScraper()
+    def __init__(
+        self,
+        session: Optional[Session] = None,
+        throttle: Optional[Callable[[], Awaitable[None]]] = None
+    ):
+        # throttle is awaited before every request (GraphQL page, instagrapi chunk)
+        self.throttle = throttle
+        self.graphql_scraper = GraphQLScraper(throttle=throttle)
         self.private_client = None
         self.is_authenticated = False
+        # instagrapi calls block, so they run in a thread, one at a time per client
+        self._private_lock = asyncio.Lock()
         self.session = session
         self.credential_service = CredentialService()
         
@@ -46,132 +59,216 @@ class InstagramScraper:
             # Configure proxy if enabled
             configure_instagrapi_proxy(self.private_client)
             
-            # Login using the credentials
+            # Restore the saved session of this login if there is one; it is only
+            # validated by the first real request (see _private_call)
             username, password = credentials
-            self.private_client.login(username, password)
+            stored = session_store.load(username)
+            if stored:
+                print(f"Restoring saved session for {username}")
+                self.private_client.set_settings(stored)
+            
+            # With a restored session this returns without a login request
+            await asyncio.to_thread(self.private_client.login, username, password)
+            session_store.save(username, self.private_client.get_settings())
             self.is_authenticated = True
             return True
         except Exception as e:
             print(f"Failed to initialize private client: {e}")
+            self.private_client = None
             return False
     
-    def standardize_user_data(self, user: Dict, source: str = "graphql") -> Dict:
+    def standardize_user_data(self, user, source: str = "graphql") -> ScrapedUser:
         """Standardize user data from different sources"""
         if source == "graphql":
             return user
-        else:  # instagrapi format
-            return {
-                "id": str(user.get("pk", user.get("id", ""))),
-                "username": user.get("username", ""),
-                "full_name": user.get("full_name", ""),
-                "profile_pic_url": user.get("profile_pic_url", ""),
-                "is_verified": user.get("is_verified", False),
-                "is_private": user.get("is_private", False)
-            }
+        else:  # instagrapi model
+            return ScrapedUser.from_instagrapi(user)
     
-    async def scrape_followers(self, username: str, use_private: bool = False) -> List[Dict]:
-        """Scrape followers with GraphQL first, fallback to instagrapi"""
-        followers = []
-        
-        print(f"Starting follower scrape for {username} (use_private: {use_private})")
-        
-        # Try GraphQL first
-        try:
-            print(f"Trying GraphQL scraper for {username}")
-            followers = await self.graphql_scraper.get_all_followers(username)
-            print(f"GraphQL returned {len(followers)} followers")
-            if followers:
-                return followers
-        except Exception as e:
-            print(f"GraphQL scraper failed for {username}: {e}")
+    async def _private_call(self, method: Callable, *args):
+        """
+        Run one blocking instagrapi request in a thread, within the request budget.
+        An expired session is replaced by a fresh login once, then the request is retried.
+        """
+        async with self._private_lock:
+            if self.throttle:
+                await self.throttle()
+            try:
+                return await asyncio.to_thread(method, *args)
+            except LoginRequired:
+                print(f"Saved session of {self.private_client.username} expired, logging in again")
+                try:
+                    await asyncio.to_thread(self.private_client.relogin)
+                except Exception:
+                    session_store.delete(self.private_client.username)
+                    raise
+                session_store.save(self.private_client.username, self.private_client.get_settings())
+            
+            if self.throttle:
+                await self.throttle()
+            return await asyncio.to_thread(method, *args)
+    
+    async def _private_pages(
+        self,
+        username: str,
+        relation_type: str,
+        max_id: Optional[str] = None
+    ) -> AsyncIterator[ScrapedPage]:
+        """
+        Yield a follower/following list through instagrapi one chunk at a time,
+        starting at max_id. Errors before the first chunk end the list quietly
+        (as GraphQL does); later ones are raised so the scrape can resume.
+        """
+        label = "followers" if relation_type == "follower" else "following"
         
-        # Fallback to instagrapi if needed or requested
-        if use_private or not followers:
-            print(f"Using private client for {username}")
+        print(f"Using private client for {label} of {username}")
+        async with self._private_lock:
             if not self.is_authenticated:
                 print(f"Initializing private client for {username}")
                 success = await self.initialize_private_client(username)
                 print(f"Private client initialization result: {success}")
-            
-            if self.private_client:
-                try:
-                    print(f"Getting user ID for {username}")
-                    user_id = self.private_client.user_id_from_username(username)
+        
+        if not self.private_client:
+            print("Private client is not available")
+            return
+        
+        if relation_type == "follower":
+            fetch_chunk = self.private_client.user_followers_v1_chunk
+        else:
+            fetch_chunk = self.private_client.user_following_v1_chunk
+        
+        scraped = 0
+        retries = 0
+        user_id = None
+        while True:
+            try:
+                if user_id is None:
+                    profile = self.graphql_scraper.cached_profile(username)
+                    if profile:
+                        user_id = profile["id"]
+                    else:
+                        print(f"Getting user ID for {username}")
+                        user_id = await self._private_call(self.private_client.user_id_from_username, username)
                     print(f"User ID: {user_id}")
-                    followers_raw = self.private_client.user_followers(user_id)
-                    print(f"Retrieved {len(followers_raw)} followers from instagrapi")
-                    followers = [
-                        self.standardize_user_data(f.dict(), "instagrapi") 
-                        for f in followers_raw
-                    ]
-                except PleaseWaitFewMinutes:
-                    print("Rate limited, waiting...")
-                    await asyncio.sleep(60)
-                except Exception as e:
-                    print(f"Instagrapi scraper failed: {e}")
-            else:
-                print("Private client is not available")
+                
+                users, max_id = await self._private_call(
+                    fetch_chunk, user_id, settings.private_page_size, max_id or ""
+                )
+            except PleaseWaitFewMinutes:
+                retries += 1
+                if retries > settings.max_retries:
+                    raise
+                print("Rate limited, waiting...")
+                await asyncio.sleep(60)
+                continue
+            except Exception as e:
+                if scraped:
+                    raise
+                print(f"Instagrapi scraper failed for {label}: {e}")
+                return
+            
+            retries = 0
+            scraped += len(users)
+            yield ScrapedPage(
+                [ScrapedUser.from_instagrapi(u) for u in users],
+                f"{PRIVATE_CURSOR_PREFIX}{max_id}" if max_id else None
+            )
+            if not max_id:
+                break
         
-        print(f"Returning {len(followers)} followers for {username}")
-        return followers
+        print(f"Retrieved {scraped} {label} from instagrapi")
     
-    async def scrape_following(self, username: str, use_private: bool = False) -> List[Dict]:
-        """Scrape following with GraphQL first, fallback to instagrapi"""
-        following = []
+    def cached_profile(self, username: str) -> Optional[Dict]:
+        """Profile fields seen while scraping (id, names, flags, counts), if any"""
+        return self.graphql_scraper.cached_profile(username)
+    
+    async def iter_relation(
+        self,
+        username: str,
+        relation_type: str,
+        use_private: bool = False,
+        after: Optional[str] = None
+    ) -> AsyncIterator[ScrapedPage]:
+        """
+        Yield followers ('follower') or following ('following') page by page,
+        GraphQL first with instagrapi as fallback when GraphQL returns nothing.
+        A cursor from an earlier attempt resumes the list after that page with
+        the source that produced it.
+        """
+        label = "followers" if relation_type == "follower" else "following"
+        print(f"Starting {label} scrape for {username} (use_private: {use_private})")
         
-        print(f"Starting following scrape for {username} (use_private: {use_private})")
+        if after and after.startswith(PRIVATE_CURSOR_PREFIX):
+            async for page in self._private_pages(username, relation_type, after[len(PRIVATE_CURSOR_PREFIX):]):
+                yield page
+            return
         
         # Try GraphQL first
+        scraped = 0
         try:
-            print(f"Trying GraphQL scraper for following of {username}")
-            following = await self.graphql_scraper.get_all_following(username)
-            print(f"GraphQL returned {len(following)} following")
-            if following:
-                return following
+            print(f"Trying GraphQL scraper for {label} of {username}")
+            if relation_type == "follower":
+                pages = self.graphql_scraper.iter_follower_pages(username, after)
+            else:
+                pages = self.graphql_scraper.iter_following_pages(username, after)
+            async for page in pages:
+                scraped += len(page.users)
+                yield page
+            print(f"GraphQL returned {scraped} {label}")
         except Exception as e:
-            print(f"GraphQL scraper failed for following: {e}")
+            print(f"GraphQL scraper failed for {label}: {e}")
+            if scraped:
+                # Pages are already stored; let the scrape end PARTIAL and resume
+                raise
         
-        # Fallback to instagrapi if needed or requested
-        if use_private or not following:
-            print(f"Using private client for following of {username}")
-            if not self.is_authenticated:
-                print(f"Initializing private client for {username}")
-                success = await self.initialize_private_client(username)
-                print(f"Private client initialization result: {success}")
-            
-            if self.private_client:
-                try:
-                    print(f"Getting user ID for {username}")
-                    user_id = self.private_client.user_id_from_username(username)
-                    print(f"User ID: {user_id}")
-                    following_raw = self.private_client.user_following(user_id)
-                    print(f"Retrieved {len(following_raw)} following from instagrapi")
-                    following = [
-                        self.standardize_user_data(f.dict(), "instagrapi") 
-                        for f in following_raw
-                    ]
-                except PleaseWaitFewMinutes:
-                    print("Rate limited, waiting...")
-                    await asyncio.sleep(60)
-                except Exception as e:
-                    print(f"Instagrapi scraper failed for following: {e}")
-            else:
-                print("Private client is not available")
+        if scraped:
+            return
         
-        print(f"Returning {len(following)} following for {username}")
-        return following
+        # Fallback to instagrapi if GraphQL returned nothing
+        async for page in self._private_pages(username, relation_type):
+            scraped += len(page.users)
+            yield page
+        
+        if after and not scraped:
+            # A stale cursor and no fallback: completing now would truncate the list
+            raise RuntimeError(f"Could not resume {label} of {username} from the saved cursor")
     
-    async def scrape_both(self, username: str, use_private: bool = False) -> Dict[str, List[Dict]]:
-        """Scrape both followers and following"""
-        from ..utils.rate_limiter import SlidingWindowRateLimiter
+    async def iter_followers(self, username: str, use_private: bool = False) -> AsyncIterator[ScrapedPage]:
+        """Yield followers page by page"""
+        async for page in self.iter_relation(username, "follower", use_private):
+            yield page
+    
+    async def iter_following(self, username: str, use_private: bool = False) -> AsyncIterator[ScrapedPage]:
+        """Yield following page by page"""
+        async for page in self.iter_relation(username, "following", use_private):
+            yield page
+    
+    async def scrape_followers(self, username: str, use_private: bool = False) -> List[ScrapedUser]:
+        """Scrape followers with GraphQL first, fallback to instagrapi"""
+        followers = []
+        async for page in self.iter_followers(username, use_private):
+            followers.extend(page.users)
         
-        rate_limiter = SlidingWindowRateLimiter()
+        print(f"Returning {len(followers)} followers for {username}")
+        return followers
+    
+    async def scrape_following(self, username: str, use_private: bool = False) -> List[ScrapedUser]:
+        """Scrape following with GraphQL first, fallback to instagrapi"""
+        following = []
+        async for page in self.iter_following(username, use_private):
+            following.extend(page.users)
         
-        # Add delay with jitter between requests
-        followers = await self.scrape_followers(username, use_private)
-        delay = rate_limiter.get_delay_with_jitter()
-        await asyncio.sleep(delay)
-        following = await self.scrape_following(username, use_private)
+        print(f"Returning {len(following)} following for {username}")
+        return following
+    
+    async def scrape_both(self, username: str, use_private: bool = False) -> Dict[str, List[ScrapedUser]]:
+        """
+        Scrape followers and following concurrently; with a throttle both
+        paginations draw from the same request budget.
+        """
+        followers, following = await asyncio.gather(
+            self.scrape_followers(username, use_private),
+            self.scrape_following(username, use_private)
+        )
         
         return {
             "followers": followers,
@@ -0,0 +1,80 @@
+"""
+Shared cache of Instagram profiles keyed by username.
+The profile page the GraphQL scraper downloads to resolve a user id also carries
+the basic profile fields; they are parsed from the same response and kept in
+Redis for settings.instagram_cache_ttl, so later scrapes (and the instagrapi
+fallback) skip the lookup and tracked accounts get their metadata for free.
+"""
+import json
+import re
+from typing import Dict, Optional
+
+import redis
+
+from ..config import get_settings
+
+settings = get_settings()
+
+# Profile attributes mirrored onto the tracked Account row
+ACCOUNT_FIELDS = ("full_name", "profile_pic_url", "is_verified", "is_private")
+
+_USER_ID = re.compile(r'"profilePage_([0-9]+)"')
+_STRING = r'("(?:[^"\\]|\\.)*")'
+_PATTERNS = {
+    "full_name": (re.compile(r'"full_name":' + _STRING), json.loads),
+    "profile_pic_url": (re.compile(r'"profile_pic_url":' + _STRING), json.loads),
+    "is_verified": (re.compile(r'"is_verified":(true|false)'), lambda v: v == "true"),
+    "is_private": (re.compile(r'"is_private":(true|false)'), lambda v: v == "true"),
+    "follower_count": (re.compile(r'"edge_followed_by":\{"count":(\d+)\}'), int),
+    "following_count": (re.compile(r'"edge_follow":\{"count":(\d+)\}'), int),
+}
+
+
+def parse_profile_page(content: str) -> Optional[Dict]:
+    """
+    Profile of the user a profile page belongs to. Fields are read from the
+    page's embedded JSON after the user id marker; missing ones are left out.
+    """
+    match = _USER_ID.search(content)
+    if not match:
+        return None
+
+    profile = {"id": match.group(1)}
+    for field, (pattern, convert) in _PATTERNS.items():
+        value = pattern.search(content, match.end())
+        if value:
+            profile[field] = convert(value.group(1))
+    return profile
+
+
+class ProfileCache:
+    """Redis-backed username -> profile cache; a no-op when disabled or unreachable"""
+
+    def __init__(self, redis_conn: Optional[redis.Redis] = None):
+        self.redis_conn = redis_conn or redis.from_url(settings.redis_url)
+        self.enabled = settings.use_instagram_cache
+        self.ttl = settings.instagram_cache_ttl
+
+    def _get_key(self, username: str) -> str:
+        return f"ig_profile:{username.lower()}"
+
+    def get(self, username: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        try:
+            cached = self.redis_conn.get(self._get_key(username))
+        except redis.RedisError as e:
+            print(f"Profile cache unavailable: {e}")
+            return None
+        return json.loads(cached) if cached else None
+
+    def set(self, username: str, profile: Dict):
+        if not self.enabled:
+            return
+        try:
+            self.redis_conn.setex(self._get_key(username), self.ttl, json.dumps(profile))
+        except redis.RedisError as e:
+            print(f"Profile cache unavailable: {e}")
+
+
+profile_cache = ProfileCache()
@@ -0,0 +1,56 @@
+"""
+Compact records produced by every scraper source.
+A scraped user is a ScrapedUser tuple built straight from the GraphQL node or
+the instagrapi model (no intermediate dicts), and GraphQL responses are decoded
+with orjson when it is installed. See benchmarks/bench_parse.py.
+"""
+import json
+from typing import Dict, List, NamedTuple, Optional
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:  # pragma: no cover - orjson is optional
+    loads = json.loads
+
+
+class ScrapedUser(NamedTuple):
+    """Profile attributes of one follower/following entry"""
+    id: int
+    username: str
+    full_name: Optional[str] = None
+    profile_pic_url: Optional[str] = None
+    is_verified: bool = False
+    is_private: bool = False
+
+    @classmethod
+    def from_node(cls, node: Dict) -> "ScrapedUser":
+        """From a GraphQL edge node (or any dict with the same keys)"""
+        return tuple.__new__(cls, (
+            int(node["id"]),
+            node["username"],
+            node.get("full_name"),
+            node.get("profile_pic_url"),
+            bool(node.get("is_verified")),
+            bool(node.get("is_private")),
+        ))
+
+    @classmethod
+    def from_instagrapi(cls, user) -> "ScrapedUser":
+        """From an instagrapi UserShort/User model, reading its attributes directly"""
+        pic = user.profile_pic_url
+        return tuple.__new__(cls, (
+            int(user.pk),
+            user.username,
+            user.full_name or None,
+            str(pic) if pic else None,
+            bool(getattr(user, "is_verified", False)),
+            bool(user.is_private),
+        ))
+
+
+class ScrapedPage(NamedTuple):
+    """One page of a follower/following list and the cursor that continues after it"""
+    users: List[ScrapedUser]
+    # None once the list is exhausted (or the source has no cursors)
+    end_cursor: Optional[str]
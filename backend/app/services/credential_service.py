@@ -3,6 +3,7 @@ from typing import Optional, Tuple
 from sqlmodel import Session, select
 from ..models import Account
 from ..utils.crypto import encrypt_credential, decrypt_credential
+from .session_store import session_store
 from ..database import get_session
 
 
@@ -70,6 +71,7 @@ class CredentialService:
             if account:
                 account.encrypted_password = None
                 session.commit()
+                session_store.delete(username)
                 return True
                 
             return False
@@ -0,0 +1,55 @@
+"""Encrypted storage of instagrapi login sessions, one per Instagram login"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from ..config import get_settings
+from ..utils.crypto import encrypt_credential, decrypt_credential
+
+settings = get_settings()
+
+
+class SessionStore:
+    """
+    Keep instagrapi client settings (cookies, auth headers, device ids) between jobs
+    so a private scrape restores its session instead of logging in again.
+    Sessions are encrypted with the credential key; unreadable ones are ignored.
+    """
+    
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(directory or settings.instagram_session_dir)
+    
+    def _path(self, username: str) -> Path:
+        digest = hashlib.sha256(username.lower().encode()).hexdigest()[:32]
+        return self.directory / f"{digest}.session"
+    
+    def load(self, username: str) -> Optional[Dict]:
+        """Stored client settings of a login, or None"""
+        path = self._path(username)
+        if not path.exists():
+            return None
+        decrypted = decrypt_credential(path.read_text())
+        if not decrypted:
+            return None
+        try:
+            return json.loads(decrypted)
+        except ValueError as e:
+            print(f"Ignoring unreadable session of {username}: {e}")
+            return None
+    
+    def save(self, username: str, client_settings: Dict):
+        """Encrypt and store client settings, replacing the previous session atomically"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(username)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(encrypt_credential(json.dumps(client_settings)))
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, path)
+    
+    def delete(self, username: str):
+        self._path(username).unlink(missing_ok=True)
+
+
+session_store = SessionStore()
@@ -0,0 +1,49 @@
+"""
+Compact encoding for per-scrape follower/following id sets.
+Ids are stored sorted and unique, delta-encoded and zlib-compressed, so the
+set operations on them are plain numpy calls on int64 arrays.
+"""
+import zlib
+from typing import Iterable
+
+import numpy as np
+
+EMPTY = np.empty(0, dtype=np.int64)
+
+
+def to_id_array(ids: Iterable) -> np.ndarray:
+    """Build a sorted, unique int64 array from any iterable of ids"""
+    if isinstance(ids, np.ndarray):
+        return np.unique(ids.astype(np.int64, copy=False))
+    return np.unique(np.fromiter((int(i) for i in ids), dtype=np.int64))
+
+
+def encode_id_set(ids: np.ndarray) -> bytes:
+    """Encode a sorted unique id array as compressed deltas"""
+    if not len(ids):
+        return b""
+    deltas = np.diff(ids, prepend=np.int64(0))
+    return zlib.compress(deltas.astype("<i8").tobytes())
+
+
+def decode_id_set(blob: bytes) -> np.ndarray:
+    """Decode an id set written by encode_id_set"""
+    if not blob:
+        return EMPTY
+    deltas = np.frombuffer(zlib.decompress(blob), dtype="<i8")
+    return np.cumsum(deltas, dtype=np.int64)
+
+
+def difference(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Ids in a that are not in b"""
+    return np.setdiff1d(a, b, assume_unique=True)
+
+
+def intersection(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Ids present in both a and b"""
+    return np.intersect1d(a, b, assume_unique=True)
+
+
+def union(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Ids present in a or b"""
+    return np.union1d(a, b)
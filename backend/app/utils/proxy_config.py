@@ -1,11 +1,23 @@
 """
 Proxy configuration utilities for BrightData integration
+
+The combined certificate bundle and its SSLContext are built once per bundle
+content (keyed by a SHA-256 of the certificates) and shared by every client of
+the process. The bundle file is written once to a content-addressed path in a
+temp subdirectory owned by this module, where superseded bundles are removed,
+and later processes (RQ forks one per job) reuse it. The SSLContext and the
+pooled HTTP clients do not outlive their process; the clients are closed at the
+end of every worker task.
 """
 import os
 import ssl
+import glob
 import random
+import socket
+import hashlib
 import tempfile
-from typing import Optional, Dict
+import threading
+from typing import Optional, Dict, Union, List, Tuple
 from pathlib import Path
 from ..config import get_settings
 import logging
@@ -13,6 +25,45 @@ import httpx
 
 logger = logging.getLogger(__name__)
 
+BUNDLE_DIR = "igcrawl-ca"
+
+_bundle_lock = threading.Lock()
+# Bundle path and SSLContext per bundle content hash
+_bundles: Dict[str, str] = {}
+_ssl_contexts: Dict[str, ssl.SSLContext] = {}
+# Source files (path, mtime, size) -> content hash, so unchanged sources aren't re-read
+_source_hashes: Dict[Tuple, str] = {}
+
+
+class ConnectionStats:
+    """
+    Counts requests and newly opened connections of the pooled HTTP clients
+    through httpx's trace extension; every other request reused a connection.
+    """
+    
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+    
+    async def trace(self, event_name: str, info: Dict):
+        if event_name == "connection.connect_tcp.complete":
+            self.connections += 1
+    
+    def record_request(self) -> Dict:
+        """Request extensions that feed the trace into these stats"""
+        self.requests += 1
+        return {"trace": self.trace}
+    
+    @property
+    def reused(self) -> int:
+        return max(self.requests - self.connections, 0)
+    
+    def summary(self) -> Dict[str, int]:
+        return {"requests": self.requests, "connections": self.connections, "reused": self.reused}
+
+
+connection_stats = ConnectionStats()
+
 def get_brightdata_certificate_path() -> Optional[str]:
     """
     Get the path to BrightData SSL certificate specifically for port 33335.
@@ -80,6 +131,17 @@ def get_proxy_url(with_session=True) -> str:
     # Return properly formatted proxy URL
     return f"http://{username}:{settings.proxy_password}@{settings.proxy_host}:{settings.proxy_port}"
 
+def request_identity() -> str:
+    """
+    Identity Instagram sees behind our requests, used as the rate limit key:
+    the proxy account when requests are proxied, this host otherwise. Every job
+    sending requests through it shares one budget, whatever account it scrapes.
+    """
+    settings = get_settings()
+    if settings.use_proxy:
+        return f"proxy:{settings.proxy_username}@{settings.proxy_host}:{settings.proxy_port}"
+    return f"host:{socket.gethostname()}"
+
 def create_ssl_context() -> ssl.SSLContext:
     """
     Create SSL context with BrightData certificate
@@ -108,18 +170,11 @@ def test_proxy_connection() -> bool:
     
     proxy_url = get_proxy_url(with_session=True)
     
-    # Create a combined certificate bundle for better compatibility
-    bundle_path = create_combined_certificate_bundle()
-    
     try:
-        # Get certificate path
-        cert_path = bundle_path if bundle_path else get_brightdata_certificate_path()
-        logger.info(f"Testing proxy connection using certificate: {cert_path}")
-        
-        # Test with httpx client using the certificate if available
+        # Test with httpx client using the shared certificate context if available
         client = httpx.Client(
             proxy=proxy_url,
-            verify=cert_path if cert_path else False
+            verify=get_ssl_context()
         )
         
         response = client.get('https://lumtest.com/myip.json', timeout=10)
@@ -157,17 +212,8 @@ def get_proxy_config(with_session=True) -> Dict[str, any]:
     
     proxy_url = get_proxy_url(with_session=with_session)
     
-    # Create a combined certificate bundle for better compatibility
-    bundle_path = create_combined_certificate_bundle()
-    
-    # If we have a bundle, use it; otherwise, use the primary certificate
-    if bundle_path:
-        verify = bundle_path
-        logger.info(f"Using combined certificate bundle: {bundle_path}")
-    else:
-        cert_path = get_brightdata_certificate_path()
-        verify = cert_path if cert_path else False
-        logger.info(f"Using single certificate: {cert_path}")
+    # Shared SSLContext of the combined bundle (or the primary certificate)
+    verify = get_ssl_context()
     
     config = {
         "proxies": {
@@ -194,17 +240,8 @@ def configure_httpx_client(client: httpx.Client, with_session=True) -> None:
     
     proxy_url = get_proxy_url(with_session=with_session)
     
-    # Create a combined certificate bundle for better compatibility
-    bundle_path = create_combined_certificate_bundle()
-    
-    # If we have a bundle, use it; otherwise, use the primary certificate
-    if bundle_path:
-        verify = bundle_path
-        logger.info(f"Configuring httpx client with certificate bundle: {bundle_path}")
-    else:
-        cert_path = get_brightdata_certificate_path()
-        verify = cert_path if cert_path else False
-        logger.info(f"Configuring httpx client with certificate: {cert_path}")
+    # Shared SSLContext of the combined bundle (or the primary certificate)
+    verify = get_ssl_context()
     
     # httpx uses proxy (singular) for all protocols
     client._proxy = proxy_url
@@ -282,18 +319,14 @@ def configure_instagrapi_proxy(client, with_session=True) -> None:
         except Exception as fallback_e:
             logger.error(f"Could not even configure fallback settings: {fallback_e}")
 
-def create_combined_certificate_bundle() -> Optional[str]:
-    """
-    Create a combined certificate bundle if multiple certificates exist
-    """
-    logger.info("Creating combined certificate bundle...")
+def _certificate_files() -> List[str]:
+    """Certificate files that make up the combined bundle"""
     cert_files = []
     
     # Main certificate paths to try
     main_cert_path = get_brightdata_certificate_path()
     if main_cert_path:
         cert_files.append(main_cert_path)
-        logger.info(f"Added primary certificate: {main_cert_path}")
     
     # List of additional certificate files to combine
     project_root = Path(__file__).parent.parent.parent.parent
@@ -313,22 +346,107 @@ def create_combined_certificate_bundle() -> Optional[str]:
     for path in additional_cert_paths:
         if os.path.exists(str(path)):
             cert_files.append(str(path))
-            logger.info(f"Added additional certificate: {path}")
     
+    return cert_files
+
+
+def _read_certificates(cert_files: List[str]) -> str:
+    parts = []
+    for cert_file in cert_files:
+        try:
+            with open(cert_file, 'r') as f:
+                parts.append(f.read())
+                parts.append('\n')
+        except Exception as e:
+            logger.error(f"Error reading certificate file {cert_file}: {e}")
+    return "".join(parts)
+
+
+def _bundle_dir() -> str:
+    """Temp subdirectory holding the bundles; nothing else is written there"""
+    path = os.path.join(tempfile.gettempdir(), BUNDLE_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _remove_stale_bundles(keep: str):
+    """Drop bundles of superseded certificate contents"""
+    for path in glob.glob(os.path.join(os.path.dirname(keep), "*.bundle.crt")):
+        if path != keep:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+def _write_bundle(key: str, content: str) -> str:
+    bundle_dir = _bundle_dir()
+    bundle_path = os.path.join(bundle_dir, f"{key}.bundle.crt")
+    if not os.path.exists(bundle_path):
+        # Write then rename, so concurrent processes never read a partial bundle
+        fd, tmp_path = tempfile.mkstemp(suffix=".part", dir=bundle_dir)
+        with os.fdopen(fd, 'w') as bundle:
+            bundle.write(content)
+        os.replace(tmp_path, bundle_path)
+        logger.info(f"Created certificate bundle at: {bundle_path}")
+    _remove_stale_bundles(keep=bundle_path)
+    return bundle_path
+
+
+def _bundle_key() -> Optional[str]:
+    """Content hash of the current certificate bundle; sources are only re-read when they change"""
+    cert_files = _certificate_files()
     if not cert_files:
-        logger.warning("No certificate files found for bundle")
         return None
     
-    # Create temporary bundle file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.bundle.crt', delete=False) as bundle:
-        bundle_path = bundle.name
-        for cert_file in cert_files:
-            try:
-                with open(cert_file, 'r') as f:
-                    bundle.write(f.read())
-                    bundle.write('\n')
-            except Exception as e:
-                logger.error(f"Error reading certificate file {cert_file}: {e}")
+    sources = []
+    for path in cert_files:
+        stat = os.stat(path)
+        sources.append((path, stat.st_mtime_ns, stat.st_size))
+    sources = tuple(sources)
+    
+    key = _source_hashes.get(sources)
+    if key is not None and os.path.exists(_bundles[key]):
+        return key
+    
+    content = _read_certificates(cert_files)
+    key = hashlib.sha256(content.encode()).hexdigest()[:16]
+    _source_hashes[sources] = key
+    _bundles[key] = _write_bundle(key, content)
+    return key
+
+
+def create_combined_certificate_bundle() -> Optional[str]:
+    """
+    Path of the combined certificate bundle, built once per certificate content
+    """
+    with _bundle_lock:
+        key = _bundle_key()
+        if key is None:
+            logger.warning("No certificate files found for bundle")
+            return None
+        return _bundles[key]
+
+
+def get_ssl_context() -> Union[ssl.SSLContext, bool]:
+    """
+    Shared SSLContext that trusts the combined bundle (or the single BrightData
+    certificate); False when no certificate is available
+    """
+    with _bundle_lock:
+        key = _bundle_key()
+        if key is None:
+            cert_path = get_brightdata_certificate_path()
+            if not cert_path:
+                return False
+            key = f"single:{cert_path}"
+            cafile = cert_path
+        else:
+            cafile = _bundles[key]
         
-        logger.info(f"Created certificate bundle at: {bundle_path}")
-        return bundle_path
\ No newline at end of file
+        context = _ssl_contexts.get(key)
+        if context is None:
+            context = ssl.create_default_context(cafile=cafile)
+            _ssl_contexts[key] = context
+            logger.info(f"Created SSL context from: {cafile}")
+        return context
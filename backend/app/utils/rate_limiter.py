@@ -2,6 +2,7 @@ import time
 import random
 import json
 import asyncio
+import uuid
 from typing import Dict, Optional
 from datetime import datetime, timedelta
 from collections import deque
@@ -10,6 +11,48 @@ from ..config import get_settings
 
 settings = get_settings()
 
+# Check (and optionally record) one request against every limit of an
+# identifier inside Redis, so the decision is a single atomic round trip.
+# KEYS: request log (sorted set scored by time), backoff key (timestamp)
+# ARGV: now, window seconds, max per window, max per hour, max per minute,
+#       reserve (1 records the request when allowed), unique member
+# Returns {1} when allowed, {0, wait_seconds} otherwise.
+RESERVE_SCRIPT = """
+local now = tonumber(ARGV[1])
+
+local backoff_until = tonumber(redis.call('GET', KEYS[2]) or '')
+if backoff_until and backoff_until > now then
+    return {0, tostring(backoff_until - now)}
+end
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - 3600)
+
+local wait = 0
+local limits = {{tonumber(ARGV[2]), tonumber(ARGV[3])}, {3600, tonumber(ARGV[4])}, {60, tonumber(ARGV[5])}}
+for _, limit in ipairs(limits) do
+    local span, max_requests = limit[1], limit[2]
+    local count = redis.call('ZCOUNT', KEYS[1], now - span, '+inf')
+    if count >= max_requests then
+        -- One more fits once the request count - max_requests places from the
+        -- oldest in the span has left it
+        local entry = redis.call('ZRANGEBYSCORE', KEYS[1], now - span, '+inf', 'WITHSCORES', 'LIMIT', count - max_requests, 1)
+        local until_free = entry[2] and (tonumber(entry[2]) + span - now) or 60
+        if until_free > wait then
+            wait = until_free
+        end
+    end
+end
+if wait > 0 then
+    return {0, tostring(wait)}
+end
+
+if ARGV[6] == '1' then
+    redis.call('ZADD', KEYS[1], now, ARGV[1] .. ':' .. ARGV[7])
+    redis.call('EXPIRE', KEYS[1], 3600)
+end
+return {1}
+"""
+
 
 class SlidingWindowRateLimiter:
     """
@@ -26,6 +69,7 @@ class SlidingWindowRateLimiter:
         self.requests_per_minute = settings.rate_limit_per_minute
         self.max_requests_per_window = 20  # ~20 requests per 11 minutes
         self.max_requests_per_hour = 180  # Stay under 200 hard cap
+        self._reserve_script = self.redis_conn.register_script(RESERVE_SCRIPT)
         
         # Jitter settings
         self.jitter_min = getattr(settings, 'jitter_seconds_min', 5)
@@ -39,58 +83,50 @@ class SlidingWindowRateLimiter:
         """Get Redis key for backoff tracking"""
         return f"backoff:{identifier}"
     
+    def _decide(self, identifier: str, reserve: bool) -> tuple[bool, Optional[float]]:
+        """Run RESERVE_SCRIPT for an identifier: one round trip, atomic on the server"""
+        result = self._reserve_script(
+            keys=[self._get_key(identifier), self._get_backoff_key(identifier)],
+            args=[
+                repr(time.time()),
+                self.window_minutes * 60,
+                self.max_requests_per_window,
+                self.max_requests_per_hour,
+                self.requests_per_minute,
+                1 if reserve else 0,
+                uuid.uuid4().hex,
+            ]
+        )
+        if result[0] == 1:
+            return True, None
+        return False, max(float(result[1]), 1)
+    
     def can_make_request(self, identifier: str) -> tuple[bool, Optional[float]]:
         """
         Check if request can be made and return wait time if not.
         Returns: (can_request, wait_seconds)
         """
-        # Check if in backoff period
-        backoff_until = self.redis_conn.get(self._get_backoff_key(identifier))
-        if backoff_until:
-            backoff_time = float(backoff_until)
-            if time.time() < backoff_time:
-                return False, backoff_time - time.time()
-        
-        # Get request history
-        key = self._get_key(identifier)
-        now = time.time()
-        window_start = now - (self.window_minutes * 60)
-        hour_start = now - 3600
-        
-        # Clean old entries
-        self.redis_conn.zremrangebyscore(key, 0, window_start)
-        
-        # Count requests in sliding window
-        window_count = self.redis_conn.zcount(key, window_start, now)
-        hour_count = self.redis_conn.zcount(key, hour_start, now)
-        
-        # Check limits
-        if window_count >= self.max_requests_per_window:
-            # Find oldest request in window to calculate wait time
-            oldest = self.redis_conn.zrange(key, 0, 0, withscores=True)
-            if oldest:
-                wait_time = (oldest[0][1] + (self.window_minutes * 60)) - now
-                return False, max(wait_time, 1)
-            return False, 60  # Default wait
-        
-        if hour_count >= self.max_requests_per_hour:
-            # Find oldest request in hour to calculate wait time
-            oldest = self.redis_conn.zrange(key, 0, 0, withscores=True)
-            if oldest:
-                wait_time = (oldest[0][1] + 3600) - now
-                return False, max(wait_time, 1)
-            return False, 60  # Default wait
-        
-        # Check per-minute rate
-        minute_start = now - 60
-        minute_count = self.redis_conn.zcount(key, minute_start, now)
-        
-        if minute_count >= self.requests_per_minute:
-            # Wait until next minute
-            wait_time = 60 - (now - minute_start)
-            return False, max(wait_time, 1)
-        
-        return True, None
+        return self._decide(identifier, reserve=False)
+    
+    def reserve(self, identifier: str) -> tuple[bool, Optional[float]]:
+        """
+        Check the budget and, if it allows one more request, record that request,
+        as one atomic step: concurrent workers can never both take the last slot.
+        Returns: (reserved, wait_seconds)
+        """
+        return self._decide(identifier, reserve=True)
+    
+    async def acquire(self, identifier: str):
+        """
+        Wait until the identifier's budget allows one more request and record it.
+        The reservation is atomic in Redis, so every coroutine and worker process
+        drawing from the identifier shares the budget without overdrawing it.
+        """
+        while True:
+            reserved, wait_time = self.reserve(identifier)
+            if reserved:
+                return
+            await asyncio.sleep(wait_time)
     
     def record_request(self, identifier: str):
         """Record a request was made"""
@@ -145,9 +181,10 @@ class RateLimitMiddleware:
             # Check if this is an API endpoint that should be rate limited
             path = scope["path"]
             if path.startswith("/api/v1/scrapes") or path.startswith("/api/v1/export"):
-                can_request, wait_time = self.rate_limiter.can_make_request(identifier)
+                # Check and record in one step, so concurrent requests can't overdraw the budget
+                reserved, wait_time = self.rate_limiter.reserve(identifier)
                 
-                if not can_request:
+                if not reserved:
                     # Get the origin header from the request
                     headers = dict(scope["headers"])
                     origin = headers.get(b"origin", b"").decode()
@@ -184,8 +221,5 @@ class RateLimitMiddleware:
                         "body": json.dumps(response_body).encode(),
                     })
                     return
-                
-                # Record the request
-                self.rate_limiter.record_request(identifier)
         
         await self.app(scope, receive, send)
\ No newline at end of file
@@ -0,0 +1,180 @@
+"""
+Columnar archive tier for old scrapes.
+Membership rows of completed scrapes older than settings.archive_after_days are
+moved from SQLite into one Parquet file per scrape under
+<archive_dir>/account_<id>/, and read back with memory-mapped, column-projected scans.
+"""
+import shutil
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from sqlalchemy import delete
+from sqlmodel import Session, select, func
+
+from ..database import session_scope
+from ..models import Scrape, ScrapeStatus, Follower, InstagramUser
+from ..config import get_settings
+
+settings = get_settings()
+
+ARCHIVE_SCHEMA = pa.schema([
+    ("scrape_id", pa.int64()),
+    ("follower_id", pa.int64()),
+    ("relation_type", pa.string()),
+    ("is_mutual", pa.bool_()),
+    ("first_seen", pa.timestamp("us")),
+    ("last_seen", pa.timestamp("us")),
+    ("username", pa.string()),
+    ("full_name", pa.string()),
+    ("is_verified", pa.bool_()),
+    ("is_private", pa.bool_()),
+])
+
+# Memory-mapped local reads for every archive scan
+_filesystem = pafs.LocalFileSystem(use_mmap=True)
+
+
+def account_archive_dir(account_id: int) -> Path:
+    """Directory holding the archived scrapes of an account"""
+    return Path(settings.archive_dir) / f"account_{account_id}"
+
+
+def scrape_archive_path(account_id: int, scrape_id: int) -> Path:
+    """Parquet file of one archived scrape"""
+    return account_archive_dir(account_id) / f"scrape_{scrape_id}.parquet"
+
+
+def archive_scrape(session: Session, scrape: Scrape) -> int:
+    """
+    Move the membership rows of one scrape into its Parquet file.
+    Returns the number of archived rows.
+    """
+    rows = session.exec(
+        select(
+            Follower.scrape_id, Follower.follower_id, Follower.relation_type, Follower.is_mutual,
+            Follower.first_seen, Follower.last_seen, InstagramUser.username, InstagramUser.full_name,
+            InstagramUser.is_verified, InstagramUser.is_private
+        )
+        .join(InstagramUser, InstagramUser.id == Follower.follower_id)
+        .where(Follower.scrape_id == scrape.id)
+    ).all()
+
+    path = scrape_archive_path(scrape.account_id, scrape.id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    columns = list(zip(*rows)) if rows else [[] for _ in ARCHIVE_SCHEMA.names]
+    table = pa.Table.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, ARCHIVE_SCHEMA)],
+        schema=ARCHIVE_SCHEMA
+    )
+
+    # Write to a temporary name first so a crash never leaves a truncated archive
+    # (the "_" prefix keeps it out of dataset scans)
+    tmp_path = path.parent / f"_{path.name}.tmp"
+    pq.write_table(table, tmp_path, compression="zstd")
+    tmp_path.replace(path)
+
+    # Reads go to the archive from here on, so an interrupted cleanup never loses rows
+    scrape.archived_at = datetime.utcnow()
+    session.add(scrape)
+    session.commit()
+
+    # Drop the hot rows in bounded batches, one short transaction each, so the
+    # write lock is released between batches
+    while True:
+        batch = session.exec(
+            select(Follower.follower_id)
+            .where(Follower.scrape_id == scrape.id)
+            .limit(settings.batch_size * 10)
+        ).all()
+        if not batch:
+            break
+        session.execute(
+            delete(Follower).where(
+                Follower.scrape_id == scrape.id,
+                Follower.follower_id.in_(batch)
+            )
+        )
+        session.commit()
+
+    return len(rows)
+
+
+def archive_old_scrapes(older_than_days: Optional[int] = None) -> int:
+    """
+    Archive completed scrapes older than the configured age.
+    The latest completed scrape of every account always stays in the hot DB,
+    and compacted scrapes have no membership rows left to archive.
+    Returns the number of archived scrapes.
+    """
+    days = older_than_days if older_than_days is not None else settings.archive_after_days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    archived = 0
+
+    with session_scope() as session:
+        latest_ids = select(func.max(Scrape.id)).where(
+            Scrape.status == ScrapeStatus.COMPLETED
+        ).group_by(Scrape.account_id)
+
+        scrapes = session.exec(
+            select(Scrape)
+            .where(
+                Scrape.status == ScrapeStatus.COMPLETED,
+                Scrape.archived_at.is_(None),
+                Scrape.compacted_at.is_(None),
+                Scrape.completed_at < cutoff,
+                Scrape.id.not_in(latest_ids)
+            )
+            .order_by(Scrape.id)
+        ).all()
+
+        for scrape in scrapes:
+            count = archive_scrape(session, scrape)
+            archived += 1
+            print(f"Archived scrape {scrape.id} ({count} rows)")
+
+    return archived
+
+
+def read_archived_scrape(
+    account_id: int,
+    scrape_id: int,
+    columns: Optional[List[str]] = None,
+    filters=None
+) -> pa.Table:
+    """Read one archived scrape, projecting only the requested columns"""
+    return pq.read_table(
+        scrape_archive_path(account_id, scrape_id),
+        columns=columns,
+        filters=filters,
+        memory_map=True
+    )
+
+
+def scan_account_archive(
+    account_id: int,
+    columns: Optional[List[str]] = None,
+    filter=None
+) -> pa.Table:
+    """Scan every archived scrape of an account, projecting only the requested columns"""
+    directory = account_archive_dir(account_id)
+    if not directory.exists():
+        return ARCHIVE_SCHEMA.empty_table().select(columns or ARCHIVE_SCHEMA.names)
+
+    dataset = ds.dataset(
+        str(directory.resolve()),
+        schema=ARCHIVE_SCHEMA,
+        format="parquet",
+        filesystem=_filesystem
+    )
+    return dataset.to_table(columns=columns, filter=filter)
+
+
+def delete_account_archive(account_id: int):
+    """Remove all archived scrapes of an account"""
+    shutil.rmtree(account_archive_dir(account_id), ignore_errors=True)
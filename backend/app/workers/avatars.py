@@ -0,0 +1,149 @@
+"""
+Local cache of profile pictures.
+Instagram CDN URLs expire, so after a scrape every avatar it saw that is not
+cached yet is downloaded once, cut to a settings.avatar_size square JPEG with
+Pillow and stored as <avatar_dir>/<hash[:2]>/<hash>.jpg, named by the sha256 of
+the downloaded bytes. The avatars table maps the URL path (stable across the
+expiring signatures) to that hash, so a picture shared by several users or
+scrapes is fetched and stored once. api/avatars.py serves the files.
+"""
+import asyncio
+import hashlib
+import io
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+import redis
+from PIL import Image, ImageOps
+from sqlmodel import Session, select
+
+from ..database import session_scope
+from ..models import Account, Avatar, InstagramUser, Scrape
+from ..scrapers.graphql_scraper import get_async_client, close_async_client
+from ..config import get_settings
+from .delta_calculator import load_relation_ids
+from .queue import queue
+
+settings = get_settings()
+
+
+def avatar_key(url: str) -> str:
+    """Cache key of a profile picture URL: its path, without the CDN host and signed query"""
+    return urlsplit(url).path
+
+
+def thumbnail_path(content_hash: str) -> Path:
+    return Path(settings.avatar_dir) / content_hash[:2] / f"{content_hash}.jpg"
+
+
+def make_thumbnail(content: bytes) -> bytes:
+    """Square JPEG thumbnail of an image, settings.avatar_size pixels wide"""
+    size = (settings.avatar_size, settings.avatar_size)
+    with Image.open(io.BytesIO(content)) as image:
+        thumbnail = ImageOps.fit(image.convert("RGB"), size, Image.LANCZOS)
+    out = io.BytesIO()
+    thumbnail.save(out, "JPEG", quality=85, optimize=True)
+    return out.getvalue()
+
+
+def store_thumbnail(content: bytes) -> str:
+    """Write the thumbnail of a downloaded picture unless its content is stored already; returns the hash"""
+    content_hash = hashlib.sha256(content).hexdigest()
+    path = thumbnail_path(content_hash)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(make_thumbnail(content))
+        os.replace(tmp_path, path)
+    return content_hash
+
+
+def missing_avatar_urls(session: Session, urls: Iterable[Optional[str]]) -> Dict[str, str]:
+    """One URL per avatar key that is not cached yet, keyed by avatar key"""
+    missing = {}
+    for url in urls:
+        if url:
+            missing.setdefault(avatar_key(url), url)
+
+    keys = list(missing)
+    for start in range(0, len(keys), settings.batch_size):
+        for key in session.exec(
+            select(Avatar.source_key).where(Avatar.source_key.in_(keys[start:start + settings.batch_size]))
+        ):
+            del missing[key]
+    return missing
+
+
+async def fetch_avatars(urls: Dict[str, str]) -> Dict[str, str]:
+    """
+    Download avatars (key -> URL) a few at a time over the shared client and
+    store their thumbnails. Expired URLs and broken images are skipped; the
+    next scrape brings fresh URLs. Returns key -> content hash of the stored ones.
+    """
+    client = get_async_client()
+    semaphore = asyncio.Semaphore(settings.avatar_fetch_concurrency)
+
+    async def fetch(key: str, url: str) -> Optional[str]:
+        async with semaphore:
+            try:
+                response = await client.get(url)
+                if response.status_code != 200:
+                    print(f"Avatar download failed with {response.status_code}: {key}")
+                    return None
+                # Decoding and resizing is CPU work; keep it off the event loop
+                return await asyncio.to_thread(store_thumbnail, response.content)
+            except (httpx.HTTPError, OSError) as e:  # PIL raises OSError subclasses
+                print(f"Avatar download failed: {key}: {e}")
+                return None
+
+    hashes = await asyncio.gather(*[fetch(key, url) for key, url in urls.items()])
+    return {key: content_hash for key, content_hash in zip(urls, hashes) if content_hash}
+
+
+def cache_scrape_avatars(scrape_id: int) -> int:
+    """
+    Worker task: cache the avatars of the account and every user a scrape saw.
+    Users are read from the scrape's id sets, so it works for every storage mode.
+    Returns the number of newly cached avatars.
+    """
+    with session_scope() as session:
+        scrape = session.get(Scrape, scrape_id)
+        if not scrape:
+            return 0
+        urls = [session.get(Account, scrape.account_id).profile_pic_url]
+        for relation_type in ("follower", "following"):
+            ids = load_relation_ids(session, scrape_id, relation_type).tolist()
+            for start in range(0, len(ids), settings.batch_size):
+                urls += session.exec(
+                    select(InstagramUser.profile_pic_url)
+                    .where(InstagramUser.id.in_(ids[start:start + settings.batch_size]))
+                ).all()
+        missing = missing_avatar_urls(session, urls)
+
+    if not missing:
+        return 0
+
+    async def fetch():
+        try:
+            return await fetch_avatars(missing)
+        finally:
+            await close_async_client()
+
+    fetched = asyncio.run(fetch())
+    with session_scope() as session:
+        for key, content_hash in fetched.items():
+            session.merge(Avatar(source_key=key, content_hash=content_hash))
+
+    print(f"Cached {len(fetched)} of {len(missing)} new avatars for scrape {scrape_id}")
+    return len(fetched)
+
+
+def enqueue_avatar_caching(scrape_id: int):
+    """Queue cache_scrape_avatars; a scrape never fails because the queue is unreachable"""
+    try:
+        queue.enqueue(cache_scrape_avatars, scrape_id)
+    except redis.RedisError as e:
+        print(f"Could not queue avatar caching for scrape {scrape_id}: {e}")
@@ -0,0 +1,115 @@
+"""
+Pagination checkpoints of running scrapes.
+The cursor after every persisted page is written to the Scrape row together with
+the relation's live counter (followers_scraped/following_scraped), so a retried
+or re-enqueued job continues after the last saved page instead of paging the
+whole list again. Ids fetched before the interruption come back from the
+membership rows (snapshot storage) or from a Redis list per relation (interval
+storage, which writes no membership rows until the scrape completes).
+"""
+from typing import NamedTuple, Optional
+
+import numpy as np
+import redis
+from sqlmodel import Session
+
+from ..models import Scrape
+from ..config import get_settings
+from ..utils.id_sets import to_id_array, EMPTY
+from .delta_calculator import load_relation_ids
+from .queue import redis_conn
+
+settings = get_settings()
+
+# (cursor, complete flag, live counter) columns of each relation on the Scrape row
+CHECKPOINT_FIELDS = {
+    "follower": ("followers_cursor", "followers_complete", "followers_scraped"),
+    "following": ("following_cursor", "following_complete", "following_scraped"),
+}
+
+
+class Checkpoint(NamedTuple):
+    """Where one relation of a scrape left off"""
+    cursor: Optional[str]
+    complete: bool
+    ids: np.ndarray
+
+    @property
+    def resumable(self) -> bool:
+        return self.complete or self.cursor is not None
+
+
+def checkpoint_key(scrape_id: int, relation_type: str) -> str:
+    return f"scrape_checkpoint:{scrape_id}:{relation_type}"
+
+
+def save_checkpoint(
+    scrape: Scrape,
+    relation_type: str,
+    cursor: Optional[str],
+    scraped: int,
+    page_ids: np.ndarray
+):
+    """
+    Record a persisted page on the Scrape row (committed by the caller with the page).
+    With interval storage the page ids are appended to the relation's Redis list first,
+    so the ids are always known up to the saved cursor.
+    """
+    cursor_field, _, count_field = CHECKPOINT_FIELDS[relation_type]
+    if settings.follower_storage != "snapshot":
+        key = checkpoint_key(scrape.id, relation_type)
+        try:
+            redis_conn.rpush(key, page_ids.astype("<i8").tobytes())
+            redis_conn.expire(key, settings.checkpoint_ttl)
+        except redis.RedisError as e:
+            # Without the ids a resume restarts this relation from scratch
+            print(f"Checkpoint ids unavailable: {e}")
+            cursor = None
+    setattr(scrape, cursor_field, cursor)
+    setattr(scrape, count_field, scraped)
+
+
+def mark_relation_complete(scrape: Scrape, relation_type: str):
+    _, complete_field, _ = CHECKPOINT_FIELDS[relation_type]
+    setattr(scrape, complete_field, True)
+
+
+def _checkpoint_ids(session: Session, scrape_id: int, relation_type: str) -> Optional[np.ndarray]:
+    """Ids persisted so far by earlier attempts; None when they are lost"""
+    if settings.follower_storage == "snapshot":
+        return load_relation_ids(session, scrape_id, relation_type)
+    try:
+        chunks = redis_conn.lrange(checkpoint_key(scrape_id, relation_type), 0, -1)
+    except redis.RedisError as e:
+        print(f"Checkpoint ids unavailable: {e}")
+        return None
+    if not chunks:
+        return None
+    return to_id_array(np.concatenate([np.frombuffer(chunk, dtype="<i8") for chunk in chunks]))
+
+
+def load_checkpoint(session: Session, scrape: Scrape, relation_type: str) -> Checkpoint:
+    """
+    Checkpoint of one relation of a scrape. A relation whose earlier ids can not
+    be recovered starts over; rows written again are deduplicated by the upserts.
+    """
+    cursor_field, complete_field, _ = CHECKPOINT_FIELDS[relation_type]
+    checkpoint = Checkpoint(getattr(scrape, cursor_field), getattr(scrape, complete_field), EMPTY)
+    if not checkpoint.resumable:
+        return checkpoint
+
+    ids = _checkpoint_ids(session, scrape.id, relation_type)
+    if ids is None:
+        print(f"Checkpoint of scrape {scrape.id} ({relation_type}) lost its ids, starting over")
+        return Checkpoint(None, False, EMPTY)
+    return checkpoint._replace(ids=ids)
+
+
+def clear_checkpoints(scrape_id: int):
+    """Drop the Redis side of a finished scrape's checkpoints"""
+    if settings.follower_storage == "snapshot":
+        return
+    try:
+        redis_conn.delete(*[checkpoint_key(scrape_id, r) for r in CHECKPOINT_FIELDS])
+    except redis.RedisError as e:
+        print(f"Checkpoint ids unavailable: {e}")
@@ -0,0 +1,202 @@
+"""
+Retention and compaction of old scrapes.
+Completed scrapes are thinned by age: all of them are kept for
+settings.retention_all_days, then one per day until settings.retention_daily_days,
+one per week until settings.retention_weekly_days and one per month after that,
+counted separately for the follower and the following relation.
+Thinned scrapes keep their Scrape row (counts and new/lost deltas) but lose their
+membership rows, sketches and archive file. With snapshot storage their compact id
+sets stay and hold the membership as of that scrape; with interval storage those
+go too, as follower_intervals can rebuild it. Freed pages are returned to
+the OS with incremental VACUUM so the DB file stays roughly flat.
+Scrapes deleted through the API go with delete_scrape, which also repairs the
+intervals and deltas that depended on them.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from ..database import engine, session_scope, _is_file_sqlite
+from ..models import Scrape, ScrapeStatus, Follower, FollowerEvent, ScrapeIdSet, ScrapeSketch
+from ..config import get_settings
+from .delta_calculator import RELATION_SCRAPE_TYPES, update_scrape_delta
+from .intervals import neighbour_scrapes, remove_scrape_intervals
+
+settings = get_settings()
+
+
+def _retention_bucket(completed_at: datetime, now: datetime) -> Optional[Tuple]:
+    """Bucket a scrape is kept in by age; None while every scrape is kept"""
+    age = now - completed_at
+    if age < timedelta(days=settings.retention_all_days):
+        return None
+    if age < timedelta(days=settings.retention_daily_days):
+        return ("day", completed_at.date())
+    if age < timedelta(days=settings.retention_weekly_days):
+        return ("week",) + tuple(completed_at.isocalendar()[:2])
+    return ("month", completed_at.year, completed_at.month)
+
+
+def select_scrapes_to_thin(scrapes: List[Scrape], now: Optional[datetime] = None) -> List[Scrape]:
+    """
+    Pick the scrapes of one account that fall outside the retention density.
+    Buckets are kept per relation: the newest scrape covering followers and the
+    newest covering following in every bucket are kept, and so is the latest
+    scrape of each relation, so a followers-only scrape never displaces the
+    following snapshot of an older full scrape.
+    """
+    now = now or datetime.utcnow()
+    ordered = sorted(scrapes, key=lambda s: s.completed_at, reverse=True)
+
+    kept_ids = set()
+    for scrape_types in RELATION_SCRAPE_TYPES.values():
+        covering = [scrape for scrape in ordered if scrape.scrape_type in scrape_types]
+        kept_buckets = set()
+        kept_ids.update(scrape.id for scrape in covering[:1])
+        for scrape in covering[1:]:
+            bucket = _retention_bucket(scrape.completed_at, now)
+            if bucket is None or bucket not in kept_buckets:
+                kept_buckets.add(bucket)
+                kept_ids.add(scrape.id)
+
+    return [scrape for scrape in ordered if scrape.id not in kept_ids]
+
+
+def _delete_memberships(session: Session, scrape: Scrape) -> int:
+    """Delete the membership rows of a scrape in bounded batches, one short transaction each"""
+    deleted = 0
+    while True:
+        batch = session.exec(
+            select(Follower.follower_id)
+            .where(Follower.scrape_id == scrape.id)
+            .limit(settings.batch_size * 10)
+        ).all()
+        if not batch:
+            break
+        result = session.execute(
+            delete(Follower).where(
+                Follower.scrape_id == scrape.id,
+                Follower.follower_id.in_(batch)
+            )
+        )
+        deleted += result.rowcount
+        session.commit()
+    return deleted
+
+
+def compact_scrape(session: Session, scrape: Scrape) -> int:
+    """
+    Drop the stored membership of one scrape, keeping its Scrape row.
+    Returns the number of deleted membership rows.
+    """
+    deleted = _delete_memberships(session, scrape)
+
+    if settings.follower_storage == "interval":
+        session.execute(delete(ScrapeIdSet).where(ScrapeIdSet.scrape_id == scrape.id))
+    session.execute(delete(ScrapeSketch).where(ScrapeSketch.scrape_id == scrape.id))
+
+    if scrape.archived_at:
+        from .archiver import scrape_archive_path
+        scrape_archive_path(scrape.account_id, scrape.id).unlink(missing_ok=True)
+
+    scrape.compacted_at = datetime.utcnow()
+    session.add(scrape)
+    session.commit()
+
+    return deleted
+
+
+def delete_scrape(session: Session, scrape: Scrape) -> int:
+    """
+    Delete a scrape and everything derived from it: membership rows, id sets,
+    sketches, events, its archive file, cached diffs and checkpoints. Intervals
+    it touched are handed to its neighbouring scrapes, and the deltas of the
+    scrapes that were compared against it are computed again.
+    Returns the number of deleted membership rows.
+    """
+    from .snapshot_diff import invalidate_snapshot_diffs
+    from .checkpoints import clear_checkpoints
+    from .archiver import scrape_archive_path
+
+    deleted = _delete_memberships(session, scrape)
+    for model in (ScrapeIdSet, ScrapeSketch, FollowerEvent):
+        session.execute(delete(model).where(model.scrape_id == scrape.id))
+
+    remove_scrape_intervals(session, scrape)
+    # Compacted scrapes may have no ids left to diff, so their delta stays
+    later_ids = set()
+    for relation_type in ("follower", "following"):
+        next_scrape = neighbour_scrapes(session, scrape, relation_type)[1]
+        if next_scrape and not next_scrape.compacted_at:
+            later_ids.add(next_scrape.id)
+
+    archive_path = scrape_archive_path(scrape.account_id, scrape.id)
+    scrape_id = scrape.id
+    session.delete(scrape)
+    session.commit()
+
+    for later_id in sorted(later_ids):
+        update_scrape_delta(session, later_id)
+
+    archive_path.unlink(missing_ok=True)
+    invalidate_snapshot_diffs([scrape_id])
+    clear_checkpoints(scrape_id)
+    return deleted
+
+
+def reclaim_free_pages(db_engine: Engine = engine) -> Dict[str, int]:
+    """
+    Return free pages to the OS with incremental VACUUM.
+    Databases created before auto_vacuum was enabled are rebuilt once with a full VACUUM.
+    """
+    if not _is_file_sqlite(str(db_engine.url)):
+        return {"freed_pages": 0}
+
+    with db_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        before = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            print("Enabling incremental auto_vacuum (one-time full VACUUM)...")
+            conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.exec_driver_sql("VACUUM")
+        else:
+            # executescript steps the pragma to completion (execute frees a single page)
+            pages = f"({settings.compaction_vacuum_pages})" if settings.compaction_vacuum_pages else ""
+            conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum{pages};")
+
+        after = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+
+    return {"freed_pages": before - after}
+
+
+def compact_old_scrapes(now: Optional[datetime] = None) -> Dict[str, int]:
+    """Thin old scrapes of every account to the retention density, then reclaim space"""
+    now = now or datetime.utcnow()
+    compacted = 0
+    deleted_rows = 0
+
+    with session_scope() as session:
+        scrapes = session.exec(
+            select(Scrape)
+            .where(
+                Scrape.status == ScrapeStatus.COMPLETED,
+                Scrape.compacted_at.is_(None),
+                Scrape.completed_at.is_not(None)
+            )
+        ).all()
+
+        by_account: Dict[int, List[Scrape]] = {}
+        for scrape in scrapes:
+            by_account.setdefault(scrape.account_id, []).append(scrape)
+
+        for account_scrapes in by_account.values():
+            for scrape in select_scrapes_to_thin(account_scrapes, now):
+                deleted_rows += compact_scrape(session, scrape)
+                compacted += 1
+
+    stats = {"compacted_scrapes": compacted, "deleted_rows": deleted_rows, **reclaim_free_pages()}
+    print(f"Compaction finished: {stats}")
+    return stats
@@ -1,90 +1,311 @@
 from sqlmodel import Session, select
-from typing import Set, Tuple
-from ..models import Scrape, Follower
+from sqlalchemy import delete, except_, exists, insert, literal, update
+from sqlalchemy.orm import aliased
+from typing import Dict, Optional, Set, Tuple
+from datetime import datetime
+import numpy as np
+from ..models import Scrape, ScrapeType, Follower, FollowerInterval, ScrapeIdSet, FollowerEvent, FollowerEventType
+from ..utils.id_sets import encode_id_set, decode_id_set, difference, intersection, EMPTY
 
+# Scrape types whose id set holds the whole list of a relation. An incremental
+# scrape stores the followers known at the time (the previous set plus the new
+# head), so it is a valid baseline for the follower delta.
+RELATION_SCRAPE_TYPES = {
+    "follower": [ScrapeType.FOLLOWERS, ScrapeType.BOTH, ScrapeType.INCREMENTAL],
+    "following": [ScrapeType.FOLLOWING, ScrapeType.BOTH],
+}
 
-def calculate_follower_delta(
+
+def store_scrape_id_sets(
+    session: Session,
+    scrape_id: int,
+    id_sets: Dict[str, np.ndarray]
+):
+    """Store the compact id sets of a scrape, keyed by relation type"""
+    for relation_type, ids in id_sets.items():
+        session.merge(ScrapeIdSet(
+            scrape_id=scrape_id,
+            relation_type=relation_type,
+            count=len(ids),
+            data=encode_id_set(ids)
+        ))
+    session.flush()
+
+
+def load_scrape_id_set(
+    session: Session,
+    scrape_id: int,
+    relation_type: str
+) -> Optional[np.ndarray]:
+    """Load the id set of a scrape, or None if it was never stored"""
+    id_set = session.get(ScrapeIdSet, (scrape_id, relation_type))
+    if id_set is None:
+        return None
+    return decode_id_set(id_set.data)
+
+
+def get_previous_scrape_id(
     session: Session,
     account_id: int,
-    current_scrape_id: int
-) -> Tuple[Set[int], Set[int]]:
-    """
-    Calculate new and lost followers compared to the previous scrape
-    Returns: (new_follower_ids, lost_follower_ids)
-    """
-    # Get the previous completed scrape
-    previous_scrape = session.exec(
-        select(Scrape)
+    current_scrape_id: int,
+    relation_type: str = "follower"
+) -> Optional[int]:
+    """Get the id of the previous completed scrape of an account that covered a relation"""
+    return session.exec(
+        select(Scrape.id)
         .where(
             Scrape.account_id == account_id,
             Scrape.id < current_scrape_id,
-            Scrape.status == "completed"
+            Scrape.status == "completed",
+            Scrape.scrape_type.in_(RELATION_SCRAPE_TYPES[relation_type])
         )
         .order_by(Scrape.completed_at.desc())
         .limit(1)
     ).first()
+
+
+def _membership_ids(session: Session, scrape_id: int, relation_type: str) -> np.ndarray:
+    """Read an id set from membership rows, for scrapes stored before id sets existed"""
+    ids = session.exec(
+        select(Follower.follower_id)
+        .where(
+            Follower.scrape_id == scrape_id,
+            Follower.relation_type == relation_type
+        )
+    ).all()
+    return np.unique(np.array(ids, dtype=np.int64))
+
+
+def load_relation_ids(session: Session, scrape_id: int, relation_type: str) -> np.ndarray:
+    """Id set of one relation of a scrape, from its stored id set or its membership rows"""
+    ids = load_scrape_id_set(session, scrape_id, relation_type)
+    if ids is None:
+        ids = _membership_ids(session, scrape_id, relation_type)
+    return ids
+
+
+def calculate_follower_delta(
+    session: Session,
+    account_id: int,
+    current_scrape_id: int,
+    relation_type: str = "follower"
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate new and lost followers compared to the previous scrape
+    using the stored id sets of both scrapes.
+    Returns: (new_follower_ids, lost_follower_ids)
+    """
+    current_ids = load_relation_ids(session, current_scrape_id, relation_type)
     
-    if not previous_scrape:
+    previous_scrape_id = get_previous_scrape_id(session, account_id, current_scrape_id, relation_type)
+    if not previous_scrape_id:
         # No previous scrape, all followers are new
-        current_followers = session.exec(
-            select(Follower.follower_id)
-            .where(
-                Follower.scrape_id == current_scrape_id,
-                Follower.relation_type == "follower"
-            )
-        ).all()
-        return set(current_followers), set()
+        return current_ids, EMPTY
     
-    # Get follower IDs from both scrapes
-    previous_followers = set(session.exec(
-        select(Follower.follower_id)
+    previous_ids = load_relation_ids(session, previous_scrape_id, relation_type)
+    
+    # Calculate differences
+    return difference(current_ids, previous_ids), difference(previous_ids, current_ids)
+
+
+def calculate_mutual_ids(follower_ids: np.ndarray, following_ids: np.ndarray) -> np.ndarray:
+    """Ids that both follow the account and are followed by it"""
+    return intersection(follower_ids, following_ids)
+
+
+def calculate_follower_delta_from_intervals(
+    session: Session,
+    account_id: int,
+    scrape_id: int
+) -> Tuple[Set[int], Set[int]]:
+    """
+    Read new and lost followers of a scrape from the interval store.
+    New followers opened an interval at this scrape, lost ones closed one.
+    Returns: (new_follower_ids, lost_follower_ids)
+    """
+    new_followers = set(session.exec(
+        select(FollowerInterval.follower_id)
         .where(
-            Follower.scrape_id == previous_scrape.id,
-            Follower.relation_type == "follower"
+            FollowerInterval.target_id == account_id,
+            FollowerInterval.relation_type == "follower",
+            FollowerInterval.first_scrape_id == scrape_id
         )
     ).all())
     
-    current_followers = set(session.exec(
-        select(Follower.follower_id)
+    lost_followers = set(session.exec(
+        select(FollowerInterval.follower_id)
         .where(
-            Follower.scrape_id == current_scrape_id,
-            Follower.relation_type == "follower"
+            FollowerInterval.target_id == account_id,
+            FollowerInterval.relation_type == "follower",
+            FollowerInterval.end_scrape_id == scrape_id
         )
     ).all())
     
-    # Calculate differences
-    new_followers = current_followers - previous_followers
-    lost_followers = previous_followers - current_followers
-    
     return new_followers, lost_followers
 
 
+def _relation_ids(scrape_id: int, relation_type: str):
+    """Membership ids of one relation of a scrape, as a subquery"""
+    return select(Follower.follower_id).where(
+        Follower.scrape_id == scrape_id,
+        Follower.relation_type == relation_type
+    )
+
+
+def _has_membership_rows(session: Session, scrape_id: int) -> bool:
+    return session.exec(select(exists().where(Follower.scrape_id == scrape_id))).one()
+
+
+def _has_full_membership(session: Session, scrape: Scrape) -> bool:
+    """Whether the membership rows of a scrape hold its whole lists (incremental ones keep only the head)"""
+    return scrape.scrape_type != ScrapeType.INCREMENTAL and _has_membership_rows(session, scrape.id)
+
+
+EVENT_COLUMNS = ["target_id", "follower_id", "relation_type", "event_type", "scrape_id", "occurred_at"]
+
+
+def _insert_events_from(
+    session: Session,
+    ids_query,
+    scrape: Scrape,
+    relation_type: str,
+    event_type: str,
+    occurred_at: datetime
+) -> int:
+    """INSERT ... SELECT one event per id of a subquery; returns the number of events"""
+    ids = ids_query.subquery()
+    return session.execute(
+        insert(FollowerEvent).from_select(
+            EVENT_COLUMNS,
+            select(
+                literal(scrape.account_id), ids.c.follower_id, literal(relation_type),
+                literal(event_type), literal(scrape.id), literal(occurred_at)
+            )
+        )
+    ).rowcount
+
+
+def record_delta_events_sql(
+    session: Session,
+    scrape: Scrape,
+    previous_scrape_id: Optional[int],
+    relation_type: str,
+    occurred_at: datetime
+) -> Tuple[int, int]:
+    """
+    Diff a relation against the previous scrape with EXCEPT, entirely inside the
+    database, and append the follow/unfollow events in the same statements.
+    Returns: (new_count, lost_count)
+    """
+    current = _relation_ids(scrape.id, relation_type)
+    if previous_scrape_id is None:
+        new_count = _insert_events_from(session, current, scrape, relation_type, FollowerEventType.FOLLOW, occurred_at)
+        return new_count, 0
+    
+    previous = _relation_ids(previous_scrape_id, relation_type)
+    new_count = _insert_events_from(
+        session, except_(current, previous), scrape, relation_type, FollowerEventType.FOLLOW, occurred_at
+    )
+    lost_count = _insert_events_from(
+        session, except_(previous, current), scrape, relation_type, FollowerEventType.UNFOLLOW, occurred_at
+    )
+    return new_count, lost_count
+
+
+def record_delta_events(
+    session: Session,
+    scrape: Scrape,
+    relation_type: str,
+    new_ids: np.ndarray,
+    lost_ids: np.ndarray,
+    occurred_at: datetime
+):
+    """Append follow/unfollow events for a delta computed from id sets"""
+    rows = [
+        {
+            "target_id": scrape.account_id,
+            "follower_id": follower_id,
+            "relation_type": relation_type,
+            "event_type": event_type,
+            "scrape_id": scrape.id,
+            "occurred_at": occurred_at,
+        }
+        for event_type, ids in ((FollowerEventType.FOLLOW, new_ids), (FollowerEventType.UNFOLLOW, lost_ids))
+        for follower_id in ids.tolist()
+    ]
+    if rows:
+        session.execute(insert(FollowerEvent), rows)
+
+
+def mark_new_rows(
+    session: Session,
+    scrape_id: int,
+    previous_scrape_id: Optional[int],
+    relation_type: str
+) -> int:
+    """Flag the rows of a scrape whose id was not in the previous scrape, in one UPDATE"""
+    stmt = update(Follower).where(
+        Follower.scrape_id == scrape_id,
+        Follower.relation_type == relation_type
+    )
+    if previous_scrape_id is not None:
+        # Anti-join against the previous scrape through ix_followers_scrape_relation
+        previous = aliased(Follower)
+        stmt = stmt.where(~exists().where(
+            previous.scrape_id == previous_scrape_id,
+            previous.relation_type == relation_type,
+            previous.follower_id == Follower.follower_id
+        ))
+    return session.execute(stmt.values(is_new=True)).rowcount
+
+
 def update_scrape_delta(
     session: Session,
     scrape_id: int
 ):
-    """Update scrape record with delta calculations"""
+    """
+    Store new/lost followers and following of a scrape and append the matching
+    follow/unfollow events.
+    Uses set-based SQL over the membership rows when both scrapes still have all
+    of them (and flags their is_new rows), the stored id sets otherwise.
+    """
     scrape = session.get(Scrape, scrape_id)
     if not scrape:
         return
     
-    new_follower_ids, lost_follower_ids = calculate_follower_delta(
-        session,
-        scrape.account_id,
-        scrape_id
-    )
+    relation_types = {
+        ScrapeType.FOLLOWERS: ["follower"],
+        ScrapeType.FOLLOWING: ["following"],
+        ScrapeType.INCREMENTAL: ["follower"],
+    }.get(scrape.scrape_type, ["follower", "following"])
     
-    scrape.new_followers = len(new_follower_ids)
-    scrape.lost_followers = len(lost_follower_ids)
-    
-    # Mark new followers in the follower table
-    if new_follower_ids:
-        session.exec(
-            select(Follower)
-            .where(
-                Follower.scrape_id == scrape_id,
-                Follower.follower_id.in_(new_follower_ids)
+    has_rows = _has_full_membership(session, scrape)
+    occurred_at = scrape.completed_at or datetime.utcnow()
+    deltas = {}
+    for relation_type in relation_types:
+        previous_scrape_id = get_previous_scrape_id(session, scrape.account_id, scrape_id, relation_type)
+        
+        # A retried delta replaces the events it wrote before
+        session.execute(delete(FollowerEvent).where(
+            FollowerEvent.scrape_id == scrape_id,
+            FollowerEvent.relation_type == relation_type
+        ))
+        
+        if has_rows and (
+            previous_scrape_id is None or _has_full_membership(session, session.get(Scrape, previous_scrape_id))
+        ):
+            deltas[relation_type] = record_delta_events_sql(
+                session, scrape, previous_scrape_id, relation_type, occurred_at
             )
-        ).update({"is_new": True})
+            mark_new_rows(session, scrape_id, previous_scrape_id, relation_type)
+        else:
+            new_ids, lost_ids = calculate_follower_delta(session, scrape.account_id, scrape_id, relation_type)
+            record_delta_events(session, scrape, relation_type, new_ids, lost_ids, occurred_at)
+            deltas[relation_type] = (len(new_ids), len(lost_ids))
+    
+    if "follower" in deltas:
+        scrape.new_followers, scrape.lost_followers = deltas["follower"]
+    if "following" in deltas:
+        scrape.new_following, scrape.lost_following = deltas["following"]
     
-    session.commit()
\ No newline at end of file
+    session.commit()
@@ -0,0 +1,166 @@
+"""
+Chunked bulk ingest of scraped users through SQLAlchemy Core.
+Rows are written with executemany in chunks of settings.batch_size, each chunk
+in its own short transaction, using upserts so a retried scrape can safely
+write the same rows again.
+"""
+from sqlmodel import Session
+from sqlalchemy import or_, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Dict, Iterable, List, Optional, Union
+from datetime import datetime
+
+from ..models import Follower, InstagramUser, ProfileChange
+from ..scrapers.records import ScrapedUser
+from ..config import get_settings
+
+settings = get_settings()
+
+# Profile attributes copied from scraped user data into instagram_users
+PROFILE_FIELDS = ("username", "full_name", "profile_pic_url", "is_verified", "is_private")
+
+
+def _as_record(user: Union[ScrapedUser, Dict]) -> ScrapedUser:
+    """Scraped users arrive as records; plain dicts are normalized the same way"""
+    return user if isinstance(user, ScrapedUser) else ScrapedUser.from_node(user)
+
+
+def _stored_value(value) -> Optional[str]:
+    """Profile attribute as stored in profile_changes"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _profile_changes(session: Session, chunk: List[Dict], now: datetime) -> List[Dict]:
+    """Attribute changes of the already known profiles in a chunk"""
+    by_id = {row["id"]: row for row in chunk}
+    existing = session.execute(
+        select(InstagramUser.id, *[getattr(InstagramUser, field) for field in PROFILE_FIELDS])
+        .where(InstagramUser.id.in_(list(by_id)))
+    ).all()
+
+    changes = []
+    for stored in existing:
+        row = by_id[stored[0]]
+        for field, old_value in zip(PROFILE_FIELDS, stored[1:]):
+            if old_value != row[field]:
+                changes.append({
+                    "user_id": stored[0],
+                    "field": field,
+                    "old_value": _stored_value(old_value),
+                    "new_value": _stored_value(row[field]),
+                    "changed_at": now,
+                })
+    return changes
+
+
+def _chunks(rows: List, size: int) -> Iterable[List]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _user_upsert():
+    """INSERT ... ON CONFLICT that only rewrites a profile when an attribute changed"""
+    stmt = sqlite_insert(InstagramUser)
+    return stmt.on_conflict_do_update(
+        index_elements=[InstagramUser.id],
+        set_={
+            **{field: getattr(stmt.excluded, field) for field in PROFILE_FIELDS},
+            "updated_at": stmt.excluded.updated_at,
+        },
+        where=or_(*[
+            getattr(InstagramUser, field).is_distinct_from(getattr(stmt.excluded, field))
+            for field in PROFILE_FIELDS
+        ])
+    )
+
+
+def upsert_instagram_users(session: Session, users: Iterable[Union[ScrapedUser, Dict]]) -> int:
+    """
+    Insert unseen profiles and update existing ones only when an attribute changed,
+    recording every changed attribute in profile_changes.
+    Returns the number of rows inserted or updated.
+    """
+    now = datetime.utcnow()
+
+    # Deduplicate by id (mutuals show up in both lists)
+    records = {record.id: record for record in map(_as_record, users)}
+    profiles = [
+        {**record._asdict(), "first_seen": now, "updated_at": now}
+        for record in records.values()
+    ]
+
+    written = 0
+    stmt = _user_upsert()
+    for chunk in _chunks(profiles, settings.batch_size):
+        changes = _profile_changes(session, chunk, now)
+
+        # Batched inserts report no rowcount; SQLite's change counter does
+        before = session.scalar(select(func.total_changes()))
+        session.execute(stmt, chunk)
+        written += session.scalar(select(func.total_changes())) - before
+
+        if changes:
+            session.execute(insert(ProfileChange), changes)
+        session.commit()
+
+    return written
+
+
+def insert_memberships(
+    session: Session,
+    target_id: int,
+    scrape_id: int,
+    relation_type: str,
+    ids: Iterable[int],
+    mutual_ids: frozenset = frozenset(),
+    seen_at: datetime = None
+) -> int:
+    """
+    Write the membership rows of one relation of a scrape.
+    Existing rows (from an earlier attempt of the same scrape) are updated in place.
+    Returns the number of rows written.
+    """
+    seen_at = seen_at or datetime.utcnow()
+    rows = [
+        {
+            "target_id": target_id,
+            "follower_id": follower_id,
+            "scrape_id": scrape_id,
+            "relation_type": relation_type,
+            "first_seen": seen_at,
+            "last_seen": seen_at,
+            "is_mutual": follower_id in mutual_ids,
+        }
+        for follower_id in ids
+    ]
+
+    stmt = sqlite_insert(Follower)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Follower.target_id, Follower.follower_id, Follower.scrape_id, Follower.relation_type],
+        set_={"last_seen": stmt.excluded.last_seen, "is_mutual": stmt.excluded.is_mutual}
+    )
+
+    for chunk in _chunks(rows, settings.batch_size):
+        session.execute(stmt, chunk)
+        session.commit()
+
+    return len(rows)
+
+
+def mark_mutuals(session: Session, scrape_id: int, mutual_ids: Iterable[int]):
+    """Flag the follower rows of a scrape whose user is also followed back"""
+    for chunk in _chunks(list(mutual_ids), settings.batch_size):
+        session.execute(
+            update(Follower)
+            .where(
+                Follower.scrape_id == scrape_id,
+                Follower.relation_type == "follower",
+                Follower.follower_id.in_(chunk)
+            )
+            .values(is_mutual=True)
+        )
+        session.commit()
@@ -0,0 +1,218 @@
+from sqlmodel import Session, select
+from sqlalchemy import delete, func, insert, update, or_
+from typing import Iterable, List, Optional, Set, Tuple
+from datetime import datetime
+
+from ..models import FollowerInterval, Scrape, ScrapeStatus, ScrapeType
+from ..config import get_settings
+from .delta_calculator import RELATION_SCRAPE_TYPES
+
+settings = get_settings()
+
+
+def apply_scrape_intervals(
+    session: Session,
+    target_id: int,
+    scrape_id: int,
+    relation_type: str,
+    current_ids: Iterable[int],
+    seen_at: datetime,
+    complete: bool = True
+) -> Tuple[Set[int], Set[int]]:
+    """
+    Fold one scraped relation list into the interval store.
+    Opens intervals for new edges, closes them for lost edges and bumps
+    last_seen on the rest, so writes scale with churn rather than list size.
+    A partial list (complete=False, the head an incremental scrape read)
+    closes nothing and only confirms the edges it saw.
+    Returns: (opened_ids, closed_ids)
+    """
+    current = set(current_ids)
+    open_ids = set(session.exec(
+        select(FollowerInterval.follower_id)
+        .where(
+            FollowerInterval.target_id == target_id,
+            FollowerInterval.relation_type == relation_type,
+            FollowerInterval.end_scrape_id.is_(None)
+        )
+    ).all())
+
+    opened = current - open_ids
+    closed = open_ids - current if complete else set()
+
+    # Close intervals of edges this scrape no longer sees
+    closed_ids = list(closed)
+    for start in range(0, len(closed_ids), settings.batch_size):
+        session.execute(
+            update(FollowerInterval)
+            .where(
+                FollowerInterval.target_id == target_id,
+                FollowerInterval.relation_type == relation_type,
+                FollowerInterval.end_scrape_id.is_(None),
+                FollowerInterval.follower_id.in_(closed_ids[start:start + settings.batch_size])
+            )
+            .values(ended_at=seen_at, end_scrape_id=scrape_id)
+        )
+
+    # Everything still open was confirmed by this scrape
+    confirm = (
+        update(FollowerInterval)
+        .where(
+            FollowerInterval.target_id == target_id,
+            FollowerInterval.relation_type == relation_type,
+            FollowerInterval.end_scrape_id.is_(None)
+        )
+        .values(last_seen=seen_at, last_scrape_id=scrape_id)
+    )
+    if complete:
+        session.execute(confirm)
+    else:
+        seen_ids = list(current & open_ids)
+        for start in range(0, len(seen_ids), settings.batch_size):
+            session.execute(confirm.where(
+                FollowerInterval.follower_id.in_(seen_ids[start:start + settings.batch_size])
+            ))
+
+    # Open intervals for new edges with chunked Core inserts
+    opened_ids = list(opened)
+    for start in range(0, len(opened_ids), settings.batch_size):
+        session.execute(insert(FollowerInterval), [
+            {
+                "target_id": target_id,
+                "follower_id": follower_id,
+                "relation_type": relation_type,
+                "first_seen": seen_at,
+                "last_seen": seen_at,
+                "first_scrape_id": scrape_id,
+                "last_scrape_id": scrape_id,
+            }
+            for follower_id in opened_ids[start:start + settings.batch_size]
+        ])
+
+    return opened, closed
+
+
+def neighbour_scrapes(session: Session, scrape: Scrape, relation_type: str) -> Tuple:
+    """Previous and next completed scrape covering a relation, and the next one that read all of it"""
+    covering = select(Scrape).where(
+        Scrape.account_id == scrape.account_id,
+        Scrape.status == ScrapeStatus.COMPLETED,
+        Scrape.scrape_type.in_(RELATION_SCRAPE_TYPES[relation_type])
+    )
+    previous = session.exec(covering.where(Scrape.id < scrape.id).order_by(Scrape.id.desc()).limit(1)).first()
+    later = covering.where(Scrape.id > scrape.id).order_by(Scrape.id).limit(1)
+    return (
+        previous,
+        session.exec(later).first(),
+        session.exec(later.where(Scrape.scrape_type != ScrapeType.INCREMENTAL)).first()
+    )
+
+
+def remove_scrape_intervals(session: Session, scrape: Scrape):
+    """
+    Take a scrape that is being deleted out of the interval store.
+    Intervals only it observed are dropped. An interval it opened now starts at
+    the next scrape of the relation, and one it confirmed last ends its run at the
+    previous one. An interval it closed is closed by the next complete scrape or
+    by the next interval of the same edge, whichever comes first; with neither it
+    is open again.
+    """
+    for relation_type in ("follower", "following"):
+        of_relation = [
+            FollowerInterval.target_id == scrape.account_id,
+            FollowerInterval.relation_type == relation_type
+        ]
+        previous, next_scrape, next_complete = neighbour_scrapes(session, scrape, relation_type)
+        
+        session.execute(delete(FollowerInterval).where(
+            *of_relation,
+            FollowerInterval.first_scrape_id == scrape.id,
+            FollowerInterval.last_scrape_id == scrape.id
+        ))
+        if next_scrape:
+            session.execute(
+                update(FollowerInterval)
+                .where(*of_relation, FollowerInterval.first_scrape_id == scrape.id)
+                .values(first_scrape_id=next_scrape.id, first_seen=next_scrape.completed_at)
+            )
+        if previous:
+            session.execute(
+                update(FollowerInterval)
+                .where(*of_relation, FollowerInterval.last_scrape_id == scrape.id)
+                .values(last_scrape_id=previous.id, last_seen=previous.completed_at)
+            )
+        
+        closed = session.exec(
+            select(FollowerInterval).where(*of_relation, FollowerInterval.end_scrape_id == scrape.id)
+        ).all()
+        closed_ids = [interval.follower_id for interval in closed]
+        reopened_at = {}
+        for start in range(0, len(closed_ids), settings.batch_size):
+            reopened_at.update(session.exec(
+                select(FollowerInterval.follower_id, func.min(FollowerInterval.first_scrape_id))
+                .where(
+                    *of_relation,
+                    FollowerInterval.first_scrape_id > scrape.id,
+                    FollowerInterval.follower_id.in_(closed_ids[start:start + settings.batch_size])
+                )
+                .group_by(FollowerInterval.follower_id)
+            ).all())
+        
+        for interval in closed:
+            ends = [end for end in (next_complete and next_complete.id, reopened_at.get(interval.follower_id)) if end]
+            interval.end_scrape_id = min(ends, default=None)
+            interval.ended_at = session.get(Scrape, interval.end_scrape_id).completed_at if ends else None
+            session.add(interval)
+    
+    session.flush()
+
+
+def as_of_conditions(
+    target_id: int,
+    at: Optional[datetime] = None,
+    scrape_id: Optional[int] = None,
+    relation_type: Optional[str] = None
+) -> List:
+    """
+    Filter for the intervals of an account that were valid at a point in time.
+    The point is either a timestamp or a scrape id; with neither, the current state is used.
+    """
+    conditions = [FollowerInterval.target_id == target_id]
+
+    if relation_type:
+        conditions.append(FollowerInterval.relation_type == relation_type)
+
+    if scrape_id is not None:
+        conditions += [
+            FollowerInterval.first_scrape_id <= scrape_id,
+            or_(
+                FollowerInterval.end_scrape_id.is_(None),
+                FollowerInterval.end_scrape_id > scrape_id
+            )
+        ]
+    elif at is not None:
+        conditions += [
+            FollowerInterval.first_seen <= at,
+            or_(
+                FollowerInterval.ended_at.is_(None),
+                FollowerInterval.ended_at > at
+            )
+        ]
+    else:
+        conditions.append(FollowerInterval.end_scrape_id.is_(None))
+
+    return conditions
+
+
+def followers_as_of(
+    session: Session,
+    target_id: int,
+    at: Optional[datetime] = None,
+    scrape_id: Optional[int] = None,
+    relation_type: str = "follower"
+) -> Set[int]:
+    """Rebuild the follower (or following) id set of an account as of a timestamp or scrape"""
+    return set(session.exec(
+        select(FollowerInterval.follower_id)
+        .where(*as_of_conditions(target_id, at=at, scrape_id=scrape_id, relation_type=relation_type))
+    ).all())
@@ -0,0 +1,119 @@
+"""
+Cross-account audience overlap.
+Every completed scrape stores MinHash/HyperLogLog sketches next to its id sets.
+Overlap between accounts is estimated from the sketches of their latest scrapes
+in a few milliseconds, or computed exactly by intersecting the stored id sets.
+"""
+from itertools import combinations
+from typing import Dict, List
+
+import numpy as np
+from sqlmodel import Session, select
+
+from ..models import Scrape, ScrapeStatus, ScrapeSketch
+from ..utils.sketches import (
+    hash_ids, minhash, hll, jaccard, overlap_from_jaccard, hll_merge, hll_count,
+    encode_minhash, decode_minhash, encode_hll, decode_hll,
+)
+from .delta_calculator import RELATION_SCRAPE_TYPES, load_relation_ids
+
+
+def store_scrape_sketches(
+    session: Session,
+    scrape_id: int,
+    id_sets: Dict[str, np.ndarray]
+):
+    """Store the sketches of a scrape, keyed by relation type"""
+    for relation_type, ids in id_sets.items():
+        hashes = hash_ids(ids)
+        session.merge(ScrapeSketch(
+            scrape_id=scrape_id,
+            relation_type=relation_type,
+            count=len(ids),
+            minhash=encode_minhash(minhash(hashes)),
+            hll=encode_hll(hll(hashes))
+        ))
+    session.flush()
+
+
+def latest_scrape_ids(
+    session: Session,
+    account_ids: List[int],
+    relation_type: str = "follower",
+    with_sketch: bool = False
+) -> Dict[int, int]:
+    """Latest completed scrape of each account that covered a relation"""
+    query = select(Scrape.account_id, Scrape.id).where(
+        Scrape.account_id.in_(account_ids),
+        Scrape.status == ScrapeStatus.COMPLETED,
+        Scrape.scrape_type.in_(RELATION_SCRAPE_TYPES[relation_type])
+    )
+    if with_sketch:
+        query = query.join(ScrapeSketch, ScrapeSketch.scrape_id == Scrape.id).where(
+            ScrapeSketch.relation_type == relation_type
+        )
+
+    latest = {}
+    for account_id, scrape_id in session.exec(query.order_by(Scrape.account_id, Scrape.completed_at.desc())):
+        latest.setdefault(account_id, scrape_id)
+    return latest
+
+
+def sketch_overlap(
+    session: Session,
+    account_ids: List[int],
+    relation_type: str = "follower"
+) -> Dict:
+    """Pairwise Jaccard/overlap estimates and the union size, from stored sketches"""
+    latest = latest_scrape_ids(session, account_ids, relation_type, with_sketch=True)
+    sketches = {
+        account_id: session.get(ScrapeSketch, (scrape_id, relation_type))
+        for account_id, scrape_id in latest.items()
+    }
+    minhashes = {account_id: decode_minhash(s.minhash) for account_id, s in sketches.items()}
+
+    pairs = []
+    for a, b in combinations(sorted(sketches), 2):
+        similarity = jaccard(minhashes[a], minhashes[b])
+        pairs.append({
+            "account_ids": [a, b],
+            "jaccard": round(similarity, 4),
+            "overlap": round(overlap_from_jaccard(similarity, sketches[a].count, sketches[b].count))
+        })
+
+    union = hll_count(hll_merge(decode_hll(s.hll) for s in sketches.values())) if sketches else 0
+    return {
+        "scrapes": {a: {"scrape_id": s.scrape_id, "count": s.count} for a, s in sketches.items()},
+        "pairs": pairs,
+        "union": round(union)
+    }
+
+
+def exact_overlap(
+    session: Session,
+    account_ids: List[int],
+    relation_type: str = "follower"
+) -> Dict:
+    """Pairwise Jaccard/overlap and the union size, from the stored id sets"""
+    latest = latest_scrape_ids(session, account_ids, relation_type)
+    id_sets = {
+        account_id: load_relation_ids(session, scrape_id, relation_type)
+        for account_id, scrape_id in latest.items()
+    }
+
+    pairs = []
+    for a, b in combinations(sorted(id_sets), 2):
+        overlap = len(np.intersect1d(id_sets[a], id_sets[b], assume_unique=True))
+        union = len(id_sets[a]) + len(id_sets[b]) - overlap
+        pairs.append({
+            "account_ids": [a, b],
+            "jaccard": round(overlap / union, 4) if union else 0.0,
+            "overlap": overlap
+        })
+
+    union = len(np.unique(np.concatenate(list(id_sets.values())))) if id_sets else 0
+    return {
+        "scrapes": {a: {"scrape_id": latest[a], "count": len(ids)} for a, ids in id_sets.items()},
+        "pairs": pairs,
+        "union": union
+    }
@@ -1,7 +1,7 @@
 import schedule
 import time
 import threading
-from datetime import datetime
+from datetime import datetime, timedelta
 from sqlmodel import Session, select
 
 from ..database import session_scope
@@ -13,6 +13,27 @@ from ..config import get_settings
 settings = get_settings()
 
 
+def next_scrape_type(session: Session, account_id: int) -> ScrapeType:
+    """
+    Incremental scrape, unless the account's last full scrape is older than
+    settings.full_scrape_interval_days; full scrapes reconcile unfollows and
+    refresh the following list.
+    """
+    last_full = session.exec(
+        select(Scrape.completed_at)
+        .where(
+            Scrape.account_id == account_id,
+            Scrape.status == "completed",
+            Scrape.scrape_type == ScrapeType.BOTH
+        )
+        .order_by(Scrape.completed_at.desc())
+        .limit(1)
+    ).first()
+    if last_full and datetime.utcnow() - last_full < timedelta(days=settings.full_scrape_interval_days):
+        return ScrapeType.INCREMENTAL
+    return ScrapeType.BOTH
+
+
 def scheduled_scrape():
     """Run scheduled scrapes for bookmarked accounts"""
     with session_scope() as session:
@@ -23,9 +44,10 @@ def scheduled_scrape():
         
         for account in bookmarked_accounts:
             # Create a new scrape record
+            scrape_type = next_scrape_type(session, account.id)
             scrape = Scrape(
                 account_id=account.id,
-                scrape_type=ScrapeType.BOTH,
+                scrape_type=scrape_type,
                 status="pending"
             )
             session.add(scrape)
@@ -37,20 +59,38 @@ def scheduled_scrape():
                 sync_scrape,
                 scrape_id=scrape.id,
                 username=account.username,
-                scrape_type="both",
+                scrape_type=scrape_type.value,
                 use_private=True  # Use private creds for scheduled scrapes
             )
             
             scrape.job_id = job.id
             session.commit()
             
-            print(f"Scheduled scrape for {account.username} - Job ID: {job.id}")
+            print(f"Scheduled {scrape_type.value} scrape for {account.username} - Job ID: {job.id}")
+
+
+def scheduled_archive():
+    """Queue the job that moves old scrapes to the Parquet archive"""
+    from .archiver import archive_old_scrapes
+    job = queue.enqueue(archive_old_scrapes)
+    print(f"Scheduled archive of scrapes older than {settings.archive_after_days} days - Job ID: {job.id}")
+
+
+def scheduled_compaction():
+    """Queue the retention job that thins old scrapes"""
+    from .compactor import compact_old_scrapes
+    job = queue.enqueue(compact_old_scrapes)
+    print(f"Scheduled compaction of old scrapes - Job ID: {job.id}")
 
 
 def run_scheduler():
     """Run the scheduler in a separate thread"""
     # Schedule daily scrapes at 2:00 AM
     schedule.every().day.at("02:00").do(scheduled_scrape)
+    # Thin old scrapes first; archiving skips the compacted ones
+    schedule.every().day.at("03:00").do(scheduled_compaction)
+    # Archive old scrapes once the nightly scrapes are queued
+    schedule.every().day.at("04:00").do(scheduled_archive)
     
     while True:
         schedule.run_pending()
@@ -0,0 +1,142 @@
+"""
+Diff of any two completed scrapes of an account.
+Added/removed ids come from the stored id sets (or follower_intervals for
+scrapes compacted under interval storage, the Parquet archive for archived
+scrapes without id sets), profile changes from profile_changes of the involved
+users recorded in between.
+Completed scrapes never change, so each (scrape_a, scrape_b) diff is cached in
+Redis and repeat views only page through the cached result.
+"""
+import json
+from typing import Dict, List
+
+import numpy as np
+import redis
+from sqlmodel import Session, select
+
+from ..models import Scrape, ScrapeType, ProfileChange
+from ..utils.id_sets import to_id_array, difference
+from ..config import get_settings
+from .archiver import read_archived_scrape
+from .delta_calculator import load_relation_ids, load_scrape_id_set
+from .intervals import followers_as_of
+from .queue import redis_conn
+
+settings = get_settings()
+
+RELATIONS = {
+    ScrapeType.FOLLOWERS: ["follower"],
+    ScrapeType.FOLLOWING: ["following"],
+    ScrapeType.BOTH: ["follower", "following"],
+    ScrapeType.INCREMENTAL: ["follower"],
+}
+
+
+def diff_cache_key(scrape_a_id: int, scrape_b_id: int) -> str:
+    return f"snapshot_diff:{scrape_a_id}:{scrape_b_id}"
+
+
+def relation_ids_at(session: Session, scrape: Scrape, relation_type: str) -> np.ndarray:
+    """Id set of a relation as of a scrape"""
+    if scrape.compacted_at:
+        ids = load_scrape_id_set(session, scrape.id, relation_type)
+        if ids is not None:
+            return ids
+        # Id sets of scrapes thinned under interval storage are gone; the intervals still know
+        return to_id_array(followers_as_of(
+            session, scrape.account_id, scrape_id=scrape.id, relation_type=relation_type
+        ))
+    if scrape.archived_at:
+        ids = load_scrape_id_set(session, scrape.id, relation_type)
+        if ids is not None:
+            return ids
+        # Scrapes archived before id sets were stored only have their Parquet file
+        table = read_archived_scrape(
+            scrape.account_id, scrape.id, columns=["follower_id"],
+            filters=[("relation_type", "=", relation_type)]
+        )
+        return to_id_array(table.column("follower_id").to_numpy())
+    return load_relation_ids(session, scrape.id, relation_type)
+
+
+def compute_snapshot_diff(session: Session, scrape_a: Scrape, scrape_b: Scrape) -> Dict:
+    """
+    Added/removed ids of every relation both scrapes covered, and the profile
+    changes of the involved users observed between the two scrapes.
+    """
+    relation_types = [r for r in RELATIONS[scrape_a.scrape_type] if r in RELATIONS[scrape_b.scrape_type]]
+
+    relations = {}
+    involved = []
+    for relation_type in relation_types:
+        ids_a = relation_ids_at(session, scrape_a, relation_type)
+        ids_b = relation_ids_at(session, scrape_b, relation_type)
+        relations[relation_type] = {
+            "added": difference(ids_b, ids_a).tolist(),
+            "removed": difference(ids_a, ids_b).tolist(),
+        }
+        involved.extend([ids_a, ids_b])
+
+    # Only changes of the involved users are loaded, in chunks of settings.batch_size ids
+    start, end = sorted([scrape_a.completed_at, scrape_b.completed_at])
+    involved_ids = (to_id_array(np.concatenate(involved)) if involved else to_id_array([])).tolist()
+    changes = []
+    for chunk_start in range(0, len(involved_ids), settings.batch_size):
+        changes += session.exec(
+            select(ProfileChange)
+            .where(
+                ProfileChange.user_id.in_(involved_ids[chunk_start:chunk_start + settings.batch_size]),
+                ProfileChange.changed_at > start,
+                ProfileChange.changed_at <= end
+            )
+        ).all()
+    changes.sort(key=lambda change: (change.changed_at, change.id))
+
+    return {
+        "scrape_a": scrape_a.id,
+        "scrape_b": scrape_b.id,
+        "relations": relations,
+        "profile_changes": [
+            {
+                "user_id": change.user_id,
+                "field": change.field,
+                "old_value": change.old_value,
+                "new_value": change.new_value,
+                "changed_at": change.changed_at.isoformat(),
+            }
+            for change in changes
+        ],
+    }
+
+
+def get_snapshot_diff(session: Session, scrape_a: Scrape, scrape_b: Scrape) -> Dict:
+    """Cached diff of two completed scrapes"""
+    key = diff_cache_key(scrape_a.id, scrape_b.id)
+    try:
+        cached = redis_conn.get(key)
+        if cached:
+            return json.loads(cached)
+    except redis.RedisError as e:
+        print(f"Diff cache unavailable: {e}")
+        cached = None
+
+    diff = compute_snapshot_diff(session, scrape_a, scrape_b)
+
+    try:
+        redis_conn.setex(key, settings.diff_cache_ttl, json.dumps(diff))
+    except redis.RedisError:
+        pass
+
+    return diff
+
+
+def invalidate_snapshot_diffs(scrape_ids: List[int]):
+    """Drop cached diffs that involve any of the given scrapes"""
+    try:
+        for scrape_id in scrape_ids:
+            for pattern in (f"snapshot_diff:{scrape_id}:*", f"snapshot_diff:*:{scrape_id}"):
+                keys = list(redis_conn.scan_iter(match=pattern))
+                if keys:
+                    redis_conn.delete(*keys)
+    except redis.RedisError as e:
+        print(f"Diff cache unavailable: {e}")
@@ -1,16 +1,31 @@
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, Optional
 import json
 import redis
 import asyncio
+import numpy as np
+from contextlib import aclosing
 from datetime import datetime
 from sqlmodel import Session
 
 from ..database import session_scope
-from ..models import Scrape, Account, Follower, ScrapeStatus, FollowerRelationType
+from ..models import Scrape, Account, ScrapeStatus, FollowerRelationType
 from ..scrapers import InstagramScraper
+from ..scrapers.graphql_scraper import close_async_client, ScrapedPage
+from ..scrapers.profile_cache import ACCOUNT_FIELDS
 from ..config import get_settings
 from .queue import redis_conn
 from ..utils.rate_limiter import SlidingWindowRateLimiter
+from ..utils.proxy_config import request_identity
+from ..utils.id_sets import to_id_array, union, EMPTY
+from .delta_calculator import (
+    store_scrape_id_sets, calculate_mutual_ids, update_scrape_delta, get_previous_scrape_id, load_relation_ids
+)
+from .ingest import upsert_instagram_users, insert_memberships, mark_mutuals
+from .overlap import store_scrape_sketches
+from .avatars import enqueue_avatar_caching
+from .checkpoints import (
+    Checkpoint, CHECKPOINT_FIELDS, load_checkpoint, save_checkpoint, mark_relation_complete, clear_checkpoints
+)
 
 settings = get_settings()
 rate_limiter = SlidingWindowRateLimiter()
@@ -25,6 +40,155 @@ def update_scrape_progress(job_id: str, progress: Dict, scrape_id: Optional[int]
     print(f"UPDATE PROGRESS: {progress}")  # Add console logging
 
 
+class ScrapeCancelled(Exception):
+    """The scrape was cancelled through the API while the job was running"""
+
+
+def cancel_key(scrape_id: int) -> str:
+    return f"scrape_cancel_{scrape_id}"
+
+
+def request_cancel(scrape_id: int):
+    """Ask a running job to stop after its current page"""
+    redis_conn.setex(cancel_key(scrape_id), 3600, 1)
+
+
+def cancel_requested(scrape_id: int) -> bool:
+    try:
+        return bool(redis_conn.exists(cancel_key(scrape_id)))
+    except redis.RedisError:
+        return False
+
+
+async def prefetch_pages(pages: AsyncIterator[ScrapedPage]) -> AsyncIterator[ScrapedPage]:
+    """
+    Start fetching the next page before handing out the current one.
+    When the consumer stops early or fails, the fetch in flight is cancelled and
+    its outcome retrieved, then the page source is closed.
+    """
+    iterator = pages.__aiter__()
+    pending = asyncio.ensure_future(iterator.__anext__())
+    try:
+        while True:
+            try:
+                page = await pending
+            except StopAsyncIteration:
+                return
+            pending = asyncio.ensure_future(iterator.__anext__())
+            yield page
+    finally:
+        pending.cancel()
+        # The source can only be closed once its __anext__ has finished
+        await asyncio.gather(pending, return_exceptions=True)
+        await iterator.aclose()
+
+
+async def stop_at_known(
+    pages: AsyncIterator[ScrapedPage],
+    known_ids: np.ndarray,
+    stop_after: int
+) -> AsyncIterator[ScrapedPage]:
+    """
+    Pass pages through until stop_after consecutive ids are already known.
+    Followers come newest first, so that run marks the end of the new head
+    of the list; no page after it is requested.
+    """
+    streak = 0
+    try:
+        async for page in pages:
+            ids = np.fromiter((u.id for u in page.users), dtype=np.int64, count=len(page.users))
+            reached = False
+            for known in np.isin(ids, known_ids).tolist():
+                streak = streak + 1 if known else 0
+                reached = reached or streak >= stop_after
+            yield page
+            if reached:
+                print(f"[WORKER] Reached {stop_after} known followers in a row, stopping incremental scrape")
+                return
+    finally:
+        await pages.aclose()
+
+
+def persist_page(
+    page: ScrapedPage,
+    page_ids: np.ndarray,
+    scrape_id: int,
+    account_id: int,
+    relation_type: str,
+    seen_at: datetime,
+    scraped: int
+):
+    """
+    Write one page, then its checkpoint and the live counter (runs in a worker thread).
+    The checkpoint is committed last, so it never points past rows that are not stored.
+    """
+    with session_scope() as session:
+        upsert_instagram_users(session, page.users)
+        if settings.follower_storage == "snapshot":
+            insert_memberships(
+                session, account_id, scrape_id, relation_type, page_ids.tolist(), seen_at=seen_at
+            )
+        
+        scrape = session.get(Scrape, scrape_id)
+        save_checkpoint(scrape, relation_type, page.end_cursor, scraped, page_ids)
+
+
+def complete_relation(scrape_id: int, relation_type: str):
+    with session_scope() as session:
+        mark_relation_complete(session.get(Scrape, scrape_id), relation_type)
+
+
+async def persist_relation_pages(
+    pages: AsyncIterator[ScrapedPage],
+    scrape_id: int,
+    account_id: int,
+    relation_type: str,
+    seen_at: datetime,
+    job_id: Optional[str],
+    counts: Dict[str, int],
+    checkpoint: Checkpoint
+) -> np.ndarray:
+    """
+    Save each scraped page as it arrives and keep the checkpoint and live
+    counters on the Scrape row and in the progress feed up to date. Pages are
+    written in a thread while the next page is already being fetched.
+    pages must start after checkpoint.cursor; a completed relation is not fetched.
+    Returns the id set of the relation.
+    """
+    count_field = CHECKPOINT_FIELDS[relation_type][2]
+    label = "followers" if relation_type == FollowerRelationType.FOLLOWER else "following"
+    if checkpoint.complete:
+        return checkpoint.ids
+    id_chunks = [checkpoint.ids]
+    
+    # aclosing stops the prefetch as soon as persisting fails or the scrape is cancelled
+    async with aclosing(prefetch_pages(pages)) as prefetched:
+        async for page in prefetched:
+            # Pages already fetched are kept; no further page is requested
+            if cancel_requested(scrape_id):
+                raise ScrapeCancelled()
+            page_ids = to_id_array(u.id for u in page.users)
+            
+            counts[count_field] += len(page_ids)
+            await asyncio.to_thread(
+                persist_page, page, page_ids, scrape_id, account_id, relation_type,
+                seen_at, counts[count_field]
+            )
+            if not len(page_ids):
+                continue
+            
+            id_chunks.append(page_ids)
+            update_scrape_progress(job_id, {
+                "status": "in_progress",
+                "message": f"Fetched {counts[count_field]} {label}...",
+                "progress": 25,
+                **counts
+            }, scrape_id)
+    
+    await asyncio.to_thread(complete_relation, scrape_id, relation_type)
+    return to_id_array(np.concatenate(id_chunks))
+
+
 async def scrape_instagram_account(
     scrape_id: int,
     username: str,
@@ -36,8 +200,9 @@ async def scrape_instagram_account(
     job_id = None
     
     try:
-        # Check rate limit before starting
-        identifier = f"user:{username}"
+        # Check rate limit before starting; the budget belongs to the proxy or
+        # host the requests leave from, not to the account being scraped
+        identifier = request_identity()
         can_request, wait_time = rate_limiter.can_make_request(identifier)
         
         if not can_request:
@@ -57,58 +222,79 @@ async def scrape_instagram_account(
             
             job_id = scrape.job_id
             
+            relations = []
+            if scrape_type in ("both", "followers", "incremental"):
+                relations.append(FollowerRelationType.FOLLOWER)
+            if scrape_type in ("both", "following"):
+                relations.append(FollowerRelationType.FOLLOWING)
+            
+            # A retried or re-enqueued job picks up where the last attempt stopped
+            checkpoints = {r: load_checkpoint(session, scrape, r) for r in relations}
+            counts = {"followers_scraped": 0, "following_scraped": 0}
+            for relation_type, checkpoint in checkpoints.items():
+                counts[CHECKPOINT_FIELDS[relation_type][2]] = len(checkpoint.ids)
+            resumed = any(checkpoint.resumable for checkpoint in checkpoints.values())
+            
+            # An incremental scrape stops at followers the previous scrape already
+            # had; without one there is nothing to stop at and the whole list is read
+            incremental = scrape_type == "incremental"
+            known_ids = EMPTY
+            if incremental:
+                previous_id = get_previous_scrape_id(
+                    session, scrape.account_id, scrape.id, FollowerRelationType.FOLLOWER
+                )
+                if previous_id:
+                    known_ids = load_relation_ids(session, previous_id, FollowerRelationType.FOLLOWER)
+            
             # Update status to in progress
             scrape.status = ScrapeStatus.IN_PROGRESS
-            scrape.started_at = datetime.utcnow()
+            if not (resumed and scrape.started_at):
+                scrape.started_at = datetime.utcnow()
+            scrape.is_partial = False
             session.commit()
             
             # Update progress
             update_scrape_progress(job_id, {
                 "status": "in_progress",
-                "message": "Starting scrape...",
-                "progress": 0
+                "message": "Resuming scrape..." if resumed else "Starting scrape...",
+                "progress": 0,
+                **counts
             }, scrape_id)
         
-        # Record the request
-        rate_limiter.record_request(identifier)
-        
-        # Initialize scraper with session
+        # Initialize scraper with session; every request it makes is drawn
+        # from the identity's rate limit budget
         with session_scope() as session:
-            scraper = InstagramScraper(session)
+            scraper = InstagramScraper(session, throttle=lambda: rate_limiter.acquire(identifier))
+            account_id = session.get(Scrape, scrape_id).account_id
         
-        # Perform scrape based on type
-        if scrape_type == "both":
-            update_scrape_progress(job_id, {
-                "status": "in_progress",
-                "message": "Fetching followers and following...",
-                "progress": 25
-            }, scrape_id)
-            
-            data = await scraper.scrape_both(username, use_private)
-            followers = data["followers"]
-            following = data["following"]
-            
-        elif scrape_type == "followers":
-            update_scrape_progress(job_id, {
-                "status": "in_progress",
-                "message": "Fetching followers...",
-                "progress": 25
-            }, scrape_id)
-            
-            followers = await scraper.scrape_followers(username, use_private)
-            following = []
-            
-        else:  # following
-            update_scrape_progress(job_id, {
-                "status": "in_progress",
-                "message": "Fetching following...",
-                "progress": 25
-            }, scrape_id)
-            
-            followers = []
-            following = await scraper.scrape_following(username, use_private)
+        def relation_pages(relation_type: str, checkpoint: Checkpoint) -> AsyncIterator[ScrapedPage]:
+            pages = scraper.iter_relation(username, relation_type, use_private, after=checkpoint.cursor)
+            if incremental:
+                pages = stop_at_known(pages, known_ids, settings.incremental_stop_after)
+            return pages
         
-        # Process and save data
+        # Persist every page as it arrives; only the id sets are kept in memory.
+        # Both lists paginate concurrently, interleaving within the shared budget.
+        seen_at = datetime.utcnow()
+        results = await asyncio.gather(*[
+            persist_relation_pages(
+                relation_pages(relation_type, checkpoint),
+                scrape_id, account_id, relation_type, seen_at, job_id, counts, checkpoint
+            )
+            for relation_type, checkpoint in checkpoints.items()
+        ])
+        id_sets = dict(zip(relations, results))
+        if cancel_requested(scrape_id):
+            raise ScrapeCancelled()
+        
+        follower_ids = id_sets.get(FollowerRelationType.FOLLOWER, EMPTY)
+        following_ids = id_sets.get(FollowerRelationType.FOLLOWING, EMPTY)
+        # Only the head was read; the stored set is the followers known now
+        stored_sets = dict(id_sets)
+        if incremental:
+            stored_sets[FollowerRelationType.FOLLOWER] = follower_ids = union(known_ids, follower_ids)
+        
+        # Finalize: mutuals, id sets, intervals and delta
         with session_scope() as session:
             scrape = session.get(Scrape, scrape_id)
             account = session.get(Account, scrape.account_id)
@@ -116,89 +302,87 @@ async def scrape_instagram_account(
             update_scrape_progress(job_id, {
                 "status": "in_progress",
                 "message": "Processing data...",
-                "progress": 50
+                "progress": 75,
+                **counts
             }, scrape_id)
             
-            # Create follower records
-            follower_records = []
-            
-            # Process followers
-            for f in followers:
-                follower_records.append(Follower(
-                    target_id=account.id,
-                    follower_id=int(f["id"]),
-                    scrape_id=scrape.id,
-                    username=f["username"],
-                    full_name=f.get("full_name"),
-                    profile_pic_url=f.get("profile_pic_url"),
-                    is_verified=f.get("is_verified", False),
-                    is_private=f.get("is_private", False),
-                    relation_type=FollowerRelationType.FOLLOWER
-                ))
-            
-            # Process following
-            following_ids = set()
-            for f in following:
-                following_ids.add(int(f["id"]))
-                follower_records.append(Follower(
-                    target_id=account.id,
-                    follower_id=int(f["id"]),
-                    scrape_id=scrape.id,
-                    username=f["username"],
-                    full_name=f.get("full_name"),
-                    profile_pic_url=f.get("profile_pic_url"),
-                    is_verified=f.get("is_verified", False),
-                    is_private=f.get("is_private", False),
-                    relation_type=FollowerRelationType.FOLLOWING
-                ))
-            
-            # Mark mutuals
-            for record in follower_records:
-                if record.relation_type == FollowerRelationType.FOLLOWER:
-                    if record.follower_id in following_ids:
-                        record.is_mutual = True
+            if settings.follower_storage == "snapshot":
+                mark_mutuals(session, scrape.id, calculate_mutual_ids(follower_ids, following_ids).tolist())
             
-            # Calculate delta from previous scrape
-            from .delta_calculator import update_scrape_delta
-            update_scrape_delta(session, scrape.id)
+            # Store compact id sets and overlap sketches for the relations this scrape covered
+            store_scrape_id_sets(session, scrape.id, stored_sets)
+            store_scrape_sketches(session, scrape.id, stored_sets)
             
-            update_scrape_progress(job_id, {
-                "status": "in_progress",
-                "message": "Saving to database...",
-                "progress": 75
-            }, scrape_id)
+            # Interval storage opens/closes validity intervals for the same relations;
+            # an incremental head opens and confirms intervals but cannot close any
+            if settings.follower_storage == "interval":
+                from .intervals import apply_scrape_intervals
+                for relation_type, ids in id_sets.items():
+                    apply_scrape_intervals(
+                        session, account.id, scrape.id, relation_type, ids.tolist(), seen_at,
+                        complete=not incremental
+                    )
             
-            # Bulk insert followers
-            session.bulk_save_objects(follower_records)
+            # Calculate delta from previous scrape
+            update_scrape_delta(session, scrape.id)
             
             # Update scrape results
-            scrape.followers_count = len(followers)
-            scrape.following_count = len(following)
+            scrape.followers_count = len(follower_ids)
+            scrape.following_count = len(following_ids)
             scrape.status = ScrapeStatus.COMPLETED
             scrape.completed_at = datetime.utcnow()
             
-            # Update account stats
-            account.follower_count = len(followers)
-            account.following_count = len(following)
+            # Update account stats, and its metadata from the profile page the scrape fetched
+            profile = scraper.cached_profile(username)
+            if not incremental:
+                account.follower_count = len(follower_ids)
+            elif profile and "follower_count" in profile:
+                # An incremental scrape never sees unfollows, so its id set only grows;
+                # the profile page has the real count (else the last one is kept)
+                account.follower_count = profile["follower_count"]
+            if FollowerRelationType.FOLLOWING in id_sets:
+                # Followers-only scrapes (incremental ones too) keep the last following count
+                account.following_count = len(following_ids)
             account.last_scraped = datetime.utcnow()
+            if profile:
+                for field in ACCOUNT_FIELDS:
+                    if field in profile:
+                        setattr(account, field, profile[field])
+                account.updated_at = datetime.utcnow()
             
             session.commit()
+            clear_checkpoints(scrape.id)
+            if settings.cache_avatars:
+                enqueue_avatar_caching(scrape.id)
             
             update_scrape_progress(job_id, {
                 "status": "completed",
                 "message": "Scrape completed successfully",
                 "progress": 100,
                 "results": {
-                    "followers_count": len(followers),
-                    "following_count": len(following)
+                    "followers_count": len(follower_ids),
+                    "following_count": len(following_ids)
                 }
             }, scrape_id)
             
+    except ScrapeCancelled:
+        # The cancel endpoint already recorded the final status
+        print(f"[WORKER] Scrape {scrape_id} cancelled")
+        update_scrape_progress(job_id, {
+            "status": "cancelled",
+            "message": "Scrape cancelled",
+            "progress": 0,
+            **counts
+        }, scrape_id)
+    
     except Exception as e:
         with session_scope() as session:
             scrape = session.get(Scrape, scrape_id)
             if scrape:
-                scrape.status = ScrapeStatus.FAILED
+                # Checkpointed pages are kept; a retry resumes after them
+                resumable = bool(scrape.followers_scraped or scrape.following_scraped)
+                scrape.status = ScrapeStatus.PARTIAL if resumable else ScrapeStatus.FAILED
+                scrape.is_partial = resumable
                 scrape.error_message = str(e)
                 scrape.completed_at = datetime.utcnow()
                 session.commit()
@@ -210,4 +394,7 @@ async def scrape_instagram_account(
                 "progress": 0
             }, scrape_id)
         
-        raise
\ No newline at end of file
+        raise
+    
+    finally:
+        await close_async_client()
\ No newline at end of file
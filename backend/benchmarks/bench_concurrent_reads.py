@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark API read latency while a worker ingests a large scrape.
+
+Runs the same workload against two engine profiles on a fresh SQLite file:
+  legacy - the previous single default engine (rollback journal, no busy timeout)
+  tuned  - create_writer_engine/create_reader_engine from app.database (WAL, pooled readers)
+
+Usage: python benchmarks/bench_concurrent_reads.py [--rows 50000] [--readers 4]
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import insert, text
+from sqlmodel import SQLModel, create_engine
+
+from app.database import create_writer_engine, create_reader_engine
+from app.models import Account, Scrape, Follower, InstagramUser
+
+READ_QUERIES = [
+    text("SELECT * FROM scrapes WHERE account_id = 1 ORDER BY started_at DESC LIMIT 100"),
+    text("SELECT * FROM accounts ORDER BY id LIMIT 100"),
+    text("SELECT COUNT(*) FROM followers WHERE scrape_id = 1"),
+]
+
+
+def seed(engine):
+    """Create tables plus one account with a completed scrape to read"""
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Account), [{"username": "target", "created_at": datetime.utcnow(),
+                                        "updated_at": datetime.utcnow()}])
+        conn.execute(insert(Scrape), [{"account_id": 1, "scrape_type": "BOTH", "status": "COMPLETED"}
+                                      for _ in range(2)])
+        conn.execute(insert(InstagramUser), [
+            {"id": i, "username": f"user{i}", "first_seen": datetime.utcnow(), "updated_at": datetime.utcnow()}
+            for i in range(1, 1001)
+        ])
+        conn.execute(insert(Follower), [
+            {"target_id": 1, "follower_id": i, "scrape_id": 1, "relation_type": "follower",
+             "first_seen": datetime.utcnow(), "last_seen": datetime.utcnow(), "is_mutual": False}
+            for i in range(1, 1001)
+        ])
+
+
+def ingest(engine, rows: int, done: threading.Event, timings: dict):
+    """Insert a whole scrape in one transaction, like the worker's bulk save"""
+    now = datetime.utcnow()
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(insert(InstagramUser).prefix_with("OR IGNORE"), [
+            {"id": 10_000_000 + i, "username": f"new{i}", "first_seen": now, "updated_at": now}
+            for i in range(rows)
+        ])
+        conn.execute(insert(Follower), [
+            {"target_id": 1, "follower_id": 10_000_000 + i, "scrape_id": 2, "relation_type": "follower",
+             "first_seen": now, "last_seen": now, "is_mutual": False}
+            for i in range(rows)
+        ])
+    timings["ingest"] = time.perf_counter() - start
+    done.set()
+
+
+def read_loop(engine, done: threading.Event, latencies: list, errors: list):
+    """Issue API-style reads until the ingest finishes"""
+    while not done.is_set():
+        for query in READ_QUERIES:
+            start = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    conn.execute(query).fetchall()
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                errors.append(str(e).splitlines()[0])
+
+
+def run_profile(name: str, writer, reader, rows: int, readers: int):
+    seed(writer)
+    done = threading.Event()
+    timings, latencies, errors = {}, [], []
+
+    threads = [threading.Thread(target=read_loop, args=(reader, done, latencies, errors)) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)  # Let readers warm up before the write starts
+    ingest(writer, rows, done, timings)
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+
+    def percentile(q):
+        if not latencies:
+            return float("nan")
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+    print(f"{name:<7} ingest {timings['ingest']:6.2f}s | reads {len(latencies):6d} "
+          f"p50 {percentile(0.50):7.2f}ms p95 {percentile(0.95):7.2f}ms p99 {percentile(0.99):8.2f}ms "
+          f"max {max(latencies, default=float('nan')):8.2f}ms | errors {len(errors)}")
+    if errors:
+        print(f"        first error: {errors[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{tmp}/legacy.db"
+        legacy = create_engine(url, connect_args={"check_same_thread": False})
+        run_profile("legacy", legacy, legacy, args.rows, args.readers)
+
+        url = f"sqlite:///{tmp}/tuned.db"
+        writer = create_writer_engine(url)
+        reader = create_reader_engine(url, writer)
+        run_profile("tuned", writer, reader, args.rows, args.readers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark membership ingest: ORM bulk_save_objects vs chunked Core upserts.
+
+  orm  - the previous path: one Follower object per row, a single
+         bulk_save_objects call and one long transaction
+  core - app.workers.ingest.insert_memberships: executemany upserts in
+         chunks of settings.batch_size, one short transaction per chunk
+
+Each size runs against a fresh SQLite file with the production engine profile.
+Also reports the longest single write transaction, i.e. how long API writers
+could be blocked.
+
+Usage: python benchmarks/bench_ingest.py [--sizes 10000,100000,1000000] [--orm-max 1000000]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel
+
+from app.database import create_writer_engine
+from app.models import Account, Scrape, Follower, ScrapeType
+from app.workers import ingest
+
+
+def fresh_db(path: str):
+    engine = create_writer_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+
+    # Track the longest write transaction
+    longest = {"begin": 0.0, "max": 0.0}
+
+    @event.listens_for(engine, "begin")
+    def on_begin(conn):
+        longest["begin"] = time.perf_counter()
+
+    @event.listens_for(engine, "commit")
+    def on_commit(conn):
+        longest["max"] = max(longest["max"], time.perf_counter() - longest["begin"])
+
+    with Session(engine) as session:
+        account = Account(username="target")
+        session.add(account)
+        session.flush()
+        session.add(Scrape(account_id=account.id, scrape_type=ScrapeType.FOLLOWERS))
+        session.commit()
+    longest["max"] = 0.0
+    return engine, longest
+
+
+def run_orm(engine, rows: int) -> float:
+    now = datetime.utcnow()
+    start = time.perf_counter()
+    with Session(engine) as session:
+        records = [
+            Follower(target_id=1, follower_id=i, scrape_id=1, relation_type="follower",
+                     first_seen=now, last_seen=now)
+            for i in range(rows)
+        ]
+        session.bulk_save_objects(records)
+        session.commit()
+    return time.perf_counter() - start
+
+
+def run_core(engine, rows: int) -> float:
+    start = time.perf_counter()
+    with Session(engine) as session:
+        ingest.insert_memberships(session, 1, 1, "follower", range(rows))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--orm-max", type=int, default=1_000_000, help="skip the ORM path above this size")
+    parser.add_argument("--batch-size", type=int, default=None, help="override settings.batch_size")
+    args = parser.parse_args()
+
+    if args.batch_size:
+        ingest.settings.batch_size = args.batch_size
+    print(f"batch_size={ingest.settings.batch_size}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            for name, runner in (("orm", run_orm), ("core", run_core)):
+                if name == "orm" and size > args.orm_max:
+                    print(f"{name:<5} {size:>9,} rows  skipped (--orm-max)")
+                    continue
+                engine, longest = fresh_db(f"{tmp}/{name}_{size}.db")
+                elapsed = runner(engine, size)
+                engine.dispose()
+                print(f"{name:<5} {size:>9,} rows  {elapsed:7.2f}s  {size / elapsed:>10,.0f} rows/s  "
+                      f"longest write txn {longest['max'] * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark parse + normalize throughput of scraped follower pages.
+
+Builds synthetic GraphQL follower pages (nodes carry the extra fields Instagram
+sends along) and instagrapi UserShort models, then times each way of turning
+them into follower records, per 1,000 nodes:
+
+  graphql: json + dicts       stdlib json.loads, then a dict per node (previous path)
+  graphql: loads + records    orjson (if installed) + ScrapedUser records (current path)
+  instagrapi: .dict() + dict  model.dict(), then a second dict (previous path)
+  instagrapi: records         ScrapedUser read straight from the model (current path)
+
+Peak memory of holding one page of results is reported with tracemalloc.
+
+Usage: python benchmarks/bench_parse.py [--nodes 50000] [--page-size 50] [--repeat 5]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from instagrapi.types import UserShort
+
+from app.scrapers.records import ScrapedUser, loads
+
+
+def graphql_page(start: int, size: int) -> bytes:
+    edges = [
+        {"node": {
+            "id": str(i),
+            "username": f"user_{i}",
+            "full_name": f"User Number {i}",
+            "profile_pic_url": f"https://scontent.cdninstagram.com/v/t51.2885-19/{i}_n.jpg?stp=dst-jpg_s150x150",
+            "is_verified": i % 97 == 0,
+            "is_private": i % 3 == 0,
+            "followed_by_viewer": False,
+            "requested_by_viewer": False,
+            "reel": {"id": str(i), "expiring_at": 1700000000, "has_pride_media": False,
+                     "latest_reel_media": 0, "seen": None, "owner": {"__typename": "GraphUser", "id": str(i)}},
+        }}
+        for i in range(start, start + size)
+    ]
+    return json.dumps({"data": {"user": {"edge_followed_by": {
+        "count": 1000000, "edges": edges,
+        "page_info": {"has_next_page": True, "end_cursor": "QVFE" + "x" * 100}
+    }}}, "status": "ok"}).encode()
+
+
+def legacy_graphql(body: bytes):
+    data = json.loads(body)
+    return [
+        {
+            "id": node.get("id"),
+            "username": node.get("username"),
+            "full_name": node.get("full_name"),
+            "profile_pic_url": node.get("profile_pic_url"),
+            "is_verified": node.get("is_verified", False),
+            "is_private": node.get("is_private", False)
+        }
+        for node in (e["node"] for e in data["data"]["user"]["edge_followed_by"]["edges"])
+    ]
+
+
+def record_graphql(body: bytes):
+    data = loads(body)
+    return [ScrapedUser.from_node(e["node"]) for e in data["data"]["user"]["edge_followed_by"]["edges"]]
+
+
+def legacy_instagrapi(users):
+    out = []
+    for u in users:
+        user = u.dict()
+        out.append({
+            "id": str(user.get("pk", user.get("id", ""))),
+            "username": user.get("username", ""),
+            "full_name": user.get("full_name", ""),
+            "profile_pic_url": user.get("profile_pic_url", ""),
+            "is_verified": user.get("is_verified", False),
+            "is_private": user.get("is_private", False)
+        })
+    return out
+
+
+def record_instagrapi(users):
+    return [ScrapedUser.from_instagrapi(u) for u in users]
+
+
+def measure(func, pages, repeat: int):
+    """Median seconds for all pages, and peak bytes while one page's result is alive"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for page in pages:
+            func(page)
+        samples.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = func(pages[0])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return statistics.median(samples), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=50000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    # The previous instagrapi path calls the deprecated pydantic .dict()
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    starts = range(0, args.nodes, args.page_size)
+    bodies = [graphql_page(start, args.page_size) for start in starts]
+    models = [
+        [UserShort(pk=str(i), username=f"user_{i}", full_name=f"User Number {i}",
+                   profile_pic_url=f"https://scontent.cdninstagram.com/{i}_n.jpg", is_private=i % 3 == 0)
+         for i in range(start, start + args.page_size)]
+        for start in starts
+    ]
+
+    print(f"json decoder: {loads.__module__}.{loads.__name__}, "
+          f"{args.nodes:,} nodes in pages of {args.page_size}\n")
+    print(f"{'path':<28} {'us / 1k nodes':>14} {'page peak KiB':>14}")
+    for name, func, pages in (
+        ("graphql: json + dicts", legacy_graphql, bodies),
+        ("graphql: loads + records", record_graphql, bodies),
+        ("instagrapi: .dict() + dict", legacy_instagrapi, models),
+        ("instagrapi: records", record_instagrapi, models),
+    ):
+        seconds, peak = measure(func, pages, args.repeat)
+        print(f"{name:<28} {seconds / args.nodes * 1e9:14,.0f} {peak / 1024:14,.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Benchmark the hot followers queries: EXPLAIN QUERY PLAN and latency of each.
+
+Loads synthetic data (accounts x scrapes x followers, ~mutual_ratio of them
+mutual) into a fresh SQLite file with the production engine profile, then runs
+every query the API and workers issue against the followers table.
+
+  --without-indexes  drop the secondary indexes first, to compare against the bare PK
+  --check            exit non-zero if any query still scans the whole followers
+                     table (use in CI to catch index regressions)
+
+Usage: python benchmarks/bench_queries.py [--accounts 5] [--scrapes 4] [--followers 20000]
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import delete, except_, exists, func, text, true, update
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, SQLModel, select
+
+from app.database import create_writer_engine
+from app.models import Account, Scrape, Follower, InstagramUser, ScrapeType, ScrapeStatus
+from app.workers import ingest
+
+
+def load(engine, accounts: int, scrapes: int, followers: int, mutual_ratio: float):
+    """Fill the DB; each scrape keeps ~95% of the previous one's followers"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    pool = accounts * followers * 2
+
+    with Session(engine) as session:
+        ingest.upsert_instagram_users(session, [
+            {"id": i, "username": f"user_{i}"} for i in range(1, pool + 1)
+        ])
+        for a in range(accounts):
+            account = Account(username=f"target_{a}")
+            session.add(account)
+            session.commit()
+
+            follower_ids = rng.sample(range(1, pool + 1), followers)
+            for _ in range(scrapes):
+                scrape = Scrape(
+                    account_id=account.id, scrape_type=ScrapeType.BOTH,
+                    status=ScrapeStatus.COMPLETED, completed_at=now
+                )
+                session.add(scrape)
+                session.commit()
+
+                churn = followers // 20
+                follower_ids = follower_ids[churn:] + rng.sample(range(1, pool + 1), churn)
+                mutual_ids = frozenset(rng.sample(follower_ids, int(followers * mutual_ratio)))
+                ingest.insert_memberships(
+                    session, account.id, scrape.id, "follower", set(follower_ids), mutual_ids, now
+                )
+                ingest.insert_memberships(
+                    session, account.id, scrape.id, "following", mutual_ids, mutual_ids, now
+                )
+
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def hot_queries(account_id: int, scrape_id: int, sample_ids):
+    """The followers queries issued by the app, keyed by where they come from"""
+    previous = aliased(Follower)
+    current_ids = select(Follower.follower_id).where(
+        Follower.scrape_id == scrape_id, Follower.relation_type == "follower"
+    )
+    previous_ids = select(Follower.follower_id).where(
+        Follower.scrape_id == scrape_id - 1, Follower.relation_type == "follower"
+    )
+    return {
+        "export: followers of scrape": (
+            select(Follower, InstagramUser)
+            .join(InstagramUser, InstagramUser.id == Follower.follower_id)
+            .where(Follower.target_id == account_id, Follower.scrape_id == scrape_id,
+                   Follower.relation_type == "follower")
+        ),
+        "export: mutuals of scrape": (
+            select(Follower, InstagramUser)
+            .join(InstagramUser, InstagramUser.id == Follower.follower_id)
+            .where(Follower.target_id == account_id, Follower.scrape_id == scrape_id,
+                   Follower.is_mutual == true())
+        ),
+        "export: all rows of account": (
+            select(Follower, InstagramUser)
+            .join(InstagramUser, InstagramUser.id == Follower.follower_id)
+            .where(Follower.target_id == account_id)
+        ),
+        "analytics: mutual growth": (
+            select(Follower.scrape_id, func.count())
+            .where(Follower.target_id == account_id, Follower.is_mutual == true())
+            .group_by(Follower.scrape_id)
+        ),
+        "delta: membership ids": (
+            select(Follower.follower_id)
+            .where(Follower.scrape_id == scrape_id, Follower.relation_type == "follower")
+        ),
+        "delta: new followers (EXCEPT)": (
+            select(func.count()).select_from(except_(current_ids, previous_ids).subquery())
+        ),
+        "delta: flag is_new (anti-join)": (
+            update(Follower)
+            .where(Follower.scrape_id == scrape_id, Follower.relation_type == "follower",
+                   ~exists().where(previous.scrape_id == scrape_id - 1,
+                                   previous.relation_type == "follower",
+                                   previous.follower_id == Follower.follower_id))
+            .values(is_new=True)
+        ),
+        "ingest: mark mutuals": (
+            update(Follower)
+            .where(Follower.scrape_id == scrape_id, Follower.relation_type == "follower",
+                   Follower.follower_id.in_(sample_ids))
+            .values(is_mutual=True)
+        ),
+        "archive/delete: rows of scrape": (
+            delete(Follower).where(Follower.scrape_id == scrape_id)
+        ),
+    }
+
+
+def explain(session: Session, statement) -> str:
+    compiled = statement.compile(session.get_bind(), compile_kwargs={"literal_binds": True})
+    rows = session.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    return " | ".join(row[-1] for row in rows)
+
+
+def time_query(session: Session, statement, repeat: int) -> float:
+    """Median latency in ms; writes are rolled back so every run sees the same data"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = session.execute(statement)
+        if statement.is_select:
+            result.all()
+        samples.append((time.perf_counter() - start) * 1000)
+        session.rollback()
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=5)
+    parser.add_argument("--scrapes", type=int, default=4)
+    parser.add_argument("--followers", type=int, default=20000, help="followers per scrape")
+    parser.add_argument("--mutual-ratio", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--without-indexes", action="store_true")
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_writer_engine(f"sqlite:///{tmp}/bench.db")
+        SQLModel.metadata.create_all(engine)
+        if args.without_indexes:
+            with engine.begin() as conn:
+                for index in Follower.__table__.indexes:
+                    conn.execute(text(f"DROP INDEX {index.name}"))
+
+        start = time.perf_counter()
+        load(engine, args.accounts, args.scrapes, args.followers, args.mutual_ratio)
+        rows = args.accounts * args.scrapes * args.followers * (1 + args.mutual_ratio)
+        print(f"loaded ~{rows:,.0f} followers rows in {time.perf_counter() - start:.1f}s "
+              f"({'without' if args.without_indexes else 'with'} secondary indexes)\n")
+
+        full_scans = []
+        with Session(engine) as session:
+            # Middle account, latest scrape (the previous scrape of an account has id - 1)
+            account_id = args.accounts // 2 + 1
+            scrape_id = session.exec(
+                select(func.max(Scrape.id)).where(Scrape.account_id == account_id)
+            ).one()
+            sample_ids = session.exec(
+                select(Follower.follower_id).where(Follower.scrape_id == scrape_id).limit(1000)
+            ).all()
+
+            for name, statement in hot_queries(account_id, scrape_id, sample_ids).items():
+                plan = explain(session, statement)
+                latency = time_query(session, statement, args.repeat)
+                print(f"{name:<32} {latency:9.2f}ms  {plan}")
+                if "SCAN followers" in plan:
+                    full_scans.append(name)
+        engine.dispose()
+
+    if args.check and full_scans:
+        print(f"\nFull table scans: {', '.join(full_scans)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
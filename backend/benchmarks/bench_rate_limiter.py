@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark rate limit decisions against a live Redis (settings.redis_url).
+
+  previous: check + record   GET backoff, ZREMRANGEBYSCORE, up to three ZCOUNTs
+                             and a ZRANGE, then ZADD + EXPIRE (previous path)
+  script: reserve            RESERVE_SCRIPT via EVALSHA, one round trip (current path)
+
+Reports the median and p99 latency per decision, then lets --workers threads
+(each with its own connection) race for one window's budget with both paths
+and reports how many requests each granted; the budget is
+max_requests_per_window.
+
+Usage: python benchmarks/bench_rate_limiter.py [--decisions 2000] [--workers 8] [--attempts 10]
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import redis
+
+from app.config import get_settings
+from app.utils.rate_limiter import SlidingWindowRateLimiter
+
+
+def legacy_check(limiter: SlidingWindowRateLimiter, identifier: str) -> bool:
+    conn = limiter.redis_conn
+    backoff_until = conn.get(limiter._get_backoff_key(identifier))
+    if backoff_until and time.time() < float(backoff_until):
+        return False
+    key = limiter._get_key(identifier)
+    now = time.time()
+    window_start = now - limiter.window_minutes * 60
+    conn.zremrangebyscore(key, 0, window_start)
+    if conn.zcount(key, window_start, now) >= limiter.max_requests_per_window:
+        conn.zrange(key, 0, 0, withscores=True)
+        return False
+    if conn.zcount(key, now - 3600, now) >= limiter.max_requests_per_hour:
+        conn.zrange(key, 0, 0, withscores=True)
+        return False
+    return conn.zcount(key, now - 60, now) < limiter.requests_per_minute
+
+
+def legacy_reserve(limiter: SlidingWindowRateLimiter, identifier: str) -> bool:
+    if not legacy_check(limiter, identifier):
+        return False
+    limiter.record_request(identifier)
+    return True
+
+
+def script_reserve(limiter: SlidingWindowRateLimiter, identifier: str) -> bool:
+    return limiter.reserve(identifier)[0]
+
+
+def new_limiter() -> SlidingWindowRateLimiter:
+    limiter = SlidingWindowRateLimiter(redis.from_url(get_settings().redis_url))
+    # Let every decision reach the sorted set; the window limit still applies to the race
+    limiter.requests_per_minute = 10 ** 9
+    return limiter
+
+
+def latency(func, decisions: int):
+    """Per-decision seconds on a fresh identifier that is over its window budget after 20 calls"""
+    limiter = new_limiter()
+    identifier = f"bench:{uuid.uuid4().hex}"
+    samples = []
+    try:
+        for _ in range(decisions):
+            start = time.perf_counter()
+            func(limiter, identifier)
+            samples.append(time.perf_counter() - start)
+    finally:
+        limiter.redis_conn.delete(limiter._get_key(identifier))
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99)]
+
+
+def race(func, workers: int, attempts: int) -> int:
+    identifier = f"bench:{uuid.uuid4().hex}"
+    barrier = threading.Barrier(workers)
+    granted = []
+
+    def worker():
+        limiter = new_limiter()
+        barrier.wait()
+        for _ in range(attempts):
+            if func(limiter, identifier):
+                granted.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    new_limiter().redis_conn.delete(f"rate_limit:{identifier}")
+    return len(granted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--decisions", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--attempts", type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        redis.from_url(get_settings().redis_url).ping()
+    except redis.RedisError as e:
+        sys.exit(f"Redis is not reachable at {get_settings().redis_url}: {e}")
+
+    budget = new_limiter().max_requests_per_window
+    print(f"{args.decisions:,} decisions; race of {args.workers} workers x {args.attempts} attempts "
+          f"for a budget of {budget}\n")
+    print(f"{'path':<26} {'median us':>10} {'p99 us':>10} {'granted':>8}")
+    for name, func in (("previous: check + record", legacy_reserve), ("script: reserve", script_reserve)):
+        median, p99 = latency(func, args.decisions)
+        granted = race(func, args.workers, args.attempts)
+        print(f"{name:<26} {median * 1e6:10,.0f} {p99 * 1e6:10,.0f} {granted:8}")
+
+
+if __name__ == "__main__":
+    main()
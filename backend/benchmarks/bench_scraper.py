@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Benchmark the scraper and the full scrape task against the offline stand-in
+server (benchmarks/fake_instagram.py), so results do not depend on Instagram,
+proxies or rate limits.
+
+  scraper   InstagramScraper.scrape_both over the fake GraphQL endpoints
+  task      scrape_instagram_account end to end on a fresh SQLite database,
+            with time per stage: waiting (pagination not overlapped with
+            persisting), persist (page upserts and checkpoints), then each
+            finalize step
+
+Reports pages/s, rows/s and the process's peak RSS after each stage (a high
+water mark, so the task's figure includes the scraper run). The rate limiter
+is replaced by an unlimited one; if Redis is not reachable, checkpoints and
+progress go to an in-memory stand-in. --check exits non-zero unless every row
+was scraped despite the injected 500s and 429s.
+
+Usage: python benchmarks/bench_scraper.py [--followers 20000] [--following 2000] [--page-size 50]
+       [--latency-ms 5] [--error-rate 0.02] [--throttle-rate 0.02] [--json] [--check]
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND))
+sys.path.insert(0, str(BACKEND / "benchmarks"))
+
+from fake_instagram import FakeConfig, relation_ids, start_server  # noqa: E402
+
+
+class MemoryRedis:
+    """The few Redis commands the scrape task uses, kept in a dict"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def exists(self, *keys):
+        return sum(key in self.data for key in keys)
+
+    def rpush(self, key, *values):
+        self.data.setdefault(key, []).extend(values)
+
+    def lrange(self, key, start, end):
+        return list(self.data.get(key, []))
+
+    def expire(self, key, ttl):
+        return key in self.data
+
+    def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+
+class UnlimitedRateLimiter:
+    def can_make_request(self, identifier):
+        return True, None
+
+    async def acquire(self, identifier):
+        return None
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux (bytes on macOS)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def timed(stages, name, func):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stages[name] += time.perf_counter() - start
+    return wrapper
+
+
+def run_scraper(username: str) -> dict:
+    from app.scrapers import InstagramScraper
+    from app.scrapers.graphql_scraper import close_async_client
+
+    async def scrape():
+        try:
+            return await InstagramScraper().scrape_both(username)
+        finally:
+            await close_async_client()
+
+    start = time.perf_counter()
+    results = asyncio.run(scrape())
+    return {
+        "seconds": time.perf_counter() - start,
+        "followers": len(results["followers"]),
+        "following": len(results["following"]),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_task(username: str) -> dict:
+    import redis
+    from app.database import init_db, session_scope
+    from app.models import Account, Scrape, ScrapeType
+    from app.workers import checkpoints, intervals, tasks
+
+    conn = tasks.redis_conn
+    try:
+        conn.ping()
+    except redis.RedisError:
+        conn = MemoryRedis()
+    tasks.redis_conn = checkpoints.redis_conn = conn
+    tasks.rate_limiter = UnlimitedRateLimiter()
+
+    stages = defaultdict(float)
+    tasks.persist_page = timed(stages, "persist", tasks.persist_page)
+    for name in ("mark_mutuals", "store_scrape_id_sets", "store_scrape_sketches", "update_scrape_delta"):
+        setattr(tasks, name, timed(stages, name, getattr(tasks, name)))
+    intervals.apply_scrape_intervals = timed(stages, "apply_scrape_intervals", intervals.apply_scrape_intervals)
+
+    init_db()
+    with session_scope() as session:
+        account = Account(username=username)
+        session.add(account)
+        session.flush()
+        scrape = Scrape(account_id=account.id, scrape_type=ScrapeType.BOTH)
+        session.add(scrape)
+        session.flush()
+        scrape_id = scrape.id
+
+    start = time.perf_counter()
+    asyncio.run(tasks.scrape_instagram_account(scrape_id, username, "both"))
+    seconds = time.perf_counter() - start
+
+    with session_scope() as session:
+        scrape = session.get(Scrape, scrape_id)
+        status, followers, following = scrape.status.value, scrape.followers_count, scrape.following_count
+
+    # Pages are prefetched while the previous one is persisted, so only the
+    # pagination that persisting did not hide shows up as waiting
+    stages = {"waiting": seconds - sum(stages.values()), **stages}
+    return {
+        "seconds": seconds,
+        "status": status,
+        "followers": followers,
+        "following": following,
+        "stages": stages,
+        "peak_rss_mb": peak_rss_mb(),
+        "redis": type(conn).__name__,
+    }
+
+
+def add_rates(result: dict, page_size: int):
+    rows = result["followers"] + result["following"]
+    pages = -(-result["followers"] // page_size) + -(-result["following"] // page_size)
+    result["pages_per_s"] = pages / result["seconds"]
+    result["rows_per_s"] = rows / result["seconds"]
+
+
+def report(name: str, result: dict):
+    print(f"{name:<8} {result['seconds']:8.2f}s {result['pages_per_s']:10,.1f} pages/s "
+          f"{result['rows_per_s']:12,.0f} rows/s {result['peak_rss_mb']:10.1f} MiB peak RSS")
+    for stage, seconds in result.get("stages", {}).items():
+        print(f"  {stage:<24} {seconds:8.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--username", default="bench_target")
+    parser.add_argument("--followers", type=int, default=20000)
+    parser.add_argument("--following", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--throttle-rate", type=float, default=0.02)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--check", action="store_true", help="fail unless every row was scraped")
+    args = parser.parse_args()
+
+    config = FakeConfig(
+        followers=args.followers, following=args.following, page_size=args.page_size,
+        latency=args.latency_ms / 1000, error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+    )
+    process, base_url = start_server(config)
+    workdir = tempfile.TemporaryDirectory(prefix="igcrawl-bench-")
+
+    # Settings are read on import, so the environment is set up first
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{workdir.name}/bench.db",
+        "INSTAGRAM_BASE_URL": base_url,
+        "USE_INSTAGRAM_CACHE": "false",
+        "USE_PROXY": "false",
+    })
+    try:
+        # The app prints per page; keep the benchmark output readable
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                results = {"scraper": run_scraper(args.username), "task": run_task(args.username)}
+            finally:
+                sys.stdout = stdout
+    finally:
+        process.terminate()
+        workdir.cleanup()
+
+    expected = {"followers": len(relation_ids(config, "follower")),
+                "following": len(relation_ids(config, "following"))}
+    for result in results.values():
+        add_rates(result, args.page_size)
+    if args.json:
+        print(json.dumps({"config": vars(args), "expected": expected, **results}, indent=2))
+    else:
+        print(f"fake server: {args.followers:,} followers, {args.following:,} following, pages of "
+              f"{args.page_size}, {args.latency_ms}ms latency, {args.error_rate:.0%} 500s, "
+              f"{args.throttle_rate:.0%} 429s\n")
+        for name, result in results.items():
+            report(name, result)
+        print(f"\ntask status: {results['task']['status']} (redis: {results['task']['redis']})")
+
+    if args.check:
+        missing = [
+            f"{name} {relation}: {result[relation]} of {count}"
+            for name, result in results.items()
+            for relation, count in expected.items()
+            if result[relation] != count
+        ]
+        if missing:
+            sys.exit("Incomplete scrape: " + ", ".join(missing))
+
+
+if __name__ == "__main__":
+    main()
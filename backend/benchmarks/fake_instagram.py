@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the Instagram endpoints the scraper talks to.
+
+  GET /<username>/       profile page: the profilePage_<id> marker and the profile JSON
+  GET /graphql/query/    follower/following pages by query_hash; the cursor is the offset
+
+Every username exists. Each account has --followers followers and --following
+followed users; half of the followed users (at most) follow back, so scrapes
+exercise mutual marking. Responses can be slowed down (--latency-ms) and
+replaced by injected 500s (--error-rate) or 429s (--throttle-rate), both sent
+with a Retry-After of --retry-after seconds.
+
+Run it standalone and point the app at it with INSTAGRAM_BASE_URL, or start it
+from a benchmark with start_server() (see bench_scraper.py).
+
+Usage: python benchmarks/fake_instagram.py [--port 8765] [--followers 10000] [--following 1000]
+       [--page-size 50] [--latency-ms 20] [--error-rate 0] [--throttle-rate 0]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import time
+import zlib
+from dataclasses import dataclass, asdict
+from typing import Optional, Tuple
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, Response
+from starlette.routing import Route
+
+FOLLOWERS_HASH = "5aefa9893005572d237da5068082d8d5"
+FOLLOWING_HASH = "6df9f20c4ad9b22fb7b35b816f0c426e"
+
+
+@dataclass
+class FakeConfig:
+    followers: int = 10000
+    following: int = 1000
+    page_size: Optional[int] = None  # None: honor the client's "first"
+    latency: float = 0.0  # seconds per response
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: int = 0
+    seed: int = 42
+
+
+def user_id(username: str) -> int:
+    return 10 ** 9 + zlib.crc32(username.encode())
+
+
+def relation_ids(config: FakeConfig, relation: str) -> range:
+    """Follower ids are 1..followers; followed ids start halfway through them"""
+    if relation == "follower":
+        return range(1, config.followers + 1)
+    start = config.followers // 2 + 1
+    return range(start, start + config.following)
+
+
+def node(i: int) -> dict:
+    return {
+        "id": str(i),
+        "username": f"user_{i}",
+        "full_name": f"User {i}",
+        "profile_pic_url": f"https://cdn.example/{i}.jpg",
+        "is_verified": i % 97 == 0,
+        "is_private": i % 3 == 0,
+        "followed_by_viewer": False,
+        "requested_by_viewer": False,
+    }
+
+
+def create_app(config: FakeConfig) -> Starlette:
+    rng = random.Random(config.seed)
+
+    async def injected() -> Optional[Response]:
+        if config.latency:
+            await asyncio.sleep(config.latency)
+        roll = rng.random()
+        headers = {"Retry-After": str(config.retry_after)}
+        if roll < config.throttle_rate:
+            return JSONResponse({"message": "Please wait a few minutes", "status": "fail"}, 429, headers)
+        if roll < config.throttle_rate + config.error_rate:
+            return JSONResponse({"message": "Server error", "status": "fail"}, 500, headers)
+        return None
+
+    async def profile(request: Request) -> Response:
+        failure = await injected()
+        if failure:
+            return failure
+        username = request.path_params["username"]
+        user = {
+            "id": str(user_id(username)),
+            "username": username,
+            "edge_followed_by": {"count": config.followers},
+            "edge_follow": {"count": config.following},
+            "full_name": f"Fake {username}",
+            "is_private": False,
+            "is_verified": True,
+            "profile_pic_url": f"https://cdn.example/{username}.jpg",
+        }
+        data = {"entry_data": {"ProfilePage": [{"logging_page_id": f"profilePage_{user['id']}",
+                                                "graphql": {"user": user}}]}}
+        return HTMLResponse(f"<html><script>window._sharedData = {json.dumps(data, separators=(',', ':'))};</script></html>")
+
+    async def graphql(request: Request) -> Response:
+        failure = await injected()
+        if failure:
+            return failure
+        query_hash = request.query_params.get("query_hash")
+        if query_hash not in (FOLLOWERS_HASH, FOLLOWING_HASH):
+            return JSONResponse({"message": "unknown query", "status": "fail"}, 400)
+
+        variables = json.loads(request.query_params["variables"])
+        relation, edge_key = (
+            ("follower", "edge_followed_by") if query_hash == FOLLOWERS_HASH else ("following", "edge_follow")
+        )
+        ids = relation_ids(config, relation)
+        offset = int(variables.get("after") or 0)
+        end = min(offset + (config.page_size or int(variables.get("first") or 50)), len(ids))
+        edge = {
+            "count": len(ids),
+            "page_info": {"has_next_page": end < len(ids), "end_cursor": str(end) if end < len(ids) else None},
+            "edges": [{"node": node(i)} for i in ids[offset:end]],
+        }
+        return JSONResponse({"data": {"user": {edge_key: edge}}, "status": "ok"})
+
+    return Starlette(routes=[
+        Route("/graphql/query/", graphql),
+        Route("/{username}/", profile),
+    ])
+
+
+def serve(config: FakeConfig, host: str = "127.0.0.1", port: int = 8765):
+    uvicorn.run(create_app(config), host=host, port=port, log_level="warning")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(config: FakeConfig, timeout: float = 10.0) -> Tuple[multiprocessing.Process, str]:
+    """Serve in a child process (kept out of the benchmark's CPU and RSS); returns (process, base URL)"""
+    port = _free_port()
+    process = multiprocessing.Process(target=serve, args=(config, "127.0.0.1", port), daemon=True)
+    process.start()
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError("Fake Instagram server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--followers", type=int, default=10000)
+    parser.add_argument("--following", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=None)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=0)
+    args = parser.parse_args()
+
+    config = FakeConfig(
+        followers=args.followers, following=args.following, page_size=args.page_size,
+        latency=args.latency_ms / 1000, error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate, retry_after=args.retry_after,
+    )
+    print(f"Serving fake Instagram on http://{args.host}:{args.port} with {asdict(config)}")
+    serve(config, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
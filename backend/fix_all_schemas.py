@@ -31,7 +31,15 @@ def fix_all_schemas():
         columns_to_add = [
             ('followers_scraped', 'INTEGER DEFAULT NULL'),
             ('following_scraped', 'INTEGER DEFAULT NULL'),
-            ('is_partial', 'INTEGER DEFAULT 0')  # SQLite uses INTEGER for boolean
+            ('is_partial', 'INTEGER DEFAULT 0'),  # SQLite uses INTEGER for boolean
+            ('archived_at', 'DATETIME DEFAULT NULL'),
+            ('compacted_at', 'DATETIME DEFAULT NULL'),
+            ('new_following', 'INTEGER DEFAULT NULL'),
+            ('lost_following', 'INTEGER DEFAULT NULL'),
+            ('followers_cursor', 'VARCHAR DEFAULT NULL'),
+            ('following_cursor', 'VARCHAR DEFAULT NULL'),
+            ('followers_complete', 'INTEGER DEFAULT 0'),
+            ('following_complete', 'INTEGER DEFAULT 0')
         ]
         
         for column_name, column_def in columns_to_add:
@@ -44,6 +52,24 @@ def fix_all_schemas():
                 conn.commit()
                 print(f"scrapes table: {column_name} column added successfully!")
         
+        # Indexes for the hot followers queries (see models/follower.py)
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='followers'")
+        if cursor.fetchone():
+            cursor.execute("PRAGMA table_info(followers)")
+            if 'is_new' not in [column[1] for column in cursor.fetchall()]:
+                print("Adding is_new column to followers table...")
+                cursor.execute("ALTER TABLE followers ADD COLUMN is_new INTEGER DEFAULT 0")
+            
+            indexes = [
+                ('ix_followers_scrape_relation', 'followers (scrape_id, relation_type, follower_id)'),
+                ('ix_followers_mutual', 'followers (target_id, scrape_id, follower_id) WHERE is_mutual = 1'),
+            ]
+            for index_name, index_def in indexes:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {index_def}")
+            cursor.execute("ANALYZE followers")
+            conn.commit()
+            print("followers table: indexes created")
+        
         conn.close()
         return True
         
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Migration to split follower profiles out of the followers table.
+Profiles move into a deduplicated instagram_users table and followers becomes
+a slim per-scrape membership table whose primary key includes relation_type.
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+def migrate(db_path: Path):
+    if not db_path.exists():
+        print(f"Database not found at {db_path}")
+        return
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("PRAGMA table_info(followers)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if "username" not in columns:
+            print("followers table is already normalized, no action needed.")
+            return
+
+        conn.execute("BEGIN")
+
+        # 1. Deduplicated profile table, filled from the most recent scrape of each user
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS instagram_users (
+                id INTEGER PRIMARY KEY,
+                username TEXT NOT NULL,
+                full_name TEXT,
+                profile_pic_url TEXT,
+                is_verified BOOLEAN DEFAULT 0,
+                is_private BOOLEAN DEFAULT 0,
+                first_seen TIMESTAMP NOT NULL,
+                updated_at TIMESTAMP NOT NULL
+            )
+        """)
+        cursor.execute("""
+            INSERT OR REPLACE INTO instagram_users
+                (id, username, full_name, profile_pic_url, is_verified, is_private, first_seen, updated_at)
+            SELECT f.follower_id, f.username, f.full_name, f.profile_pic_url,
+                   f.is_verified, f.is_private, seen.first_seen, f.last_seen
+            FROM followers f
+            JOIN (
+                SELECT follower_id, MAX(scrape_id) AS scrape_id, MIN(first_seen) AS first_seen
+                FROM followers
+                GROUP BY follower_id
+            ) seen ON seen.follower_id = f.follower_id AND seen.scrape_id = f.scrape_id
+        """)
+
+        # 2. Slim membership table with relation_type in the primary key
+        cursor.execute("""
+            CREATE TABLE followers_new (
+                target_id INTEGER NOT NULL,
+                follower_id INTEGER NOT NULL,
+                scrape_id INTEGER NOT NULL,
+                relation_type TEXT NOT NULL,
+                first_seen TIMESTAMP NOT NULL,
+                last_seen TIMESTAMP NOT NULL,
+                is_mutual BOOLEAN DEFAULT 0,
+                PRIMARY KEY (target_id, follower_id, scrape_id, relation_type),
+                FOREIGN KEY (follower_id) REFERENCES instagram_users(id),
+                FOREIGN KEY (scrape_id) REFERENCES scrapes(id)
+            )
+        """)
+        cursor.execute("""
+            INSERT OR IGNORE INTO followers_new
+                (target_id, follower_id, scrape_id, relation_type, first_seen, last_seen, is_mutual)
+            SELECT target_id, follower_id, scrape_id, relation_type, first_seen, last_seen, is_mutual
+            FROM followers
+        """)
+
+        # 3. Swap tables and recreate indexes
+        cursor.execute("DROP TABLE followers")
+        cursor.execute("ALTER TABLE followers_new RENAME TO followers")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_instagram_users_username ON instagram_users(username)")
+
+        conn.commit()
+        print("Migration completed successfully!")
+
+    except Exception as e:
+        conn.rollback()
+        print(f"Migration failed: {e}")
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent / "instagram_intel.db"
+    migrate(path)
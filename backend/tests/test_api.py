@@ -1,7 +1,7 @@
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
-from app.database import get_session
+from app.database import get_session, get_read_session
 from sqlmodel import Session, create_engine, SQLModel
 from sqlmodel.pool import StaticPool
 
@@ -26,6 +26,7 @@ def client_fixture(session: Session):
         return session
 
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
@@ -72,4 +73,72 @@ def test_rate_limit_headers(client: TestClient):
     # This would require mocking the rate limiter
     # For now, just test that the endpoint works
     response = client.get("/api/v1/accounts")
-    assert response.status_code == 200
\ No newline at end of file
+    assert response.status_code == 200
+
+def test_avatars_are_fetched_once_and_served_with_etag(client: TestClient, session: Session, monkeypatch, tmp_path):
+    """Each avatar URL path is downloaded once, equal pictures share a file, and the endpoint revalidates"""
+    import io
+    from contextlib import contextmanager
+
+    import httpx
+    from PIL import Image
+
+    from app.models import Account, InstagramUser, Scrape, ScrapeStatus, ScrapeType
+    from app.utils.id_sets import to_id_array
+    from app.workers import avatars
+    from app.workers.delta_calculator import store_scrape_id_sets
+
+    def png(color):
+        out = io.BytesIO()
+        Image.new("RGB", (320, 240), color).save(out, "PNG")
+        return out.getvalue()
+
+    pictures = {"/v/target.jpg": png("red"), "/v/shared.jpg": png("blue"), "/v/copy.jpg": png("blue")}
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.path)
+        return httpx.Response(200, content=pictures[request.url.path])
+
+    @contextmanager
+    def session_scope():
+        with Session(session.get_bind()) as scoped:
+            yield scoped
+            scoped.commit()
+
+    monkeypatch.setattr(avatars, "session_scope", session_scope)
+    monkeypatch.setattr(avatars, "get_async_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(avatars.settings, "avatar_dir", str(tmp_path))
+
+    account = Account(username="target", profile_pic_url="https://cdn-a.example/v/target.jpg?oe=1")
+    session.add(account)
+    session.add_all([
+        InstagramUser(id=1, username="one", profile_pic_url="https://cdn-a.example/v/shared.jpg?oe=1"),
+        InstagramUser(id=2, username="two", profile_pic_url="https://cdn-b.example/v/shared.jpg?oe=2"),
+        InstagramUser(id=3, username="three", profile_pic_url="https://cdn-a.example/v/copy.jpg?oe=3"),
+        InstagramUser(id=4, username="four", profile_pic_url="https://cdn-a.example/v/later.jpg?oe=4"),
+    ])
+    session.flush()
+    scrape = Scrape(account_id=account.id, scrape_type=ScrapeType.FOLLOWERS, status=ScrapeStatus.COMPLETED)
+    session.add(scrape)
+    session.flush()
+    store_scrape_id_sets(session, scrape.id, {"follower": to_id_array([1, 2, 3])})
+    session.commit()
+
+    assert avatars.cache_scrape_avatars(scrape.id) == 3
+    assert avatars.cache_scrape_avatars(scrape.id) == 0
+    assert sorted(requested) == ["/v/copy.jpg", "/v/shared.jpg", "/v/target.jpg"]
+    assert len(list(tmp_path.glob("*/*.jpg"))) == 2
+
+    response = client.get("/api/v1/avatars/two")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    assert Image.open(io.BytesIO(response.content)).size == (avatars.settings.avatar_size,) * 2
+    etag = response.headers["etag"]
+    assert client.get("/api/v1/avatars/one").headers["etag"] == etag
+    assert client.get("/api/v1/avatars/target").headers["etag"] != etag
+
+    assert client.get("/api/v1/avatars/two", headers={"If-None-Match": etag}).status_code == 304
+    not_cached = client.get("/api/v1/avatars/four", follow_redirects=False)
+    assert (not_cached.status_code, not_cached.headers["location"]) == (307, "https://cdn-a.example/v/later.jpg?oe=4")
+    assert client.get("/api/v1/avatars/nobody").status_code == 404
@@ -0,0 +1,142 @@
+import pytest
+import numpy as np
+from sqlmodel import Session, create_engine, SQLModel, select
+from sqlmodel.pool import StaticPool
+from datetime import datetime
+
+from app.models import Account, Scrape, Follower, ScrapeStatus, ScrapeType
+from app.utils.id_sets import to_id_array, encode_id_set, decode_id_set
+from app.workers.delta_calculator import (
+    store_scrape_id_sets,
+    calculate_follower_delta,
+    calculate_mutual_ids,
+    update_scrape_delta,
+)
+from app.workers.ingest import insert_memberships
+
+
+@pytest.fixture(name="session")
+def session_fixture():
+    """Create a test database session"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def add_scrape(session: Session, account_id: int, follower_ids, following_ids=None, day: int = 1) -> Scrape:
+    """Add a completed scrape with stored id sets"""
+    scrape = Scrape(
+        account_id=account_id,
+        scrape_type=ScrapeType.BOTH,
+        status=ScrapeStatus.COMPLETED,
+        completed_at=datetime(2024, 1, day)
+    )
+    session.add(scrape)
+    session.flush()
+    store_scrape_id_sets(session, scrape.id, {
+        "follower": to_id_array(follower_ids),
+        "following": to_id_array(following_ids or []),
+    })
+    session.commit()
+    return scrape
+
+
+def test_id_set_roundtrip():
+    """Encoding keeps ids sorted, unique and exact, including 64-bit ids"""
+    ids = to_id_array([5, 3, 3, 2**62, 17])
+    assert decode_id_set(encode_id_set(ids)).tolist() == [3, 5, 17, 2**62]
+    assert decode_id_set(encode_id_set(to_id_array([]))).tolist() == []
+
+
+def test_delta_from_id_sets(session: Session):
+    """New and lost followers come from the stored sets of consecutive scrapes"""
+    account = Account(username="target")
+    session.add(account)
+    session.commit()
+
+    first = add_scrape(session, account.id, [1, 2, 3], day=1)
+    second = add_scrape(session, account.id, [2, 3, 4, 5], day=2)
+
+    new_ids, lost_ids = calculate_follower_delta(session, account.id, first.id)
+    assert new_ids.tolist() == [1, 2, 3]
+    assert lost_ids.tolist() == []
+
+    new_ids, lost_ids = calculate_follower_delta(session, account.id, second.id)
+    assert new_ids.tolist() == [4, 5]
+    assert lost_ids.tolist() == [1]
+
+    update_scrape_delta(session, second.id)
+    assert (second.new_followers, second.lost_followers) == (2, 1)
+
+
+def test_mutual_ids():
+    """Mutuals are the intersection of both sets"""
+    mutuals = calculate_mutual_ids(to_id_array([1, 2, 3]), to_id_array([3, 4, 1]))
+    assert mutuals.tolist() == [1, 3]
+    assert isinstance(mutuals, np.ndarray)
+
+
+def test_sql_delta_covers_both_relations(session: Session):
+    """Snapshot rows are diffed in SQL for both relations and new rows are flagged"""
+    account = Account(username="target")
+    session.add(account)
+    session.commit()
+
+    def add_snapshot(followers, following, day):
+        scrape = Scrape(
+            account_id=account.id,
+            scrape_type=ScrapeType.BOTH,
+            status=ScrapeStatus.COMPLETED,
+            completed_at=datetime(2024, 1, day)
+        )
+        session.add(scrape)
+        session.commit()
+        insert_memberships(session, account.id, scrape.id, "follower", followers)
+        insert_memberships(session, account.id, scrape.id, "following", following)
+        update_scrape_delta(session, scrape.id)
+        return scrape
+
+    first = add_snapshot([1, 2, 3], [10, 11], day=1)
+    assert (first.new_followers, first.lost_followers) == (3, 0)
+    assert (first.new_following, first.lost_following) == (2, 0)
+
+    second = add_snapshot([2, 3, 4, 5], [11, 12, 13], day=2)
+    assert (second.new_followers, second.lost_followers) == (2, 1)
+    assert (second.new_following, second.lost_following) == (2, 1)
+
+    new_rows = session.exec(
+        select(Follower.relation_type, Follower.follower_id)
+        .where(Follower.scrape_id == second.id, Follower.is_new.is_(True))
+    ).all()
+    assert sorted(new_rows) == [("follower", 4), ("follower", 5), ("following", 12), ("following", 13)]
+
+
+def test_overlap_sketch_matches_exact(session: Session):
+    """Sketch estimates track the exact overlap of the stored id sets"""
+    from app.workers.overlap import store_scrape_sketches, sketch_overlap, exact_overlap
+
+    accounts = [Account(username=f"target{i}") for i in range(3)]
+    session.add_all(accounts)
+    session.commit()
+
+    audiences = [range(0, 20000), range(10000, 30000), range(50000, 60000)]
+    for account, ids in zip(accounts, audiences):
+        scrape = add_scrape(session, account.id, ids)
+        store_scrape_sketches(session, scrape.id, {"follower": to_id_array(ids)})
+        session.commit()
+
+    account_ids = [account.id for account in accounts]
+    exact = exact_overlap(session, account_ids)
+    estimate = sketch_overlap(session, account_ids)
+
+    assert [p["overlap"] for p in exact["pairs"]] == [10000, 0, 0]
+    assert exact["union"] == 40000
+    for exact_pair, estimated_pair in zip(exact["pairs"], estimate["pairs"]):
+        assert estimated_pair["account_ids"] == exact_pair["account_ids"]
+        assert abs(estimated_pair["jaccard"] - exact_pair["jaccard"]) < 0.1
+    assert abs(estimate["union"] - 40000) < 40000 * 0.05
@@ -0,0 +1,591 @@
+import pytest
+from fastapi.testclient import TestClient
+import app.main as main_module
+from app.main import app
+from app.database import get_session, get_read_session
+from app.models import Account, Scrape, Follower, InstagramUser, ScrapeStatus, ScrapeType
+from app.workers.ingest import upsert_instagram_users
+from sqlmodel import Session, create_engine, SQLModel, select
+from sqlalchemy import text
+from sqlmodel.pool import StaticPool
+from datetime import datetime
+
+
+@pytest.fixture(name="session")
+def session_fixture():
+    """Create a test database session"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture(name="client")
+def client_fixture(session: Session, monkeypatch):
+    """Create a test client with overridden dependencies"""
+    def get_session_override():
+        return session
+
+    # Export endpoints are rate limited; keep the test independent of Redis
+    monkeypatch.setattr(main_module.rate_limiter, "reserve", lambda identifier: (True, None))
+
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    client = TestClient(app)
+    yield client
+    app.dependency_overrides.clear()
+
+
+def make_user(user_id: int, username: str, **kwargs) -> dict:
+    return {"id": str(user_id), "username": username, **kwargs}
+
+
+def test_upsert_only_writes_changed_profiles(session: Session):
+    """Unchanged profiles are not rewritten on later scrapes"""
+    written = upsert_instagram_users(session, [make_user(1, "alice"), make_user(2, "bob")])
+    session.commit()
+    assert written == 2
+
+    written = upsert_instagram_users(session, [make_user(1, "alice"), make_user(2, "bobby")])
+    session.commit()
+    assert written == 1
+    assert session.get(InstagramUser, 2).username == "bobby"
+    assert len(session.exec(select(InstagramUser)).all()) == 2
+
+
+def test_mutual_stored_as_follower_and_following(session: Session):
+    """relation_type is part of the key, so a mutual gets two membership rows"""
+    account = Account(username="target")
+    session.add(account)
+    session.flush()
+    scrape = Scrape(account_id=account.id, scrape_type=ScrapeType.BOTH, status=ScrapeStatus.COMPLETED)
+    session.add(scrape)
+    session.flush()
+
+    upsert_instagram_users(session, [make_user(7, "mutual")])
+    session.add(Follower(target_id=account.id, follower_id=7, scrape_id=scrape.id,
+                         relation_type="follower", is_mutual=True))
+    session.add(Follower(target_id=account.id, follower_id=7, scrape_id=scrape.id,
+                         relation_type="following"))
+    session.commit()
+
+    assert len(session.exec(select(Follower).where(Follower.follower_id == 7)).all()) == 2
+
+
+def test_export_joins_profiles(client: TestClient, session: Session):
+    """Export keeps returning profile columns from the joined table"""
+    account = Account(username="target")
+    session.add(account)
+    session.flush()
+    scrape = Scrape(account_id=account.id, scrape_type=ScrapeType.FOLLOWERS,
+                    status=ScrapeStatus.COMPLETED, completed_at=datetime.utcnow())
+    session.add(scrape)
+    session.flush()
+
+    upsert_instagram_users(session, [make_user(9, "fan", full_name="A Fan", is_verified=True)])
+    session.add(Follower(target_id=account.id, follower_id=9, scrape_id=scrape.id,
+                         relation_type="follower"))
+    session.commit()
+
+    response = client.get(f"/api/v1/export/{account.id}/followers", params={"format": "json"})
+    assert response.status_code == 200
+    rows = response.json()["data"]
+    assert rows == [{
+        "username": "fan",
+        "full_name": "A Fan",
+        "is_verified": True,
+        "is_private": False,
+        "relation_type": "follower",
+        "is_mutual": False,
+        "first_seen": rows[0]["first_seen"],
+        "last_seen": rows[0]["last_seen"],
+    }]
+
+
+def test_incremental_scrape_is_exported_from_id_sets(client: TestClient, session: Session, tmp_path, monkeypatch):
+    """Snapshot storage rebuilds the whole follower list of an incremental scrape, not just its head"""
+    from app.workers import archiver
+    from app.workers.delta_calculator import store_scrape_id_sets
+    from app.utils.id_sets import to_id_array
+
+    monkeypatch.setattr(archiver.settings, "archive_dir", str(tmp_path))
+
+    account = Account(username="target")
+    session.add(account)
+    session.flush()
+    upsert_instagram_users(session, [make_user(i, f"user{i}") for i in range(1, 4)])
+    full = Scrape(account_id=account.id, scrape_type=ScrapeType.BOTH,
+                  status=ScrapeStatus.COMPLETED, completed_at=datetime(2024, 1, 1))
+    session.add(full)
+    session.flush()
+    store_scrape_id_sets(session, full.id, {"follower": to_id_array([1, 2]), "following": to_id_array([2])})
+    incremental = Scrape(account_id=account.id, scrape_type=ScrapeType.INCREMENTAL,
+                         status=ScrapeStatus.COMPLETED, completed_at=datetime(2024, 1, 2))
+    session.add(incremental)
+    session.flush()
+    # Only the new head has membership rows; the id set holds everyone known
+    session.add(Follower(target_id=account.id, follower_id=3, scrape_id=incremental.id, relation_type="follower"))
+    store_scrape_id_sets(session, incremental.id, {"follower": to_id_array([1, 2, 3])})
+    session.commit()
+
+    def exported():
+        response = client.get(f"/api/v1/export/{account.id}/followers",
+                              params={"format": "json", "scrape_id": incremental.id})
+        assert response.status_code == 200
+        rows = sorted(response.json()["data"], key=lambda row: row["username"])
+        assert [(row["username"], row["is_mutual"]) for row in rows] == [
+            ("user1", False), ("user2", True), ("user3", False)
+        ]
+        return rows
+
+    rows = exported()
+    assert rows[0]["first_seen"] is None and rows[2]["first_seen"] is not None
+
+    # The archive holds only the head as well
+    assert archiver.archive_scrape(session, incremental) == 1
+    exported()
+
+
+def test_intervals_record_churn_and_answer_as_of(session: Session):
+    """Only churn is written and any past follower set can be rebuilt"""
+    from app.workers.intervals import apply_scrape_intervals, followers_as_of
+    from app.workers.delta_calculator import calculate_follower_delta_from_intervals
+    from app.models import FollowerInterval
+
+    account = Account(username="target")
+    session.add(account)
+    session.flush()
+    upsert_instagram_users(session, [make_user(i, f"user{i}") for i in range(1, 5)])
+
+    scrape_ids = []
+    snapshots = [{1, 2, 3}, {2, 3, 4}, {2, 3, 4}]
+    for day, ids in enumerate(snapshots, start=1):
+        scrape = Scrape(account_id=account.id, scrape_type=ScrapeType.FOLLOWERS, status=ScrapeStatus.COMPLETED)
+        session.add(scrape)
+        session.flush()
+        apply_scrape_intervals(session, account.id, scrape.id, "follower", ids, datetime(2024, 1, day))
+        scrape_ids.append(scrape.id)
+    session.commit()
+
+    # Four distinct edges, one of which was closed
+    intervals = session.exec(select(FollowerInterval)).all()
+    assert len(intervals) == 4
+    assert session.exec(select(FollowerInterval).where(FollowerInterval.follower_id == 1)).one().end_scrape_id == scrape_ids[1]
+
+    assert followers_as_of(session, account.id, scrape_id=scrape_ids[0]) == {1, 2, 3}
+    assert followers_as_of(session, account.id, at=datetime(2024, 1, 2, 12)) == {2, 3, 4}
+    assert followers_as_of(session, account.id) == {2, 3, 4}
+
+    assert calculate_follower_delta_from_intervals(session, account.id, scrape_ids[1]) == ({4}, {1})
+    assert calculate_follower_delta_from_intervals(session, account.id, scrape_ids[2]) == (set(), set())
+
+
+def test_deleted_account_leaves_no_intervals(client: TestClient, session: Session):
+    """A re-created account reusing the row id starts without the old account's edges"""
+    from app.workers.intervals import apply_scrape_intervals, followers_as_of
+    from app.workers.delta_calculator import store_scrape_id_sets
+    from app.workers.overlap import store_scrape_sketches
+    from app.utils.id_sets import to_id_array
+    from app.models import FollowerInterval, ScrapeIdSet, ScrapeSketch
+
+    account = Account(username="target")
+    session.add(account)
+    session.flush()
+    upsert_instagram_users(session, [make_user(1, "alice"), make_user(2, "bob")])
+    scrape = Scrape(account_id=account.id, scrape_type=ScrapeType.FOLLOWERS, status=ScrapeStatus.COMPLETED)
+    session.add(scrape)
+    session.flush()
+    apply_scrape_intervals(session, account.id, scrape.id, "follower", [1, 2], datetime(2024, 1, 1))
+    store_scrape_id_sets(session, scrape.id, {"follower": to_id_array([1, 2])})
+    store_scrape_sketches(session, scrape.id, {"follower": to_id_array([1, 2])})
+    session.commit()
+    account_id = account.id
+
+    assert client.delete(f"/api/v1/accounts/{account_id}").status_code == 204
+    for model in (FollowerInterval, ScrapeIdSet, ScrapeSketch):
+        assert session.exec(select(model)).all() == []
+
+    response = client.post("/api/v1/accounts", json={"username": "target"})
+    assert response.json()["id"] == account_id
+    assert followers_as_of(session, account_id) == set()
+
+
+def test_deleted_scrape_is_taken_out_of_derived_data(client: TestClient, session: Session):
+    """Deleting a middle scrape drops its rows, hands its intervals on and recomputes the next delta"""
+    from app.workers.intervals import apply_scrape_intervals, followers_as_of
+    from app.workers.delta_calculator import store_scrape_id_sets, update_scrape_delta
+    from app.workers.overlap import store_scrape_sketches
+    from app.utils.id_sets import to_id_array
+    from app.models import FollowerEvent, FollowerInterval, ScrapeIdSet, ScrapeSketch
+
+    account = Account(username="target")
+    session.add(account)
+    session.flush()
+    upsert_instagram_users(session, [make_user(i, f"user{i}") for i in range(1, 6)])
+
+    scrape_ids = []
+    for day, ids in enumerate([[1, 2, 3], [2, 3, 4], [2, 3, 4, 5]], start=1):
+        scrape = Scrape(account_id=account.id, scrape_type=ScrapeType.FOLLOWERS,
+                        status=ScrapeStatus.COMPLETED, completed_at=datetime(2024, 1, day))
+        session.add(scrape)
+        session.flush()
+        id_sets = {"follower": to_id_array(ids)}
+        store_scrape_id_sets(session, scrape.id, id_sets)
+        store_scrape_sketches(session, scrape.id, id_sets)
+        apply_scrape_intervals(session, account.id, scrape.id, "follower", ids, scrape.completed_at)
+        update_scrape_delta(session, scrape.id)
+        scrape_ids.append(scrape.id)
+    first, middle, last = scrape_ids
+
+    assert client.delete(f"/api/v1/scrapes/{middle}").status_code == 200
+    assert session.get(Scrape, middle) is None
+    for model in (ScrapeIdSet, ScrapeSketch, FollowerEvent):
+        assert session.exec(select(model).where(model.scrape_id == middle)).all() == []
+
+    # No interval points at the deleted scrape; the remaining history is unchanged
+    for column in ("first_scrape_id", "last_scrape_id", "end_scrape_id"):
+        assert session.exec(select(FollowerInterval).where(getattr(FollowerInterval, column) == middle)).all() == []
+    assert followers_as_of(session, account.id, scrape_id=first) == {1, 2, 3}
+    assert followers_as_of(session, account.id, scrape_id=last) == {2, 3, 4, 5}
+    unfollow = session.exec(select(FollowerInterval).where(FollowerInterval.follower_id == 1)).one()
+    assert (unfollow.end_scrape_id, unfollow.ended_at) == (last, datetime(2024, 1, 3))
+
+    # The last scrape is now compared against the first one
+    session.expire_all()
+    assert (session.get(Scrape, last).new_followers, session.get(Scrape, last).lost_followers) == (2, 1)
+    events = session.exec(select(FollowerEvent).where(FollowerEvent.scrape_id == last)).all()
+    assert sorted((e.event_type, e.follower_id) for e in events) == [("follow", 4), ("follow", 5), ("unfollow", 1)]
+
+
+def test_archived_scrape_is_exported_from_parquet(client: TestClient, session: Session, tmp_path, monkeypatch):
+    """Archiving moves rows out of SQLite and export reads them back from Parquet"""
+    from app.workers import archiver
+
+    monkeypatch.setattr(archiver.settings, "archive_dir", str(tmp_path))
+
+    account = Account(username="target")
+    session.add(account)
+    session.flush()
+    scrape = Scrape(account_id=account.id, scrape_type=ScrapeType.BOTH,
+                    status=ScrapeStatus.COMPLETED, completed_at=datetime(2020, 1, 1))
+    session.add(scrape)
+    session.flush()
+
+    upsert_instagram_users(session, [make_user(1, "fan"), make_user(2, "friend")])
+    session.add(Follower(target_id=account.id, follower_id=1, scrape_id=scrape.id, relation_type="follower"))
+    session.add(Follower(target_id=account.id, follower_id=2, scrape_id=scrape.id,
+                         relation_type="follower", is_mutual=True))
+    session.add(Follower(target_id=account.id, follower_id=2, scrape_id=scrape.id, relation_type="following"))
+    session.commit()
+
+    assert archiver.archive_scrape(session, scrape) == 3
+    assert session.exec(select(Follower)).all() == []
+    assert scrape.archived_at is not None
+
+    response = client.get(f"/api/v1/export/{account.id}/followers",
+                          params={"format": "json", "scrape_id": scrape.id, "filter_type": "mutuals"})
+    assert response.status_code == 200
+    assert [row["username"] for row in response.json()["data"]] == ["friend"]
+
+    response = client.get(f"/api/v1/export/{account.id}/analytics")
+    assert response.json()["growth_metrics"]["mutual_growth"] == [{"date": "2020-01-01T00:00:00", "count": 1}]
+
+
+def test_membership_ingest_is_idempotent(session: Session):
+    """Re-running the ingest of a scrape (e.g. a retried job) doesn't duplicate or fail"""
+    from app.workers.ingest import insert_memberships
+
+    account = Account(username="target")
+    session.add(account)
+    session.flush()
+    scrape = Scrape(account_id=account.id, scrape_type=ScrapeType.FOLLOWERS)
+    session.add(scrape)
+    session.commit()
+    upsert_instagram_users(session, [make_user(i, f"user{i}") for i in range(250)])
+
+    for _ in range(2):
+        insert_memberships(session, account.id, scrape.id, "follower", range(250), mutual_ids=frozenset({3}))
+
+    rows = session.exec(select(Follower)).all()
+    assert len(rows) == 250
+    assert [row.follower_id for row in rows if row.is_mutual] == [3]
+
+
+def test_hot_queries_use_indexes(session: Session):
+    """Per-scrape and mutual lookups are served by the secondary indexes"""
+    def plan(sql: str) -> str:
+        return " ".join(row[-1] for row in session.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+    by_scrape = plan("SELECT follower_id FROM followers WHERE scrape_id = 1 AND relation_type = 'follower'")
+    assert "ix_followers_scrape_relation" in by_scrape
+
+    mutuals = plan("SELECT scrape_id, count(*) FROM followers WHERE target_id = 1 AND is_mutual = 1 GROUP BY scrape_id")
+    assert "ix_followers_mutual" in mutuals
+
+
+def test_compaction_thins_old_scrapes(session: Session, tmp_path):
+    """Old scrapes are thinned to the retention density and keep their counts"""
+    from datetime import timedelta
+    from app.workers.compactor import select_scrapes_to_thin, compact_scrape, reclaim_free_pages
+    from app.workers.ingest import insert_memberships
+    from app.database import create_writer_engine
+
+    account = Account(username="target")
+    session.add(account)
+    session.commit()
+    upsert_instagram_users(session, [make_user(i, f"user{i}") for i in range(1, 4)])
+
+    now = datetime(2024, 6, 30, 12)
+    ages = [
+        timedelta(hours=1), timedelta(days=2),                  # kept: recent
+        timedelta(days=10), timedelta(days=10, hours=3),        # same day
+        timedelta(days=60), timedelta(days=61),                 # same week
+        timedelta(days=300), timedelta(days=302),               # same month
+    ]
+    scrapes = []
+    for age in ages:
+        scrape = Scrape(
+            account_id=account.id, scrape_type=ScrapeType.BOTH, status=ScrapeStatus.COMPLETED,
+            completed_at=now - age, new_followers=1, lost_followers=0
+        )
+        session.add(scrape)
+        session.commit()
+        insert_memberships(session, account.id, scrape.id, "follower", [1, 2, 3])
+        scrapes.append(scrape)
+
+    thin = select_scrapes_to_thin(scrapes, now)
+    # The newest scrape of each day/week/month bucket survives
+    assert sorted(s.id for s in thin) == [scrapes[3].id, scrapes[5].id, scrapes[7].id]
+
+    assert compact_scrape(session, thin[0]) == 3
+    assert thin[0].compacted_at is not None
+    assert (thin[0].new_followers, thin[0].lost_followers) == (1, 0)
+    remaining = session.exec(select(Follower).where(Follower.scrape_id == thin[0].id)).all()
+    assert remaining == []
+
+    # A file DB gets the pages of deleted rows back
+    file_engine = create_writer_engine(f"sqlite:///{tmp_path}/compact.db")
+    SQLModel.metadata.create_all(file_engine)
+    # New DBs start with incremental auto_vacuum, so every run vacuums incrementally
+    for _ in range(2):
+        with Session(file_engine) as file_session:
+            users = [make_user(i, f"user{i}", full_name="x" * 200) for i in range(1, 2001)]
+            upsert_instagram_users(file_session, users)
+            file_session.commit()
+            file_session.execute(text("DELETE FROM instagram_users"))
+            file_session.commit()
+            pages_before = file_session.execute(text("PRAGMA page_count")).scalar()
+        assert reclaim_free_pages(file_engine)["freed_pages"] > 0
+        with file_engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+            assert conn.exec_driver_sql("PRAGMA freelist_count").scalar() == 0
+            assert conn.exec_driver_sql("PRAGMA page_count").scalar() < pages_before
+    file_engine.dispose()
+
+
+def test_compaction_keeps_a_scrape_per_relation_and_bucket():
+    """A newer followers-only scrape in a bucket doesn't thin the full scrape that holds following"""
+    from app.workers.compactor import select_scrapes_to_thin
+
+    now = datetime(2024, 6, 30, 12)
+    day = datetime(2024, 6, 20)
+
+    def scrape(scrape_id, scrape_type, completed_at):
+        return Scrape(id=scrape_id, account_id=1, scrape_type=scrape_type,
+                      status=ScrapeStatus.COMPLETED, completed_at=completed_at)
+
+    latest = scrape(1, ScrapeType.BOTH, now)
+    full = scrape(2, ScrapeType.BOTH, day.replace(hour=9))
+    followers_only = scrape(3, ScrapeType.FOLLOWERS, day.replace(hour=11))
+    incremental = scrape(4, ScrapeType.INCREMENTAL, day.replace(hour=15))
+
+    thin = select_scrapes_to_thin([latest, full, followers_only, incremental], now)
+    # The full scrape is the newest covering following in its day bucket, the
+    # incremental one the newest covering followers
+    assert [s.id for s in thin] == [followers_only.id]
+
+
+def test_compacted_scrapes_are_not_archived(session: Session, tmp_path, monkeypatch):
+    """The nightly archive run only picks up scrapes the compaction kept"""
+    from contextlib import contextmanager
+    from datetime import timedelta
+    from app.workers import archiver, compactor
+    from app.workers.ingest import insert_memberships
+
+    @contextmanager
+    def session_scope():
+        with Session(session.get_bind()) as scoped:
+            yield scoped
+            scoped.commit()
+
+    for module in (archiver, compactor):
+        monkeypatch.setattr(module, "session_scope", session_scope)
+    monkeypatch.setattr(compactor, "reclaim_free_pages", lambda: {"freed_pages": 0})
+    monkeypatch.setattr(archiver.settings, "archive_dir", str(tmp_path))
+
+    account = Account(username="target")
+    session.add(account)
+    session.commit()
+    upsert_instagram_users(session, [make_user(i, f"user{i}") for i in range(1, 4)])
+
+    now = datetime.utcnow()
+    old_day = (now - timedelta(days=10)).replace(hour=12)
+    scrapes = []
+    # The two old scrapes share a daily bucket, so the earlier one is thinned
+    for completed_at in (old_day - timedelta(hours=3), old_day, now - timedelta(hours=1)):
+        scrape = Scrape(account_id=account.id, scrape_type=ScrapeType.BOTH,
+                        status=ScrapeStatus.COMPLETED, completed_at=completed_at)
+        session.add(scrape)
+        session.commit()
+        insert_memberships(session, account.id, scrape.id, "follower", [1, 2, 3])
+        scrapes.append(scrape)
+
+    assert compactor.compact_old_scrapes(now)["compacted_scrapes"] == 1
+    assert archiver.archive_old_scrapes(older_than_days=1) == 1
+
+    for scrape in scrapes:
+        session.refresh(scrape)
+    thinned, kept, newest = scrapes
+    assert thinned.compacted_at is not None and thinned.archived_at is None
+    assert not archiver.scrape_archive_path(account.id, thinned.id).exists()
+    assert kept.archived_at is not None
+    assert archiver.scrape_archive_path(account.id, kept.id).exists()
+    assert newest.archived_at is None
+
+
+def test_follower_timeline_and_lost_followers(client: TestClient, session: Session):
+    """Completed deltas append events that answer history and lost-follower queries"""
+    from app.workers.delta_calculator import update_scrape_delta
+    from app.workers.ingest import insert_memberships
+
+    account = Account(username="target")
+    session.add(account)
+    session.commit()
+    upsert_instagram_users(session, [make_user(1, "alice"), make_user(2, "bob"), make_user(3, "carol")])
+
+    snapshots = [([1, 2], 1), ([2, 3], 10), ([1, 2, 3], 20)]
+    for follower_ids, day in snapshots:
+        scrape = Scrape(
+            account_id=account.id, scrape_type=ScrapeType.FOLLOWERS,
+            status=ScrapeStatus.COMPLETED, completed_at=datetime(2024, 1, day)
+        )
+        session.add(scrape)
+        session.commit()
+        insert_memberships(session, account.id, scrape.id, "follower", follower_ids)
+        update_scrape_delta(session, scrape.id)
+
+    response = client.get(f"/api/v1/accounts/{account.id}/followers/1/timeline")
+    assert response.status_code == 200
+    assert [(e["event_type"], e["occurred_at"][:10]) for e in response.json()] == [
+        ("follow", "2024-01-01"), ("unfollow", "2024-01-10"), ("follow", "2024-01-20")
+    ]
+
+    response = client.get(
+        f"/api/v1/accounts/{account.id}/lost-followers",
+        params={"start": "2024-01-05T00:00:00", "end": "2024-01-15T00:00:00"}
+    )
+    assert response.status_code == 200
+    assert [e["username"] for e in response.json()] == ["alice"]
+
+
+def test_scrape_diff_is_paginated_cached_and_streamed(client: TestClient, session: Session, monkeypatch):
+    """Any two scrapes diff to added/removed users and profile changes, once per pair"""
+    import app.api.export as export_module
+    from app.workers import snapshot_diff
+    from app.workers.delta_calculator import store_scrape_id_sets
+    from app.utils.id_sets import to_id_array
+
+    class FakeRedis(dict):
+        def get(self, key):
+            return super().get(key)
+
+        def setex(self, key, ttl, value):
+            self[key] = value
+
+    cache = FakeRedis()
+    monkeypatch.setattr(snapshot_diff, "redis_conn", cache)
+    monkeypatch.setattr(export_module, "read_engine", session.get_bind())
+
+    account = Account(username="target")
+    session.add(account)
+    session.commit()
+
+    snapshots = [
+        ([make_user(1, "alice"), make_user(2, "bob")], 1),
+        ([make_user(2, "bobby"), make_user(3, "carol")], 2),
+    ]
+    scrapes = []
+    for users, day in snapshots:
+        upsert_instagram_users(session, users)
+        scrape = Scrape(
+            account_id=account.id, scrape_type=ScrapeType.FOLLOWERS,
+            status=ScrapeStatus.COMPLETED, completed_at=datetime.utcnow()
+        )
+        session.add(scrape)
+        session.flush()
+        store_scrape_id_sets(session, scrape.id, {"follower": to_id_array(u["id"] for u in users)})
+        session.commit()
+        scrapes.append(scrape)
+
+    params = {"scrape_a": scrapes[0].id, "scrape_b": scrapes[1].id}
+    response = client.get(f"/api/v1/accounts/{account.id}/diff", params={**params, "change": "removed"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["summary"] == {"follower": {"added": 1, "removed": 1}, "profile_changes": 1}
+    assert [item["username"] for item in body["items"]] == ["alice"]
+    assert list(cache) == [f"snapshot_diff:{scrapes[0].id}:{scrapes[1].id}"]
+
+    response = client.get(f"/api/v1/accounts/{account.id}/diff", params={**params, "change": "profile"})
+    assert [(c["username"], c["old_value"], c["new_value"]) for c in response.json()["items"]] == [
+        ("bobby", "bob", "bobby")
+    ]
+
+    response = client.get(f"/api/v1/export/{account.id}/diff", params=params)
+    assert response.status_code == 200
+    lines = response.text.strip().splitlines()
+    assert lines[0].startswith("change,relation_type,user_id,username")
+    assert len(lines) == 4
+
+
+def test_diff_reads_archived_scrapes_and_only_involved_changes(session: Session, tmp_path, monkeypatch):
+    """A scrape archived without id sets diffs from its Parquet file; uninvolved users' changes stay out"""
+    from app.models import ProfileChange, ScrapeIdSet
+    from app.workers import archiver
+    from app.workers.snapshot_diff import compute_snapshot_diff
+    from app.workers.delta_calculator import store_scrape_id_sets
+    from app.utils.id_sets import to_id_array
+
+    monkeypatch.setattr(archiver.settings, "archive_dir", str(tmp_path))
+    monkeypatch.setattr(archiver.settings, "batch_size", 2)
+
+    account = Account(username="target")
+    session.add(account)
+    session.commit()
+    upsert_instagram_users(session, [make_user(i, f"user{i}") for i in range(1, 10)])
+
+    old = Scrape(account_id=account.id, scrape_type=ScrapeType.BOTH,
+                 status=ScrapeStatus.COMPLETED, completed_at=datetime(2020, 1, 1))
+    new = Scrape(account_id=account.id, scrape_type=ScrapeType.FOLLOWERS,
+                 status=ScrapeStatus.COMPLETED, completed_at=datetime(2020, 1, 3))
+    session.add_all([old, new])
+    session.commit()
+    for follower_id in (1, 2, 3):
+        session.add(Follower(target_id=account.id, follower_id=follower_id, scrape_id=old.id, relation_type="follower"))
+    session.add(Follower(target_id=account.id, follower_id=4, scrape_id=old.id, relation_type="following"))
+    session.commit()
+    archiver.archive_scrape(session, old)
+    assert session.exec(select(ScrapeIdSet).where(ScrapeIdSet.scrape_id == old.id)).all() == []
+    store_scrape_id_sets(session, new.id, {"follower": to_id_array([2, 3, 5])})
+
+    for user_id in (3, 9):
+        session.add(ProfileChange(user_id=user_id, field="full_name", new_value="x", changed_at=datetime(2020, 1, 2)))
+    session.add(ProfileChange(user_id=5, field="full_name", new_value="y", changed_at=datetime(2019, 12, 31)))
+    session.commit()
+
+    diff = compute_snapshot_diff(session, old, new)
+    assert diff["relations"] == {"follower": {"added": [5], "removed": [1]}}
+    assert [change["user_id"] for change in diff["profile_changes"]] == [3]
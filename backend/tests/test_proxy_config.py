@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import tempfile
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from app.utils import proxy_config
+
+
+def test_certificate_bundle_and_ssl_context_are_built_once(monkeypatch, tmp_path):
+    """One bundle file and one SSLContext per certificate content; stale bundles are removed"""
+    import certifi
+
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    for cache in ("_bundles", "_ssl_contexts", "_source_hashes"):
+        monkeypatch.setattr(proxy_config, cache, {})
+    cert = tmp_path / "ca.crt"
+    cert.write_text(open(certifi.where()).read())
+    monkeypatch.setattr(proxy_config, "_certificate_files", lambda: [str(cert)])
+    # Files of other processes in the temp dir are not ours to remove
+    (tmp_path / "tmpabc123.bundle.crt").write_text("someone else's bundle")
+    bundle_dir = tmp_path / proxy_config.BUNDLE_DIR
+
+    reads = []
+    read_certificates = proxy_config._read_certificates
+    monkeypatch.setattr(proxy_config, "_read_certificates", lambda files: reads.append(files) or read_certificates(files))
+
+    first = proxy_config.create_combined_certificate_bundle()
+    context = proxy_config.get_ssl_context()
+    assert proxy_config.create_combined_certificate_bundle() == first
+    assert proxy_config.get_ssl_context() is context
+    assert len(reads) == 1
+    assert [p.name for p in bundle_dir.glob("*.bundle.crt")] == [Path(first).name]
+    assert (tmp_path / "tmpabc123.bundle.crt").exists()
+
+    # New certificate content: a new bundle replaces the old one
+    cert.write_text(cert.read_text() + "\n")
+    second = proxy_config.create_combined_certificate_bundle()
+    assert second != first
+    assert proxy_config.get_ssl_context() is not context
+    assert [p.name for p in bundle_dir.glob("*.bundle.crt")] == [Path(second).name]
+    assert (tmp_path / "tmpabc123.bundle.crt").exists()
+
+
+def test_request_identity_is_the_proxy_account_or_host(monkeypatch):
+    """Rate limit budgets follow the egress identity, not the scraped account"""
+    settings = proxy_config.get_settings()
+    monkeypatch.setattr(settings, "use_proxy", True)
+    monkeypatch.setattr(settings, "proxy_username", "brd-customer-1-zone-a")
+    assert proxy_config.request_identity() == f"proxy:brd-customer-1-zone-a@{settings.proxy_host}:{settings.proxy_port}"
+
+    monkeypatch.setattr(settings, "use_proxy", False)
+    assert proxy_config.request_identity().startswith("host:")
+
+
+def test_connection_stats_count_reused_connections():
+    """Requests over a keep-alive client open a single connection"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stats = proxy_config.ConnectionStats()
+
+    async def run():
+        async with httpx.AsyncClient() as client:
+            for _ in range(3):
+                await client.get(f"http://127.0.0.1:{server.server_port}/", extensions=stats.record_request())
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.shutdown()
+    assert stats.summary() == {"requests": 3, "connections": 1, "reused": 2}
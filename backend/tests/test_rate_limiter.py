@@ -1,5 +1,4 @@
 import pytest
-import time
 from app.utils.rate_limiter import SlidingWindowRateLimiter
 import redis
 from unittest.mock import Mock, patch
@@ -21,25 +20,27 @@ def rate_limiter(mock_redis):
 
 def test_can_make_request_under_limit(rate_limiter, mock_redis):
     """Test that requests are allowed under the limit"""
-    mock_redis.zcount.return_value = 0
-    mock_redis.get.return_value = None
+    script = mock_redis.register_script.return_value
+    script.return_value = [1]
     
     can_request, wait_time = rate_limiter.can_make_request("test_user")
     
     assert can_request is True
     assert wait_time is None
+    # One script call checks every limit; a plain check records nothing
+    assert script.call_count == 1
+    assert script.call_args.kwargs["keys"] == ["rate_limit:test_user", "backoff:test_user"]
+    assert script.call_args.kwargs["args"][5] == 0
 
 
 def test_cannot_make_request_over_limit(rate_limiter, mock_redis):
     """Test that requests are blocked over the limit"""
-    mock_redis.zcount.side_effect = [21, 180, 2]  # Over window limit
-    mock_redis.get.return_value = None
-    mock_redis.zrange.return_value = [(b'123456', time.time() - 300)]
+    mock_redis.register_script.return_value.return_value = [0, b"299.5"]
     
     can_request, wait_time = rate_limiter.can_make_request("test_user")
     
     assert can_request is False
-    assert wait_time > 0
+    assert wait_time == 299.5
 
 
 def test_backoff_on_rate_limit(rate_limiter, mock_redis):
@@ -66,4 +67,111 @@ def test_jitter_calculation(rate_limiter):
     assert all(35 <= delay <= 45 for delay in delays)
     
     # Check we get variation (not all the same)
-    assert len(set(delays)) > 1
\ No newline at end of file
+    assert len(set(delays)) > 1
+
+def test_acquire_waits_for_budget(rate_limiter, mock_redis):
+    """acquire sleeps while the budget is exhausted, then records one request"""
+    import asyncio
+
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    script = mock_redis.register_script.return_value
+    script.side_effect = [[0, b"7"], [1]]
+    with patch('app.utils.rate_limiter.asyncio.sleep', fake_sleep):
+        asyncio.run(rate_limiter.acquire("test_user"))
+
+    assert sleeps == [7]
+    # Check and record happen in the same script call
+    assert [call.kwargs["args"][5] for call in script.call_args_list] == [1, 1]
+    assert mock_redis.zadd.call_count == 0
+
+
+def test_middleware_reserves_in_one_step(rate_limiter, mock_redis):
+    """Rate limited API paths go through reserve; a refused reservation answers 429"""
+    import asyncio
+
+    from app.utils.rate_limiter import RateLimitMiddleware
+
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+
+    async def request(path):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": path, "client": ("10.0.0.1", 1234), "headers": []}
+        await RateLimitMiddleware(app, rate_limiter)(scope, None, send)
+        return sent
+
+    script = mock_redis.register_script.return_value
+    script.side_effect = [[1], [0, b"42"]]
+
+    assert asyncio.run(request("/api/v1/scrapes")) == []
+    assert asyncio.run(request("/api/v1/scrapes"))[0]["status"] == 429
+    assert calls == ["/api/v1/scrapes"]
+    # Both decisions were atomic reservations; nothing is recorded separately
+    assert [call.kwargs["args"][5] for call in script.call_args_list] == [1, 1]
+    assert mock_redis.zadd.call_count == 0
+
+
+@pytest.fixture
+def redis_factory():
+    """
+    New connections to the configured Redis server, or to one in-process
+    fakeredis server (with Lua scripting) when no server is reachable
+    """
+    from app.config import get_settings
+
+    url = get_settings().redis_url
+    try:
+        redis.from_url(url).ping()
+        return lambda: redis.from_url(url)
+    except redis.RedisError:
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        server = fakeredis.FakeServer()
+        return lambda: fakeredis.FakeRedis(server=server)
+
+
+def test_concurrent_workers_never_overdraw_the_budget(redis_factory):
+    """Workers racing for the last slots of a window get exactly the budget"""
+    import threading
+    import uuid
+
+    conn = redis_factory()
+
+    identifier = f"test_concurrency:{uuid.uuid4().hex}"
+    workers, attempts = 8, 10
+    barrier = threading.Barrier(workers)
+    granted = []
+
+    def worker():
+        # A connection of its own, like a separate worker process
+        limiter = SlidingWindowRateLimiter(redis_factory())
+        limiter.requests_per_minute = 1000
+        barrier.wait()
+        for _ in range(attempts):
+            reserved, _ = limiter.reserve(identifier)
+            if reserved:
+                granted.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        limiter = SlidingWindowRateLimiter(conn)
+        assert len(granted) == limiter.max_requests_per_window
+        assert conn.zcard(limiter._get_key(identifier)) == limiter.max_requests_per_window
+        can_request, wait_time = limiter.can_make_request(identifier)
+        assert not can_request and wait_time > 600
+    finally:
+        conn.delete(f"rate_limit:{identifier}", f"backoff:{identifier}")
@@ -0,0 +1,513 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.scrapers import graphql_scraper
+from app.scrapers.graphql_scraper import GraphQLScraper
+
+
+def graphql_handler(pages: int, page_size: int, delay: float):
+    """Fake GraphQL endpoint serving follower pages with a little latency"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(delay)
+        variables = json.loads(request.url.params["variables"])
+        page = int(variables["after"] or 0)
+        edges = [
+            {"node": {"id": str(page * page_size + i), "username": f"user{page * page_size + i}"}}
+            for i in range(page_size)
+        ]
+        return httpx.Response(200, json={"data": {"user": {"edge_followed_by": {
+            "edges": edges,
+            "page_info": {"has_next_page": page + 1 < pages, "end_cursor": str(page + 1)}
+        }}}})
+    return handler
+
+
+def test_graphql_pages_do_not_block_the_event_loop(monkeypatch):
+    """Other coroutines keep running while pages are in flight"""
+    async def run():
+        loop = asyncio.get_running_loop()
+        transport = httpx.MockTransport(graphql_handler(pages=5, page_size=10, delay=0.02))
+        monkeypatch.setitem(graphql_scraper._clients, loop, httpx.AsyncClient(transport=transport))
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        ticking = asyncio.create_task(ticker())
+        pages = [page async for page in GraphQLScraper().iter_pages("1", "follower")]
+        ticking.cancel()
+        await graphql_scraper.close_async_client()
+        return pages, ticks
+
+    pages, ticks = asyncio.run(run())
+    assert [len(page.users) for page in pages] == [10] * 5
+    assert pages[-1].users[-1].username == "user49"
+    assert [page.end_cursor for page in pages] == ["1", "2", "3", "4", None]
+    assert ticks > 10
+
+
+def test_throttled_and_failed_pages_are_retried_not_truncated(monkeypatch):
+    """429s and 500s are retried after Retry-After; a page that keeps failing fails the list"""
+    serve = graphql_handler(pages=4, page_size=10, delay=0)
+    failures = {"1": [429, 500], "3": [500] * 10}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        after = json.loads(request.url.params["variables"])["after"]
+        if failures.get(after):
+            return httpx.Response(failures[after].pop(0), headers={"Retry-After": "0"}, json={"status": "fail"})
+        return await serve(request)
+
+    cursors = []
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        monkeypatch.setitem(
+            graphql_scraper._clients, loop, httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        )
+        try:
+            async for page in GraphQLScraper().iter_pages("1", "follower"):
+                cursors.append(page.end_cursor)
+        finally:
+            await graphql_scraper.close_async_client()
+
+    with pytest.raises(RuntimeError, match="after 3 pages"):
+        asyncio.run(run())
+    assert cursors == ["1", "2", "3"]
+    assert not failures["1"]
+    assert len(failures["3"]) == 10 - (graphql_scraper.settings.max_retries + 1)
+
+
+def test_scrape_both_interleaves_lists_within_one_budget(monkeypatch):
+    """Both paginations share the throttle and overlap instead of running back to back"""
+    from app.scrapers.instagram_scraper import InstagramScraper
+
+    latency, spacing, pages = 0.05, 0.01, 4
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        if "query_hash" not in request.url.params:
+            return httpx.Response(200, text='"profilePage_42"')
+        following = request.url.params["query_hash"] == GraphQLScraper.FOLLOWING_HASH
+        variables = json.loads(request.url.params["variables"])
+        page = int(variables["after"] or 0)
+        edge = {
+            "edges": [{"node": {"id": str(page), "username": f"user{page}"}}],
+            "page_info": {"has_next_page": page + 1 < pages, "end_cursor": str(page + 1)}
+        }
+        return httpx.Response(200, json={"data": {"user": {"edge_follow" if following else "edge_followed_by": edge}}})
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        monkeypatch.setitem(
+            graphql_scraper._clients, loop, httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        )
+
+        lock = asyncio.Lock()
+        stamps = []
+
+        async def throttle():
+            # Budget: one request every `spacing` seconds across both lists
+            async with lock:
+                if stamps:
+                    await asyncio.sleep(max(0.0, stamps[-1] + spacing - loop.time()))
+                stamps.append(loop.time())
+
+        start = loop.time()
+        result = await InstagramScraper(throttle=throttle).scrape_both("target")
+        elapsed = loop.time() - start
+        await graphql_scraper.close_async_client()
+        return result, stamps, elapsed
+
+    result, stamps, elapsed = asyncio.run(run())
+    assert len(result["followers"]) == len(result["following"]) == pages
+    assert all(b - a >= spacing * 0.9 for a, b in zip(stamps, stamps[1:]))
+    # Back to back would take (2 profile + 2 * pages) * latency = 0.5s
+    assert elapsed < 0.4
+
+
+@pytest.mark.parametrize("fetch_delay", [0, 10])
+def test_prefetch_closes_the_page_source_when_the_consumer_fails(fetch_delay):
+    """Whether the next page is ready or still in flight, the source is closed before the failure propagates"""
+    from contextlib import aclosing
+
+    from app.scrapers.records import ScrapedPage, ScrapedUser
+    from app.workers.tasks import prefetch_pages
+
+    closed = []
+
+    async def pages():
+        try:
+            for page in range(100):
+                yield ScrapedPage([ScrapedUser(page, f"user{page}")], str(page + 1))
+                await asyncio.sleep(fetch_delay)
+        finally:
+            closed.append(True)
+
+    async def consume():
+        with pytest.raises(RuntimeError):
+            async with aclosing(prefetch_pages(pages())) as prefetched:
+                async for _ in prefetched:
+                    await asyncio.sleep(0.01)
+                    raise RuntimeError("persist failed")
+        return list(closed)
+
+    assert asyncio.run(consume()) == [True]
+
+
+def test_interrupted_scrape_resumes_from_checkpoint(monkeypatch):
+    """A retried job continues after the last saved cursor instead of starting over"""
+    from contextlib import contextmanager
+    from unittest.mock import MagicMock
+
+    from sqlmodel import Session, SQLModel, create_engine, select
+    from sqlmodel.pool import StaticPool
+
+    from app.models import Account, Follower, Scrape, ScrapeStatus, ScrapeType
+    from app.scrapers.records import ScrapedPage, ScrapedUser
+    from app.workers import tasks
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+
+    @contextmanager
+    def session_scope():
+        with Session(engine) as session:
+            yield session
+            session.commit()
+
+    monkeypatch.setattr(tasks, "session_scope", session_scope)
+    redis_conn = MagicMock()
+    redis_conn.exists.return_value = 0
+    monkeypatch.setattr(tasks, "redis_conn", redis_conn)
+    rate_limiter = MagicMock()
+    rate_limiter.can_make_request.return_value = (True, None)
+    monkeypatch.setattr(tasks, "rate_limiter", rate_limiter)
+
+    followers = [ScrapedUser(i, f"user{i}") for i in range(10)]
+    requested = []
+
+    class FlakyScraper:
+        fail_at = 6
+
+        def __init__(self, session=None, throttle=None):
+            pass
+
+        def cached_profile(self, username):
+            return {"id": "42", "full_name": "The Target", "is_verified": True, "is_private": False}
+
+        async def iter_relation(self, username, relation_type, use_private=False, after=None):
+            requested.append(after)
+            for start in range(int(after or 0), len(followers), 3):
+                if start == self.fail_at:
+                    raise RuntimeError("worker timeout")
+                end = start + 3
+                yield ScrapedPage(followers[start:end], str(end) if end < len(followers) else None)
+
+    monkeypatch.setattr(tasks, "InstagramScraper", FlakyScraper)
+
+    with session_scope() as session:
+        account = Account(username="target")
+        session.add(account)
+        session.flush()
+        scrape = Scrape(account_id=account.id, scrape_type=ScrapeType.FOLLOWERS)
+        session.add(scrape)
+        session.flush()
+        scrape_id = scrape.id
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(tasks.scrape_instagram_account(scrape_id, "target", "followers"))
+
+    with Session(engine) as session:
+        scrape = session.get(Scrape, scrape_id)
+        assert scrape.status == ScrapeStatus.PARTIAL and scrape.is_partial
+        assert (scrape.followers_cursor, scrape.followers_scraped) == ("6", 6)
+
+    FlakyScraper.fail_at = None
+    asyncio.run(tasks.scrape_instagram_account(scrape_id, "target", "followers"))
+
+    with Session(engine) as session:
+        scrape = session.get(Scrape, scrape_id)
+        assert requested == [None, "6"]
+        assert scrape.status == ScrapeStatus.COMPLETED and not scrape.is_partial
+        assert scrape.followers_complete
+        assert scrape.followers_count == scrape.new_followers == len(followers)
+        assert len(session.exec(select(Follower).where(Follower.scrape_id == scrape_id)).all()) == len(followers)
+        account = session.get(Account, scrape.account_id)
+        assert (account.full_name, account.is_verified) == ("The Target", True)
+
+
+@pytest.mark.parametrize("storage", ["snapshot", "interval"])
+def test_incremental_scrape_stops_at_known_followers(monkeypatch, tmp_path, storage):
+    """Only the new head is fetched; unfollows wait for the next full scrape"""
+    from contextlib import contextmanager
+    from unittest.mock import MagicMock
+
+    from sqlmodel import Session, SQLModel, create_engine, select
+
+    from app.models import Account, FollowerInterval, Scrape, ScrapeStatus, ScrapeType
+    from app.scrapers.records import ScrapedPage, ScrapedUser
+    from app.workers import tasks
+    from app.workers.delta_calculator import load_relation_ids
+    from app.utils.proxy_config import request_identity
+
+    # Both lists are persisted from worker threads at once, so each needs its own connection
+    engine = create_engine(f"sqlite:///{tmp_path / 'scrapes.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+
+    @contextmanager
+    def session_scope():
+        with Session(engine) as session:
+            yield session
+            session.commit()
+
+    monkeypatch.setattr(tasks, "session_scope", session_scope)
+    redis_conn = MagicMock()
+    redis_conn.exists.return_value = 0
+    monkeypatch.setattr(tasks, "redis_conn", redis_conn)
+    rate_limiter = MagicMock()
+    rate_limiter.can_make_request.return_value = (True, None)
+    monkeypatch.setattr(tasks, "rate_limiter", rate_limiter)
+    monkeypatch.setattr(tasks.settings, "incremental_stop_after", 4)
+    monkeypatch.setattr(tasks.settings, "follower_storage", storage)
+
+    requested = []
+
+    class NewestFirstScraper:
+        followers = list(range(100, 0, -1))
+        profile = None
+
+        def __init__(self, session=None, throttle=None):
+            pass
+
+        def cached_profile(self, username):
+            return self.profile
+
+        async def iter_relation(self, username, relation_type, use_private=False, after=None):
+            rows = [ScrapedUser(i, f"user{i}") for i in (self.followers if relation_type == "follower" else [7])]
+            for start in range(0, len(rows), 5):
+                requested.append((relation_type, start))
+                end = start + 5
+                yield ScrapedPage(rows[start:end], str(end) if end < len(rows) else None)
+
+    monkeypatch.setattr(tasks, "InstagramScraper", NewestFirstScraper)
+
+    with session_scope() as session:
+        account = Account(username="target")
+        session.add(account)
+        session.flush()
+        account_id = account.id
+
+    def scrape(scrape_type):
+        with session_scope() as session:
+            scrape = Scrape(account_id=account_id, scrape_type=scrape_type)
+            session.add(scrape)
+            session.flush()
+            scrape_id = scrape.id
+        requested.clear()
+        asyncio.run(tasks.scrape_instagram_account(scrape_id, "target", scrape_type.value))
+        with Session(engine) as session:
+            scrape = session.get(Scrape, scrape_id)
+            session.expunge(scrape)
+        return scrape, list(requested)
+
+    full, pages = scrape(ScrapeType.BOTH)
+    assert len(pages) == 21
+    # Budgets are per egress identity, so jobs for different targets share one
+    rate_limiter.can_make_request.assert_called_with(request_identity())
+    with Session(engine) as session:
+        assert session.get(Account, account_id).follower_count == 100
+
+    # Three new followers on top, follower 50 unfollowed further down
+    NewestFirstScraper.followers = [203, 202, 201] + [i for i in range(100, 0, -1) if i != 50]
+    NewestFirstScraper.profile = {"follower_count": 102}
+    incremental, pages = scrape(ScrapeType.INCREMENTAL)
+    assert pages == [("follower", 0), ("follower", 5)]
+    assert incremental.status == ScrapeStatus.COMPLETED
+    assert (incremental.new_followers, incremental.lost_followers) == (3, 0)
+    with Session(engine) as session:
+        assert len(load_relation_ids(session, incremental.id, "follower")) == 103
+        # The id set still holds the unfollower; the account count comes from the profile
+        assert session.get(Account, account_id).follower_count == 102
+        assert session.get(Account, account_id).following_count == 1
+        intervals = session.exec(select(FollowerInterval)).all()
+        assert len(intervals) == (104 if storage == "interval" else 0)
+        assert all(interval.end_scrape_id is None for interval in intervals)
+
+    reconciled, pages = scrape(ScrapeType.BOTH)
+    assert (reconciled.new_followers, reconciled.lost_followers) == (0, 1)
+    with Session(engine) as session:
+        closed = session.exec(select(FollowerInterval).where(FollowerInterval.end_scrape_id == reconciled.id)).all()
+        assert [interval.follower_id for interval in closed] == ([50] if storage == "interval" else [])
+
+
+PROFILE_PAGE = (
+    '<script>{"entry_data":{"ProfilePage":[{"logging_page_id":"profilePage_42","graphql":{"user":{'
+    '"edge_followed_by":{"count":1234},"edge_follow":{"count":56},"full_name":"Target \\u00e9",'
+    '"is_private":false,"is_verified":true,"profile_pic_url":"https:\\/\\/cdn\\/t.jpg"}}}]}}</script>'
+)
+
+
+def test_profile_page_is_fetched_once_and_cached(monkeypatch):
+    """Concurrent lookups share one page fetch; the parsed profile is reused from Redis"""
+    from app.scrapers import profile_cache as profile_cache_module
+
+    class FakeRedis(dict):
+        def get(self, key):
+            return super().get(key)
+
+        def setex(self, key, ttl, value):
+            self[key] = value
+
+    monkeypatch.setattr(profile_cache_module.profile_cache, "redis_conn", FakeRedis())
+    monkeypatch.setattr(profile_cache_module.profile_cache, "enabled", True)
+    fetches = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        fetches.append(request.url.path)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, text=PROFILE_PAGE)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        monkeypatch.setitem(
+            graphql_scraper._clients, loop, httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        )
+        scraper = GraphQLScraper()
+        ids = await asyncio.gather(scraper.get_user_id("Target"), scraper.get_user_id("Target"))
+        # A later scrape (new scraper instance) is served from the shared cache
+        profile = await GraphQLScraper().get_profile("target")
+        await graphql_scraper.close_async_client()
+        return ids, profile
+
+    ids, profile = asyncio.run(run())
+    assert ids == ["42", "42"]
+    assert fetches == ["/Target/"]
+    assert profile == {
+        "id": "42", "full_name": "Target \u00e9", "profile_pic_url": "https://cdn/t.jpg",
+        "is_verified": True, "is_private": False, "follower_count": 1234, "following_count": 56,
+    }
+
+
+def test_instagrapi_users_become_records_directly():
+    """The fallback builds the same record as GraphQL, without a dict round trip"""
+    from instagrapi.types import UserShort
+    from app.scrapers.records import ScrapedUser
+
+    user = UserShort(pk="7", username="fan", full_name="", profile_pic_url="https://cdn/p.jpg", is_private=True)
+    assert ScrapedUser.from_instagrapi(user) == ScrapedUser(7, "fan", None, "https://cdn/p.jpg", False, True)
+    assert ScrapedUser.from_node({"id": "7", "username": "fan", "profile_pic_url": "https://cdn/p.jpg",
+                                  "is_private": True, "followed_by_viewer": False}) == ScrapedUser.from_instagrapi(user)
+
+
+def test_private_fallback_streams_chunks_from_a_thread(monkeypatch):
+    """instagrapi chunks are fetched off the event loop, one page each, and resumable by cursor"""
+    import threading
+    from instagrapi.types import UserShort
+    from app.scrapers import instagram_scraper
+    from app.scrapers.instagram_scraper import InstagramScraper
+
+    loop_threads = set()
+    chunk_threads = set()
+
+    class FakeClient:
+        def user_id_from_username(self, username):
+            return "42"
+
+        def user_followers_v1_chunk(self, user_id, max_amount, max_id):
+            chunk_threads.add(threading.get_ident())
+            start = int(max_id or 0)
+            end = min(start + max_amount, 5)
+            users = [UserShort(pk=str(i), username=f"user{i}", full_name="", is_private=False) for i in range(start, end)]
+            return users, str(end) if end < 5 else None
+
+    async def no_pages(username, after=None):
+        return
+        yield
+
+    monkeypatch.setattr(instagram_scraper.settings, "private_page_size", 2)
+    scraper = InstagramScraper()
+    scraper.private_client, scraper.is_authenticated = FakeClient(), True
+    monkeypatch.setattr(scraper.graphql_scraper, "iter_follower_pages", no_pages)
+    monkeypatch.setattr(scraper.graphql_scraper, "cached_profile", lambda username: None)
+
+    async def collect(after=None):
+        loop_threads.add(threading.get_ident())
+        return [page async for page in scraper.iter_relation("target", "follower", after=after)]
+
+    pages = asyncio.run(collect())
+    assert [[u.id for u in page.users] for page in pages] == [[0, 1], [2, 3], [4]]
+    assert [page.end_cursor for page in pages] == ["v1:2", "v1:4", None]
+    assert not chunk_threads & loop_threads
+
+    resumed = asyncio.run(collect(after="v1:2"))
+    assert [[u.id for u in page.users] for page in resumed] == [[2, 3], [4]]
+
+
+def test_private_sessions_are_restored_and_renewed_lazily(monkeypatch, tmp_path):
+    """Only the first job logs in; later jobs reuse the encrypted session until it expires"""
+    from unittest.mock import MagicMock
+    from instagrapi.exceptions import LoginRequired
+    from app.scrapers import instagram_scraper
+    from app.scrapers.instagram_scraper import InstagramScraper
+    from app.services.session_store import SessionStore
+
+    logins = []
+
+    class FakeClient:
+        def __init__(self):
+            self.username = self.user_id = None
+            self.expired = False
+
+        def set_settings(self, stored):
+            self.user_id = stored["authorization_data"]["ds_user_id"]
+            self.expired = stored.get("expired", False)
+
+        def get_settings(self):
+            return {"authorization_data": {"ds_user_id": self.user_id}}
+
+        def login(self, username, password, relogin=False):
+            self.username = username
+            if self.user_id and not relogin:
+                return True
+            logins.append(username)
+            self.user_id, self.expired = "1", False
+            return True
+
+        def relogin(self):
+            return self.login(self.username, "secret", relogin=True)
+
+        def user_id_from_username(self, username):
+            if self.expired:
+                raise LoginRequired()
+            return "42"
+
+    store = SessionStore(str(tmp_path))
+    monkeypatch.setattr(instagram_scraper, "session_store", store)
+    monkeypatch.setattr(instagram_scraper, "Client", FakeClient)
+    monkeypatch.setattr(instagram_scraper, "configure_instagrapi_proxy", lambda client: None)
+    monkeypatch.setattr(instagram_scraper.settings, "instagram_username", "scraper")
+    monkeypatch.setattr(instagram_scraper.settings, "instagram_password", "secret")
+
+    async def job():
+        scraper = InstagramScraper(session=MagicMock())
+        monkeypatch.setattr(scraper.credential_service, "get_credentials", lambda username, session: None)
+        assert await scraper.initialize_private_client("target")
+        return await scraper._private_call(scraper.private_client.user_id_from_username, "target")
+
+    assert asyncio.run(job()) == "42"
+    assert asyncio.run(job()) == "42"
+    assert logins == ["scraper"]
+    assert "ds_user_id" not in next(tmp_path.iterdir()).read_text()
+
+    # An expired session is only noticed by the first request, then renewed once
+    store.save("scraper", {"authorization_data": {"ds_user_id": "1"}, "expired": True})
+    assert asyncio.run(job()) == "42"
+    assert logins == ["scraper", "scraper"]
+    assert store.load("scraper") == {"authorization_data": {"ds_user_id": "1"}}
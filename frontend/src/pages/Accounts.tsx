@@ -56,7 +56,7 @@ export function Accounts() {
       cell: ({ row }) => (
         <div className="flex items-center gap-2">
           <img
-            src={row.original.profile_pic_url || placeholderAvatar}
+            src={row.original.profile_pic_url ? `/api/v1/avatars/${row.original.username}` : placeholderAvatar}
             alt={row.original.username}
             className="h-8 w-8 rounded-full"
           />
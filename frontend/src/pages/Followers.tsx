@@ -78,7 +78,7 @@ export function Followers() {
       cell: ({ row }) => (
         <div className="flex items-center gap-3">
           <Avatar className="h-8 w-8">
-            <AvatarImage src={row.original.profile_pic_url} />
+            <AvatarImage src={`/api/v1/avatars/${row.original.username}`} />
             <AvatarFallback>{row.original.username[0].toUpperCase()}</AvatarFallback>
           </Avatar>
           <div className="flex items-center gap-2">
@@ -153,7 +153,7 @@ export function Followers() {
         <div className="flex items-center justify-between mb-4">
           <div className="flex items-center gap-4">
             <Avatar className="h-16 w-16">
-              <AvatarImage src={accountData?.profile_pic_url} />
+              <AvatarImage src={accountData?.username && `/api/v1/avatars/${accountData.username}`} />
               <AvatarFallback>{accountData?.username[0].toUpperCase()}</AvatarFallback>
             </Avatar>
             <div>